@@ -40,7 +40,7 @@ echo "Now installing placement..."
 if [ "$SRC/lib" != "$LIB" ]
 then
 
-for f in params.py jobsched.py slurm.py front.py hardware.py architecture.py exception.py tasksbinding.py scatter.py compact.py running.py utilities.py matrix.py printing.py placement.py placement-cont.py placement-patho.py
+for f in params.py jobsched.py slurm.py front.py hardware.py architecture.py exception.py tasksbinding.py scatter.py compact.py running.py procscan.py numamem.py gpuinfo.py snapshot.py squeue.py agent.py tsstore.py hostindex.py utilities.py matrix.py printing.py placement.py placement-cont.py placement-patho.py
 do
   cp $SRC/lib/$f $LIB
 done
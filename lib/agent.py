@@ -0,0 +1,202 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu-cores
+#
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  Copyright (C) 2015-2018 Emmanuel Courcelle
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+import os
+import json
+import time
+import socket
+import threading
+import socketserver
+from exception import *
+from procscan import ProcScanner
+
+#
+# The agent is a resident placement process (placement --agent), it avoids the cost of ssh + python start + hardware guess
+# for each --check sent from the front node
+#
+# The protocol is a single exchange of json lines:
+#     request: {"argv": ["placement", "--check", "ALL", "--summary", ...]}
+#     answer : {"status": 0, "output": "..."}
+#
+# The agent listens on a TCP address (host:port) or on a Unix socket (a path)
+# On the front node, queryAgent is called first, and ssh is used if there is no agent
+# The port is PLACEMENT_AGENT_PORT (default AGENT_PORT), PLACEMENT_AGENT_PORT=0 = never use the agents
+#
+# The answers of the agent are trusted only if it listens on a privileged port (< 1024): on a compute node, only root can
+# bind such a port, a job cannot impersonate the agent. PLACEMENT_AGENT_UNPRIVILEGED=1 trusts any port (tests only)
+#
+
+AGENT_PORT     = 777
+AGENT_INTERVAL = 5       # The rolling sample interval (s)
+AGENT_CONNECT  = 1.0     # The connection timeout (s)
+
+def agentPort():
+    """ Return the port of the agents, or 0 """
+    return int(os.environ.get('PLACEMENT_AGENT_PORT',AGENT_PORT))
+
+def isTrustedPort(port):
+    """ Return True if an agent listening on port may be trusted (see above) """
+    return port < 1024 or os.environ.get('PLACEMENT_AGENT_UNPRIVILEGED','0') == '1'
+
+class RollingSampler(threading.Thread):
+    """ Read the ticks of every thread of the node every interval seconds
+        sample(processes) computes the %cpu of the threads since the last read, without waiting (see RunningMode) """
+
+    def __init__(self,interval=AGENT_INTERVAL,proc_root='/proc'):
+        threading.Thread.__init__(self,daemon=True)
+        self.__interval = interval
+        self.__scanner  = ProcScanner(proc_root)
+        self.__lock     = threading.Lock()
+        self.__ticks    = {}
+        self.__time     = None
+
+    def run(self):
+        while True:
+            self.tick()
+            time.sleep(self.__interval)
+
+    def tick(self):
+        ticks = self.__scanner.readAllThreadsTicks()
+        with self.__lock:
+            self.__ticks = ticks
+            self.__time  = time.time()
+
+    def sample(self,processes):
+        """ Same as ProcScanner.sample, the window being the time since the last tick
+            If there was no tick yet, processes are returned unchanged """
+
+        with self.__lock:
+            begin_ticks = self.__ticks
+            begin       = self.__time
+        if begin == None:
+            return processes
+
+        tasks     = [ (p['pid'],t[0]) for p in processes for t in p['threads'] ]
+        end_ticks = self.__scanner.readThreadsTicks(tasks)
+        elapsed   = time.time() - begin
+        if elapsed <= 0:
+            return processes
+        return self.__scanner.resample(processes,begin_ticks,end_ticks,elapsed)
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+
+class PlacementAgent(object):
+    """ Listen on address and answer the requests calling handler(argv) => (status,output)
+        The requests are handled one at a time """
+
+    def __init__(self,address,handler):
+        """ address = host:port or a path (Unix socket)
+            handler = a function: argv => (status,output) """
+
+        self.__handler = handler
+        self.__lock    = threading.Lock()
+
+        agent = self
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.wfile.write((json.dumps(agent.answer(self.rfile.readline())) + '\n').encode())
+
+        if '/' in address:
+            if os.path.exists(address):
+                os.unlink(address)
+            self.__server = socketserver.ThreadingUnixStreamServer(address,RequestHandler)
+        else:
+            (host,sep,port) = address.rpartition(':')
+            self.__server = _TCPServer((host,int(port)),RequestHandler)
+        self.__server.daemon_threads = True
+
+    def address(self):
+        """ Return the address really used (useful with the port 0) """
+
+        address = self.__server.server_address
+        if isinstance(address,tuple):
+            return address[0] + ':' + str(address[1])
+        return address
+
+    def answer(self,line):
+        """ Return the answer (a dict) to a request (a json line) """
+
+        try:
+            argv = json.loads(line.decode())['argv']
+            if not isinstance(argv,list):
+                raise ValueError('argv')
+        except (ValueError,KeyError,TypeError):
+            return {'status':1, 'output':'ERROR - Bad request\n'}
+
+        with self.__lock:
+            try:
+                (status,output) = self.__handler(argv)
+            except PlacementException as e:
+                (status,output) = (1,'PLACEMENT ' + str(e) + '\n')
+            except SystemExit as e:
+                (status,output) = (2,'ERROR - Bad arguments: ' + ' '.join(argv[1:]) + '\n')
+            except Exception as e:
+                # Always answer, else the front node cannot tell a failing request from a broken agent
+                (status,output) = (1,'ERROR - ' + type(e).__name__ + ': ' + str(e) + '\n')
+        return {'status':status, 'output':output}
+
+    def serve_forever(self):
+        self.__server.serve_forever()
+
+    def shutdown(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+def queryAgent(host,argv,port=None,timeout=None):
+    """ Send argv to the agent running on host, return (status,output)
+        Return None if there is no agent (connection refused, no route etc), if PLACEMENT_AGENT_PORT is 0
+        or if port is not privileged (the agent could be any process of a job, see isTrustedPort) """
+
+    if port == None:
+        port = agentPort()
+    if port == 0 or not isTrustedPort(port):
+        return None
+
+    try:
+        sock = socket.create_connection((host,port),AGENT_CONNECT)
+    except OSError:
+        return None
+
+    with sock:
+        sock.settimeout(timeout)
+        sock.sendall((json.dumps({'argv':argv}) + '\n').encode())
+        sock.shutdown(socket.SHUT_WR)
+        answer = b''
+        while True:
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                raise PlacementException('agent ' + host + ':' + str(port) + ' - TIMEOUT after ' + str(timeout) + 's',-1)
+            if not data:
+                break
+            answer += data
+
+    try:
+        answer = json.loads(answer.decode())
+        return (answer['status'],answer['output'])
+    except (ValueError,KeyError,TypeError):
+        raise PlacementException('agent ' + host + ':' + str(port) + ' - Bad answer',-1)
@@ -10,9 +10,10 @@
 import sys
 
 class PlacementException(Exception):
-    def __init__(self,msg,err=None):
+    def __init__(self,msg,err=None,output=None):
         Exception.__init__(self,msg)
         self.err=err
+        self.output=output
     
 def ManageException(e):
     print("PLACEMENT_ERROR_FOUND")
@@ -25,10 +25,17 @@
 #
 
 import os
-from utilities import runCmd,runCmdNoOut,getHostname,expandNodeList
+import sys
+from concurrent.futures import ThreadPoolExecutor,as_completed
+from utilities import runCmd,runCmdNoOut,getHostname,expandNodeList,NodeSet
 from slurm import *
+from agent import queryAgent
 from exception import *
 
+# The switches used only by the front node, not passed to the remote placement
+FRONT_ONLY_VALUE = ['--host','--host_workers','--host_timeout']
+FRONT_ONLY_FLAG  = ['--host_unordered']
+
 class FrontNode(object):
     """This class is useful when we are logged on the front node, and we want to execute placement
        on some other node.
@@ -54,15 +61,119 @@ class FrontNode(object):
         exe =  os.environ['PLACEMENT_ROOT'] + '/lib/' + exe
         return exe
             
+    def __remoteArgv(self,argv):
+        """Remove the switches used only by the front node (--host and its options) from argv
+           The remote placement checks its own host, the agent refuses --host"""
+
+        remote = []
+        skip   = False
+        for a in argv:
+            if skip:
+                skip = False
+            elif a in FRONT_ONLY_VALUE:
+                skip = True
+            elif a in FRONT_ONLY_FLAG or a.partition('=')[0] in FRONT_ONLY_VALUE:
+                pass
+            else:
+                remote.append(a)
+        return remote
+
     def __runPlacement(self,host):
         """Call placement on a remote host, appending --from-frontal to the parameters"""
 
-        cmd = self.argv.copy()
+        cmd = self.__remoteArgv(self.argv)
         
         # Replace cmd[0] (python script) with the path to the bash script
         cmd[0] = os.environ['PLACEMENTBASH']
         cmd.append('--from-frontal')
-        runCmdNoOut(cmd,host)
+
+        # Use the agent if there is one on this host
+        answer = queryAgent(host,cmd)
+        if answer != None:
+            sys.stdout.write(answer[1])
+            self.__checkAgentStatus(host,answer)
+        else:
+            runCmdNoOut(cmd,host)
+        
+    def __checkAgentStatus(self,host,answer):
+        """Raise an exception if the agent returned an error"""
+
+        (status,output) = answer
+        if status != 0:
+            raise PlacementException('agent ' + host + ' - ERROR code = ' + str(status),status,output)
+
+    def __runPlacementOut(self,host,argv=None):
+        """Same as __runPlacement, but the output is captured and returned, the command is killed after options.host_timeout
+           argv replaces self.argv if not None"""
+
+        if argv == None:
+            argv = self.argv
+        cmd = self.__remoteArgv(argv)
+        cmd[0] = os.environ['PLACEMENTBASH']
+        cmd.append('--from-frontal')
+
+        # Use the agent if there is one on this host
+        answer = queryAgent(host,cmd,timeout=self.options.host_timeout)
+        if answer != None:
+            self.__checkAgentStatus(host,answer)
+            return answer[1]
+        return runCmd(cmd,host,self.options.host_timeout)
+
+    def __runPlacementHosts(self,hosts,argv=None,header=False):
+        """Call placement on the hosts, options.host_workers hosts at a time
+           The output of each host is printed as a block, in the order of hosts or as soon as it is available (options.host_unordered)
+           If header, the block is preceded by the host name"""
+
+        def printHost(h,future):
+            if header:
+                print ("host " + h)
+            try:
+                sys.stdout.write(future.result())
+            except PlacementException as e:
+                if e.output != None:
+                    sys.stdout.write(e.output)
+                if not header:
+                    print ("host " + h)
+                print (e)
+                print ()
+            sys.stdout.flush()
+
+        with ThreadPoolExecutor(max_workers=max(1,min(self.options.host_workers,len(hosts)))) as pool:
+            futures = [ pool.submit(self.__runPlacementOut,h,argv) for h in hosts ]
+            host_of = dict(zip(futures,hosts))
+            if self.options.host_unordered:
+                futures = as_completed(futures)
+            for f in futures:
+                printHost(host_of[f],f)
+        
+    def __runPlacementJob(self,hosts):
+        """Check all the nodes of a job (--all_nodes):
+               - Call placement --summary on every host, options.host_workers hosts at a time, and print the summaries
+               - Call placement again (detailed output) only on the hosts whose summary shows a warning"""
+
+        argv = [ a for a in self.argv if a != '--all_nodes' ]
+        summary_argv = argv + ['--summary','--no_ansi']
+
+        anomalies = []
+        with ThreadPoolExecutor(max_workers=max(1,min(self.options.host_workers,len(hosts)))) as pool:
+            futures = [ pool.submit(self.__runPlacementOut,h,summary_argv) for h in hosts ]
+            for (h,f) in zip(hosts,futures):
+                try:
+                    # The summary is the last line: host 0.1:N:N:80:50:90 W
+                    summary = f.result().strip().split('\n')[-1]
+                    if summary.endswith(' W'):
+                        anomalies.append(h)
+                    print (summary)
+                except PlacementException as e:
+                    print (h + ' ' + str(e))
+                    
+        print ()
+        print (str(len(anomalies)) + " node(s) with a warning out of " + str(len(hosts)))
+        sys.stdout.flush()
+
+        if len(anomalies) > 0:
+            print ()
+            self.__runPlacementHosts(anomalies,argv,True)
         
     def setOptions(self,options,argv):
         """ Initialize together options and argv """
@@ -123,22 +234,26 @@ class FrontNode(object):
                 if nodeset=="":
                     raise PlacementException("ERROR - Bad jobid ! (" + str(jobid) + ")")
     
-                host = self.__sched.nodesetToHost(nodeset)
-                
                 # We check only the user who launched the job
                 self.argv.append('--check')
                 self.argv.append(user)
-                self.__runPlacement(host)
+
+                # Every node of the job, or only the first one
+                if self.options.all_nodes:
+                    hosts = self.__sched.nodesetToHosts(nodeset)
+                    if len(hosts) == 0:
+                        hosts = expandNodeList(nodeset)
+                    self.__runPlacementJob(hosts)
+                else:
+                    host = self.__sched.nodesetToHost(nodeset)
+                    self.__runPlacement(host)
                 return True
 
         # The host switch:
         #     Translate to a list of hosts and call placement on each host
-        #     We try using the nodeset of the job scheduler, but if not found we go back to expandNodeList (utilities.py)
+        #     The nodeset is read by NodeSet (utilities.py), nodeset -e is not called
         if self.options.host:
-            try:
-                hosts = self.__sched.nodesetToHosts(self.options.host)
-            except AttributeError:
-                hosts = expandNodeList(self.options.host)
+            hosts = NodeSet(self.options.host)
 
             # Verify that the hosts are alive
             # for h in hosts:
@@ -149,14 +264,7 @@ class FrontNode(object):
             # We check everything on each host
             self.argv.append('--check')
             self.argv.append('ALL')
-            for h in hosts:
-                try:
-                    #print ("KOUKOU Executing placement on {0}".format(h))
-                    self.__runPlacement(h)
-                except PlacementException as e:
-                    print ("host " + h)
-                    print (e)
-                    print ()
+            self.__runPlacementHosts(hosts)
                     
             return True
                      
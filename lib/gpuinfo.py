@@ -0,0 +1,214 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu-cores
+#
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  Copyright (C) 2015-2018 Emmanuel Courcelle
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+import io
+import os
+import xml.etree.ElementTree as et
+from exception import *
+from utilities import runCmd, convertMemory
+
+#
+# The gpus status, as returned by nvidia-smi
+#
+# GpuXmlReader calls nvidia-smi -q -x, it is the default
+# GpuCsvReader calls nvidia-smi --query-gpu and --query-compute-apps, the output is much smaller
+#
+# They both return the same thing: an index of the gpus, ie a dictionary, key = minor number, val = a dictionary:
+#     {'mem_used':MiB, 'mem_total':MiB, 'util':%, 'pwr_used':W, 'pwr_limit':W, 'processes':[[pid,bytes], ...]}
+#
+# gpuStatus converts an entry of the index to the gpu dictionary used by RunningMode.gpus_info
+#
+
+def gpuStatus(index,g):
+    """ Return the dictionary {'id','M','U','P','PS'} describing the gpu g, from the index
+        M, U, P are percentages, the memory used by the processes is normalized (0..100) """
+
+    gpu = {'id':g, 'M':0, 'U':0, 'P':0, 'PS':[]}
+
+    # If no information about this gpu (eg gpu not used)
+    if not g in index:
+        return gpu
+
+    raw = index[g]
+    gpu['M'] = int((100.0*raw['mem_used'])/raw['mem_total'])
+    gpu['U'] = int(raw['util'])
+    if raw['pwr_used'] != None and raw['pwr_limit']:
+        gpu['P'] = int(100 * raw['pwr_used'] / raw['pwr_limit'])
+
+    processes = [ list(p) for p in raw['processes'] ]
+    max_mem   = max([0] + [ p[1] for p in processes ])
+
+    # normalize the memory used (0..100)
+    if max_mem > 0:
+        for ps in processes:
+            ps[1] = int(100.0*ps[1]/max_mem)
+
+    gpu['PS'] = processes
+    return gpu
+
+def _number(s):
+    """ '112.32 W' ==> 112.32, 'N/A' or '[N/A]' ==> None """
+
+    try:
+        return float(s.strip().partition(' ')[0])
+    except (ValueError,AttributeError):
+        return None
+
+class GpuXmlReader(object):
+    """ Build the index of the gpus from the output of nvidia-smi -q -x
+
+        The document is parsed in a single pass with iterparse, each gpu subtree is dropped as soon as it is read,
+        so that the whole tree is never built in memory
+    """
+
+    __xml_header = '<?xml version="1.0" ?>\n<!DOCTYPE nvidia_smi_log'
+
+    def read(self):
+        """ Call nvidia-smi and return the index """
+
+        xml = runCmd('nvidia-smi -q -x')
+
+        # May be there are some lines before the xml (if the user has some stuff in its .bashrc)
+        # So we detect and keep only from the first xml line
+        if not xml.startswith(self.__xml_header):
+            start_xml = xml.find(self.__xml_header)
+            if start_xml == -1:
+                raise PlacementException("ERROR - bad xml header returned by nvidia-smi")
+            else:
+                xml = xml[start_xml:]
+
+        return self.parse(io.BytesIO(xml.encode('utf-8')))
+
+    def parse(self,source):
+        """ Parse source (a file name or a file object) and return the index
+
+            Only the end events are considered: when a container we need is complete, its leaves are read
+            When a gpu is complete, its subtree is dropped
+        """
+
+        index  = {}
+        gpu    = {'processes':[]}
+        for (event,elem) in et.iterparse(source):
+            tag = elem.tag
+            if tag == 'process_info':
+                gpu['processes'].append([int(elem.findtext('pid')),convertMemory(elem.findtext('used_memory'))])
+            elif tag == 'fb_memory_usage':
+                gpu['mem_used']  = _number(elem.findtext('used'))
+                gpu['mem_total'] = _number(elem.findtext('total'))
+            elif tag == 'utilization':
+                gpu['util'] = _number(elem.findtext('gpu_util').strip('%'))
+
+            # power_readings are used in priority over gpu_power_readings
+            elif tag == 'power_readings':
+                if elem.find('power_draw') != None:
+                    gpu['pwr_used']  = _number(elem.findtext('power_draw'))
+                if elem.find('power_limit') != None:
+                    gpu['pwr_limit'] = _number(elem.findtext('power_limit'))
+            elif tag == 'gpu_power_readings':
+                gpu.setdefault('pwr_used',_number(elem.findtext('instant_power_draw')))
+                gpu.setdefault('pwr_limit',_number(elem.findtext('current_power_limit')))
+
+            elif tag == 'gpu':
+                minor = elem.findtext('minor_number')
+                if minor != None:
+                    gpu.setdefault('pwr_used',None)
+                    gpu.setdefault('pwr_limit',None)
+                    index[int(minor)] = gpu
+                gpu = {'processes':[]}
+                elem.clear()
+
+        return index
+
+class GpuCsvReader(object):
+    """ Build the index of the gpus from the output of nvidia-smi --query-gpu and nvidia-smi --query-compute-apps
+
+        nvidia-smi does not know the minor number in csv mode, it is read from /proc/driver/nvidia/gpus/<bus id>/information
+        If this file is not available, the nvidia-smi index is used
+    """
+
+    __query_gpu  = 'nvidia-smi --format=csv,noheader,nounits --query-gpu=index,pci.bus_id,uuid,memory.used,memory.total,utilization.gpu,power.draw,power.limit'
+    __query_apps = 'nvidia-smi --format=csv,noheader,nounits --query-compute-apps=gpu_uuid,pid,used_memory'
+
+    def __init__(self,driver_root='/proc/driver/nvidia/gpus'):
+        self.__driver_root = driver_root
+
+    def read(self):
+        """ Call nvidia-smi (twice) and return the index """
+
+        gpus = runCmd(self.__query_gpu).split('\n')
+
+        # No process: nvidia-smi may return an empty output
+        try:
+            apps = runCmd(self.__query_apps).split('\n')
+        except PlacementException:
+            apps = []
+
+        return self.parse(gpus,apps)
+
+    def parse(self,gpus,apps):
+        """ Parse the outputs (lists of lines) of both commands and return the index """
+
+        index   = {}
+        by_uuid = {}
+        for l in gpus:
+            f = [ x.strip() for x in l.split(',') ]
+            if len(f) < 8:
+                continue
+            gpu = {}
+            gpu['mem_used']  = _number(f[3])
+            gpu['mem_total'] = _number(f[4])
+            gpu['util']      = _number(f[5])
+            gpu['pwr_used']  = _number(f[6])
+            gpu['pwr_limit'] = _number(f[7])
+            gpu['processes'] = []
+            index[self.__minorNumber(f[1],int(f[0]))] = gpu
+            by_uuid[f[2]] = gpu
+
+        for l in apps:
+            f = [ x.strip() for x in l.split(',') ]
+            if len(f) < 3 or not f[0] in by_uuid:
+                continue
+            mem = _number(f[2])
+            if mem == None:
+                mem = 0
+            by_uuid[f[0]]['processes'].append([int(f[1]),int(mem)*1048576])
+
+        return index
+
+    def __minorNumber(self,bus_id,default):
+        """ Read the minor number from the driver information, return default if not found
+            nvidia-smi prints 00000000:04:00.0, the driver directory is 0000:04:00.0 """
+
+        bus_id = bus_id.lower()
+        for d in (bus_id, bus_id[4:]):
+            try:
+                with open(self.__driver_root + '/' + d + '/information','r') as f:
+                    for l in f:
+                        if l.startswith('Device Minor:'):
+                            return int(l.split(':')[1])
+            except (OSError,ValueError):
+                pass
+        return default
@@ -26,14 +26,19 @@
 
 import os
 import re
+import sys
+import json
+import hashlib
 import configparser
 from exception import *
-from utilities import  expandNodeList, getHostnameRem, flatten, runCmd
+from utilities import  expandNodeList, getHostnameRem, flatten, runCmd, compactString2List, getCacheDir, Timings
+from hostindex import HostIndex
 
 class Hardware(object):
     """ Describing hardware configuration 
     
     This file uses placement.conf to guess the correct hardware configuration, using some environment variables
+    If the host is not described by placement.conf, the configuration is detected from sysfs (see SysfsHardware)
     The private member IS_SHARED describes the fact that the HOST is SHARED between users (if True) or exclusively dedicated (if False) to the job
     It is not strictly hardware consideration, but as it never changes during the node lifetime, it makes sense considering it as a hardware parameter
     WARNING FOR SLURM ADMINS - IS_SHARED means here "The NODE is shared", NOT the Resource. 
@@ -61,6 +66,8 @@ class Hardware(object):
         hosts      = config.options('hosts')
         archis     = config.sections();
         archis.remove('hosts')
+        if 'sysfs' in archis:
+            archis.remove('sysfs')
         return [hosts,archis]
 
     @staticmethod
@@ -73,8 +80,26 @@ class Hardware(object):
         if os.path.exists(conf_file):
             config.read(conf_file)        
 
+        # PLACEMENT_ARCHI=sysfs: force the detection from sysfs
+        placement_archi = os.environ.get('PLACEMENT_ARCHI','').strip()
+        if placement_archi == 'sysfs':
+            return SysfsHardware(is_shared=SysfsHardware.isShared(config))
+
         # 2nd stage: Guess the architecture name from the env variables
-        archi_name = Hardware.__guessArchiName(conf_file,config)
+        #            If the host is not described by the configuration, the hardware is detected from sysfs,
+        #            but not if PLACEMENT_ARCHI was set (probably a typo)
+        try:
+            archi_name = Hardware.__guessArchiName(conf_file,config)
+        except PlacementException as e:
+            if placement_archi != '':
+                raise e
+            try:
+                archi = SysfsHardware(is_shared=SysfsHardware.isShared(config))
+            except PlacementException:
+                raise e
+            sys.stderr.write("WARNING - " + getHostnameRem() + " is not described by " + conf_file + ", the hardware is detected from sysfs ("
+                             + ("shared" if archi.IS_SHARED else "exclusive") + " node, see the section [sysfs])\n")
+            return archi
 
         # 3rd stage: Create and return the object from its name
         archi = SpecificHardware(conf_file,config,archi_name)
@@ -117,7 +142,7 @@ class Hardware(object):
         # Archi not yet guessed, trying to guess from the hostname
         node = getHostnameRem()
         if archi_name == None:
-            archi_name = Hardware.__hostname2Archi(config, node)
+            archi_name = Hardware.__hostname2Archi(conf_path, config, node)
             
         if archi_name == None:
             msg = "ERROR - Could not guess the architecture from the hostname (" + node + ") - ";
@@ -130,22 +155,19 @@ class Hardware(object):
         return archi_name
 
     @staticmethod
-    def __hostname2Archi(config, host):
+    def __hostname2Archi(conf_path, config, host):
         """ return the architecture name from the hostname, using the configuration
         Each option is a list of hosts: try to find a list of hosts we could be a part of
         When found return the corresponding value
         If nothing found, return None
+        The lists of hosts are compiled (see HostIndex), they are not expanded
 
         Arguments:
-        config A ConfigParser object
-        host   A hostname
+        conf_path The config path, used to cache the compiled lists of hosts
+        config    A ConfigParser object
+        host      A hostname
         """
-        if config.has_section('hosts')==True:
-            options = config.options('hosts')
-            for o in options:
-                if host in expandNodeList(o):
-                    return config.get('hosts',o)
-        return None
+        return HostIndex.load(conf_path,config).find(host)
 
     def getCore2Socket(self,core):
         """ Return the socket number from the core number
@@ -175,8 +197,9 @@ class Hardware(object):
         
         if self.REVADDRESSING==None:
             return addr
-        else:
-            return self.REVADDRESSING[addr]
+        if addr >= len(self.REVADDRESSING) or self.REVADDRESSING[addr] == -1:
+            raise PlacementException("ERROR - The cpu " + str(addr) + " is not known by the hardware description (offline ?)")
+        return self.REVADDRESSING[addr]
         
     def getCore2Core(self,core):
         """ Return the physical socket core number from the node core number
@@ -358,3 +381,157 @@ class SpecificHardware(Hardware):
                 sock_cnt += 1
         
         return flatten(rvl)
+
+#
+# SysfsHardware: the hardware is described by the kernel, no configuration needed
+#
+# The sockets, cores and threads are read from /sys/devices/system/cpu/cpu*/topology (physical_package_id, thread_siblings_list),
+# the memory from /sys/devices/system/node/node*/meminfo (or /proc/meminfo if there is no numa node)
+# The cores of a socket are sorted by their first thread, the threads of a core by number: the addressing is built from
+# this order, numactl is not called
+# Only regular topologies are supported: the same number of cores on each socket, the same number of threads on each core
+# The node is supposed to be exclusive, unless PLACEMENT_IS_SHARED=True or IS_SHARED: True in the section [sysfs] of placement.conf
+#
+# The model is kept in the cache directory (see getCacheDir), it is read again only if the online cpus or the boot id change
+# PLACEMENT_SYSROOT replaces / (useful for testing)
+#
+
+class SysfsHardware(Hardware):
+    """ Class deriving from Hardware, uses the topology of sysfs """
+
+    def __init__(self,sysroot=None,cache_dir=None,is_shared=False):
+        """ sysroot   = replaces /, default $PLACEMENT_SYSROOT
+            cache_dir = the cache directory, default getCacheDir(), '' = no cache
+            is_shared = IS_SHARED (see isShared) """
+
+        if sysroot == None:
+            sysroot = os.environ.get('PLACEMENT_SYSROOT','')
+        if cache_dir == None:
+            cache_dir = getCacheDir()
+
+        model = None
+        key   = [os.path.abspath(sysroot + '/'),SysfsHardware.__readFile(sysroot + '/proc/sys/kernel/random/boot_id'),
+                 SysfsHardware.__readFile(sysroot + '/sys/devices/system/cpu/online')]
+        cache_file = None
+        if cache_dir != None and cache_dir != '':
+            cache_file = cache_dir + '/topology-' + hashlib.md5(key[0].encode()).hexdigest()[0:12] + '.json'
+            try:
+                with open(cache_file,'r') as f:
+                    cached = json.load(f)
+                if cached['key'] == key:
+                    Timings.count('topology_cache_hits')
+                    model = cached['model']
+            except (OSError,ValueError,KeyError,TypeError):
+                pass
+
+        if model == None:
+            model = SysfsHardware.scan(sysroot)
+            if cache_file != None:
+                try:
+                    tmp = cache_file + '.' + str(os.getpid())
+                    with open(tmp,'w') as f:
+                        json.dump({'key':key, 'model':model},f)
+                    os.replace(tmp,cache_file)
+                except OSError:
+                    pass
+
+        self.NAME             = 'sysfs'
+        self.SOCKETS_PER_NODE = model['SOCKETS_PER_NODE']
+        self.CORES_PER_SOCKET = model['CORES_PER_SOCKET']
+        self.THREADS_PER_CORE = model['THREADS_PER_CORE']
+        self.HYPERTHREADING   = self.THREADS_PER_CORE > 1
+        self.MEM_PER_SOCKET   = model['MEM_PER_SOCKET']
+        self.IS_SHARED        = is_shared
+        self.CORES_PER_NODE   = self.CORES_PER_SOCKET*self.SOCKETS_PER_NODE
+        if model['ADDRESSING'] != None:
+            self.ADDRESSING    = model['ADDRESSING']
+            self.REVADDRESSING = [ -1 for i in range(max(self.ADDRESSING)+1) ]
+            for i in range(len(self.ADDRESSING)):
+                self.REVADDRESSING[self.ADDRESSING[i]] = i
+
+    @staticmethod
+    def isShared(config):
+        """ Return IS_SHARED for the hardware detected from sysfs: $PLACEMENT_IS_SHARED, else IS_SHARED in the section [sysfs]
+            of the configuration, else False """
+
+        if 'PLACEMENT_IS_SHARED' in os.environ:
+            return os.environ['PLACEMENT_IS_SHARED'].strip().lower() in ('1','true','yes','on')
+        try:
+            if config.has_section('sysfs') and config.has_option('sysfs','IS_SHARED'):
+                return config.getboolean('sysfs','IS_SHARED')
+        except ValueError as e:
+            raise PlacementException("ERROR - Something is wrong in the section [sysfs] of the configuration - " + str(e))
+        return False
+
+    @staticmethod
+    def __readFile(path):
+        """ Return the content of a file, stripped, or None if it cannot be read """
+        try:
+            with open(path,'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    @staticmethod
+    def scan(sysroot=''):
+        """ Read the topology and return the model: a dict SOCKETS_PER_NODE, CORES_PER_SOCKET, THREADS_PER_CORE, MEM_PER_SOCKET (Mb),
+            ADDRESSING (the cpu number of each core of the internal representation, None if they are equal) """
+
+        cpu_dir = sysroot + '/sys/devices/system/cpu'
+        online  = SysfsHardware.__readFile(cpu_dir + '/online')
+        if online != None:
+            cpus = compactString2List(online)
+        elif os.path.isdir(cpu_dir):
+            cpus = sorted([ int(d[3:]) for d in os.listdir(cpu_dir) if re.match('^cpu[0-9]+$',d) ])
+        else:
+            raise PlacementException("ERROR - " + cpu_dir + " not found, cannot detect the hardware")
+
+        # socket => first thread of the core => list of the threads
+        sockets     = {}
+        online_cpus = set(cpus)
+        for cpu in cpus:
+            topology = cpu_dir + '/cpu' + str(cpu) + '/topology'
+            package  = SysfsHardware.__readFile(topology + '/physical_package_id')
+            siblings = SysfsHardware.__readFile(topology + '/thread_siblings_list')
+            if package == None or siblings == None:
+                raise PlacementException("ERROR - " + topology + " not found, cannot detect the hardware")
+            threads = [ t for t in compactString2List(siblings) if t in online_cpus ] or [cpu]
+            sockets.setdefault(int(package),{}).setdefault(min(threads),set()).add(cpu)
+
+        cores   = [ [ sorted(sockets[s][c]) for c in sorted(sockets[s]) ] for s in sorted(sockets) ]
+        nb_cores   = set([ len(s) for s in cores ])
+        nb_threads = set([ len(c) for s in cores for c in s ])
+        if len(nb_cores) != 1 or len(nb_threads) != 1:
+            raise PlacementException("ERROR - The topology of " + cpu_dir + " is not regular (cores/socket = " + str(sorted(nb_cores)) + ", threads/core = " + str(sorted(nb_threads)) + ") - Please describe the hardware in placement.conf")
+
+        model = {'SOCKETS_PER_NODE':len(cores), 'CORES_PER_SOCKET':nb_cores.pop(), 'THREADS_PER_CORE':nb_threads.pop()}
+
+        # internal core number = thread * sockets * cores/socket + socket * cores/socket + core
+        addressing = []
+        for t in range(model['THREADS_PER_CORE']):
+            for s in cores:
+                addressing += [ c[t] for c in s ]
+        model['ADDRESSING'] = None if addressing == list(range(len(addressing))) else addressing
+
+        # The memory: sum of the numa nodes, else /proc/meminfo
+        mem_kb   = 0
+        node_dir = sysroot + '/sys/devices/system/node'
+        if os.path.isdir(node_dir):
+            for d in os.listdir(node_dir):
+                if re.match('^node[0-9]+$',d):
+                    mem_kb += SysfsHardware.__memTotal(node_dir + '/' + d + '/meminfo')
+        if mem_kb == 0:
+            mem_kb = SysfsHardware.__memTotal(sysroot + '/proc/meminfo')
+        model['MEM_PER_SOCKET'] = mem_kb // 1024 // model['SOCKETS_PER_NODE']
+
+        return model
+
+    @staticmethod
+    def __memTotal(path):
+        """ Return the MemTotal (kB) of a meminfo file (/proc/meminfo or Node 0 MemTotal: ... kB), 0 if not found """
+
+        content = SysfsHardware.__readFile(path)
+        if content == None:
+            return 0
+        m = re.search(r'MemTotal:\s+([0-9]+)',content)
+        return int(m.group(1)) if m else 0
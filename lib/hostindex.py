@@ -0,0 +1,153 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu-cores
+#
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  Copyright (C) 2015-2018 Emmanuel Courcelle
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+import os
+import json
+import bisect
+import hashlib
+from exception import *
+from utilities import getCacheDir,Timings,NodeSet
+
+#
+# The [hosts] section of placement.conf, compiled: host name => architecture name
+#
+# Each host list (ex: node[0001-9999]) is compiled to a NodeSet (see utilities.py), the host lists are never expanded
+# The shapes with one number (ex: node[0001-0100]) are grouped by shape, the intervals of each group are sorted:
+# the host is found by binary search, even if there are thousands of lines in the [hosts] section
+# The matching rules are those of expandNodeList: node[1-100] matches node7, node[001-100] matches node007 but not node7
+#
+# The compiled index is kept in the cache directory (see getCacheDir), it is rebuilt when placement.conf is modified
+#
+
+CACHE_VERSION = 2
+
+class HostIndex(object):
+    """ Find the architecture of a host, from the [hosts] section of the configuration """
+
+    def __init__(self,hosts,patterns=None):
+        """ hosts    = a list of (host list, architecture name), in the order of the configuration file
+            patterns = the compiled host lists, replaces hosts if not None (see fromJson) """
+
+        if patterns == None:
+            patterns = [ (NodeSet(h).shapes(),a) for (h,a) in hosts ]
+        self.__patterns = patterns
+
+        # The shapes with 1 number: key = (literals,widths), val = (lows,max highs,intervals), sorted by low
+        # The host lists with other shapes (ex: n[1-2]-ib[3-4]) are kept in __others
+        groups = {}
+        self.__others = []
+        for (order,(shapes,archi)) in enumerate(patterns):
+            for (literals,widths,boxes) in shapes:
+                if len(widths) != 1:
+                    self.__others.append((order,NodeSet.fromShapes(shapes),archi))
+                    break
+                for box in boxes:
+                    for (low,high) in box[0]:
+                        groups.setdefault((tuple(literals),tuple(widths)),[]).append((low,high,order,archi))
+
+        self.__groups = {}
+        for key in groups:
+            intervals = sorted(groups[key])
+            max_highs = []
+            for i in intervals:
+                max_highs.append(max(i[1],max_highs[-1]) if len(max_highs) > 0 else i[1])
+            self.__groups[key] = ([ i[0] for i in intervals ],max_highs,intervals)
+
+    def find(self,host):
+        """ Return the architecture name of host, or None
+            If several host lists match, the first one in the configuration file wins """
+
+        best = None
+        (literals,widths,values) = NodeSet.splitName(host)
+        if len(values) == 1 and (literals,widths) in self.__groups:
+            (lows,max_highs,intervals) = self.__groups[(literals,widths)]
+            value = values[0]
+
+            # The intervals are sorted by low: look backwards from the last one starting before value
+            i = bisect.bisect_right(lows,value) - 1
+            while i >= 0 and max_highs[i] >= value:
+                (low,high,order,archi) = intervals[i]
+                if value <= high and (best == None or order < best[0]):
+                    best = (order,archi)
+                i -= 1
+
+        for (order,nodeset,archi) in self.__others:
+            if best != None and order > best[0]:
+                break
+            if host in nodeset:
+                return archi
+
+        if best == None:
+            return None
+        return best[1]
+
+    def toJson(self):
+        return json.dumps(self.__patterns)
+
+    @staticmethod
+    def fromJson(data):
+        return HostIndex(None,[ (segments,archi) for (segments,archi) in json.loads(data) ])
+
+    @staticmethod
+    def load(conf_file,config,cache_dir=None):
+        """ Return the HostIndex of the configuration (a ConfigParser object, read from conf_file)
+            The index is read from the cache if conf_file was not modified, else it is compiled and saved
+            cache_dir = the cache directory, default getCacheDir(), '' = no cache """
+
+        hosts = []
+        if config.has_section('hosts'):
+            hosts = config.items('hosts')
+
+        if cache_dir == None:
+            cache_dir = getCacheDir()
+        if cache_dir == None or cache_dir == '' or conf_file == None:
+            return HostIndex(hosts)
+
+        try:
+            st  = os.stat(conf_file)
+            key = [os.path.abspath(conf_file),st.st_mtime_ns,st.st_size,CACHE_VERSION]
+        except OSError:
+            return HostIndex(hosts)
+
+        cache_file = cache_dir + '/hosts-' + hashlib.md5(key[0].encode()).hexdigest()[0:12] + '.json'
+        try:
+            with open(cache_file,'r') as f:
+                cached = json.load(f)
+            if cached['key'] == key:
+                Timings.count('hostindex_cache_hits')
+                return HostIndex.fromJson(json.dumps(cached['patterns']))
+        except (OSError,ValueError,KeyError,TypeError):
+            pass
+
+        index = HostIndex(hosts)
+        try:
+            tmp = cache_file + '.' + str(os.getpid())
+            with open(tmp,'w') as f:
+                f.write('{"key": ' + json.dumps(key) + ', "patterns": ' + index.toJson() + '}')
+            os.replace(tmp,cache_file)
+        except OSError:
+            pass
+        return index
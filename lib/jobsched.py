@@ -64,6 +64,12 @@ class JobSched(object):
 		
         return "INTERNAL ERROR - ABSTRACT CLASS !!!!!"
 
+    def findPidsFromJob(self,jobid):
+        """Return the list of pids belonging to the job on this node, 
+           or None if the job scheduler cannot tell (then all the processes must be considered)"""
+
+        return None
+
     def findTagFromJob(self,jobid):
         """Return a 'jobtag' from the job number, or 0 if the job number is not found
            the map: self._job2tag is built by the derived classes"""
@@ -0,0 +1,130 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu-cores
+#
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  Copyright (C) 2015-2018 Emmanuel Courcelle
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from exception import *
+from utilities import runCmd
+
+#
+# The memory used by each process on each numa node (in Mb), ie the Total line of numastat <pid>
+#
+# NumaMemCollector reads /proc/<pid>/numa_maps (this is what numastat does), through a bounded pool of threads
+# numastat is called only if numa_maps does not exist
+#
+
+NUMAMEM_WORKERS = 8
+
+def parseNumastat(lines,sockets):
+    """ Parse the output of numastat <pid> (a list of lines), return a list of floats (1 per socket)
+        Return None if the last line is not the Total line (probably a permission problem)
+    """
+
+    # Keep only last line (should Total=)
+    ttl = lines[-1].split()
+
+    # If the first word does not start with Total, we have a problem ! (probably a permission problem)
+    if len(ttl) == 0 or not ttl[0].lower().startswith('total'):
+        return None
+
+    # remove first and last columns
+    ttl.pop()
+    ttl.pop(0)
+    ttl = list(map(float,ttl))
+
+    # We must have same number of numbers / sockets !
+    if sockets != len(ttl):
+        raise PlacementException("INTERNAL ERROR - numastat returns " + str(len(ttl)) + " columns, but we have " + str(sockets) + " sockets !")
+    return ttl
+
+class NumaMemCollector(object):
+    """ Collect the memory used by a set of processes on each numa node """
+
+    def __init__(self,sockets,proc_root='/proc',workers=NUMAMEM_WORKERS):
+        self.__sockets   = sockets
+        self.__proc_root = proc_root
+        self.__workers   = workers
+
+    def collect(self,pids):
+        """ Return a dict: key = pid, val = a list of floats (Mb used on each socket)
+            The pids we do not have permission to look at are absent from the dict
+        """
+
+        pids = list(pids)
+        if len(pids) == 0:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(self.__workers,len(pids))) as pool:
+            numamems = list(pool.map(self.__collectPid,pids))
+
+        return { pid:mem for (pid,mem) in zip(pids,numamems) if mem != None }
+
+    def __collectPid(self,pid):
+        """ Return the list of Mb used by the process pid on each socket, or None """
+
+        try:
+            return self.readNumaMaps(pid)
+        except FileNotFoundError:
+            if os.path.isdir(self.__proc_root + '/' + str(pid)):
+                return self.__callNumastat(pid)
+            return None
+        except OSError:
+            # PermissionError, or the process exited while numa_maps was read (ProcessLookupError, ESRCH)
+            return None
+
+    def readNumaMaps(self,pid):
+        """ Sum the pages on each node, for each line of /proc/<pid>/numa_maps:
+            7f2b4c000000 default anon=5 dirty=5 N0=3 N1=2 kernelpagesize_kB=4
+        """
+
+        pages = [ 0 for s in range(self.__sockets) ]
+        with open(self.__proc_root + '/' + str(pid) + '/numa_maps','r') as f:
+            for line in f:
+                page_size = 4
+                nodes     = []
+                for field in line.split():
+                    if field[0] == 'N':
+                        (node,sep,nb) = field[1:].partition('=')
+                        if sep == '=' and node.isdigit():
+                            nodes.append((int(node),int(nb)))
+                    elif field.startswith('kernelpagesize_kB='):
+                        page_size = int(field[18:])
+
+                for (node,nb) in nodes:
+                    if node >= self.__sockets:
+                        raise PlacementException("INTERNAL ERROR - numa_maps shows node " + str(node) + ", but we have " + str(self.__sockets) + " sockets !")
+                    pages[node] += nb * page_size
+
+        # kB => Mb, rounded as numastat does
+        return [ round(p/1024.0,2) for p in pages ]
+
+    def __callNumastat(self,pid):
+        try:
+            tmp = runCmd('numastat ' + str(pid)).split('\n')
+        except PlacementException:
+            return None
+        tmp.pop()
+        return parseNumastat(tmp,self.__sockets)
@@ -92,11 +92,12 @@ import sys
 import argparse
 from exception import *
 from front import *
+from agent import AGENT_PORT
 
-PLACEMENT_VERSION = "1.14.4"
+PLACEMENT_VERSION = "1.15.0"
 
-def params():
-    """Parse the command line and return a tuple:
+def params(argv=None):
+    """Parse the command line (or argv, if not None) and return a tuple:
        - options (the result of the parse)
        - FrontNode (the FrontNode object, depends on the environment variable PLACEMENT_EXTERNALS)
     """
@@ -106,7 +107,34 @@ def params():
         externals = os.environ['PLACEMENT_EXTERNALS'].strip().split(' ')
 
     fn = FrontNode(externals)
+
+    if argv == None:
+        argv = sys.argv
+    parser  = buildParser(fn)
+    options = parser.parse_args(argv[1:])
+    
+    if options.sample_window != None and options.sample_window <= 0:
+        parser.error("--sample_window: a positive number of seconds is expected")
+
+    # mpi_aware = force mode to numactl
+    if options.mpiaware:
+        options.output_mode="numactl"
+
+    # If necessary, add the jobid attribute
+    if not hasattr(options,'jobid'):
+        options.jobid = None
+    if not hasattr(options,'jobids'):
+        options.jobids = None
         
+    fn.setOptions(options,argv)
+
+    #print("coucou "+options.check)
+    
+    return (options, fn)
+
+def buildParser(fn):
+    """Return the parser of the command line, some switches depend on the job scheduler of fn"""
+
     # Analyzing the command line arguments
     epilog = 'Do not forget to check your environment variables (--environ) and the currently configured hardware (--hard) !'
     parser = argparse.ArgumentParser(description="placement " + PLACEMENT_VERSION,epilog=epilog)
@@ -119,8 +147,13 @@ def params():
     if fn.getJobSchedName() != "":
         group.add_argument("--checkme",dest='checkme',action="store_true",help="Check my running job")
         group.add_argument("--jobid",dest='jobid',action="store",type=int,help="Check this running job")
+        group.add_argument("--jobids",dest='jobids',action="store",type=str,help="With --check --summary: print one summary per job for these jobs (a comma separated list) running on this node")
+        group.add_argument("--all_nodes",dest='all_nodes',action="store_true",default=False,help="With --jobid or --checkme: check every node of the job, print a summary per node and the details for the nodes with a warning")
     
     group.add_argument("--host",dest='host',action="store",type=str,help="Check those hosts, ex: node[10-15]")
+    group.add_argument("--host_workers",dest='host_workers',action="store",type=int,default=16,help="With --host: number of hosts checked at the same time (16)")
+    group.add_argument("--host_timeout",dest='host_timeout',action="store",type=float,default=60,help="With --host: give up a host after HOST_TIMEOUT seconds (60)")
+    group.add_argument("--host_unordered",dest='host_unordered',action="store_true",default=False,help="With --host: print the output of each host as soon as it is available, not in the order of the hosts")
 
     group = parser.add_argument_group('Displaying some information')
     group.add_argument("-I","--hardware",dest='show_hard',action="store_true",help="Show the currently selected hardware and leave")
@@ -153,6 +186,11 @@ def params():
     parser.add_argument("-t","--sorted_threads_cores",action="store_true",default=True,help="With --threads: sort the threads in core numbers rather than pid")
     parser.add_argument("-p","--sorted_processes_cores",action="store_true",default=False,help="With --threads: sort the processes in core numbers rather than pid")
     parser.add_argument("--memory","--memory",action="store_true",default=False,help="With --threads: show memory occupation of each process / socket")
+    parser.add_argument("--use_ps",action="store_true",default=False,dest="use_ps",help="With --check: call ps instead of reading /proc to discover the processes")
+    parser.add_argument("--gpu_csv",action="store_true",default=False,dest="gpu_csv",help="With --check: call nvidia-smi --query-gpu (csv output) instead of nvidia-smi -q -x (xml output)")
+    parser.add_argument("--sample_window","--sample-window",dest="sample_window",action="store",type=float,help="With --check: measure the cpu use of the threads during SAMPLE_WINDOW seconds, instead of the average since their start")
+    parser.add_argument("--agent",dest="agent",action="store",nargs='?',const="127.0.0.1:"+str(AGENT_PORT),help="Run the resident agent (as root), answering the --check requests of the front node, listening on AGENT (host:port or the path of a Unix socket, default 127.0.0.1:" + str(AGENT_PORT) + "). The front node uses only the agents listening on a privileged port")
+    parser.add_argument("--profile",dest="profile",action="store",nargs='?',const="placement",help="Write the cProfile stats and the timings (json) to PROFILE.<host>.prof and PROFILE.<host>.json")
 #    parser.add_argument("-K","--taskset",action="store_true",default=False,help="Do not use this option, not implemented and not useful")
     parser.add_argument("-V","--verbose",action="store_true",default=False,dest="verbose",help="more verbose output can be used with --check and --intel_kmp")
     parser.add_argument("--no_ansi",action="store_true",default=False,dest="noansi",help="Do not use ansi sequences")
@@ -160,22 +198,14 @@ def params():
     
     # Still experimental, not documented
     parser.add_argument("--continuous",action="store_true",default=False,dest="continuous",help=argparse.SUPPRESS)
+    parser.add_argument("--time",action="store",type=int,dest="time",help=argparse.SUPPRESS)
+    parser.add_argument("--store",action="store",dest="store",help=argparse.SUPPRESS)
     parser.add_argument("--pathological",action="store_true",default=False,dest="pathological",help=argparse.SUPPRESS)
+    parser.add_argument("--oneshot",action="store_true",default=False,dest="oneshot",help=argparse.SUPPRESS)
+    parser.add_argument("--daemon",action="store_true",default=False,dest="daemon",help=argparse.SUPPRESS)
+    parser.add_argument("--window",action="store",type=int,dest="window",help=argparse.SUPPRESS)
+    parser.add_argument("--alerts",action="store",dest="alerts",help=argparse.SUPPRESS)
 
     # default is srun
     parser.set_defaults(output_mode="srun")
-    options=parser.parse_args()
-    
-    # mpi_aware = force mode to numactl
-    if options.mpiaware:
-        options.output_mode="numactl"
-
-    # If necessary, add the jobid attribute
-    if not hasattr(options,'jobid'):
-        options.jobid = None
-        
-    fn.setOptions(options,sys.argv)
-
-    #print("coucou "+options.check)
-    
-    return (options, fn)
+    return parser
@@ -28,21 +28,26 @@ import os
 import argparse
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from utilities import *
+from squeue import SqueueSnapshot
+from tsstore import TsStore,TIME_FORMAT
 import hardware
 
 #
 # placement-cont is automatically launched by placement when the switch --continuous is detected
 #
-# It must be used with the --jobid switch
-# The list of compute hosts is detected with squeue, then placement --csv is launched on the hosts (using clush),
-# The program sleeps a while, then launches placement --csv again
-# The program stops when squeue returns an error (because the job is finished), OR when the user sends SIGINT (ctrl-c)
+# It must be used with the --jobid switch, which may be repeated to check several jobs
+# The list of compute hosts is detected with squeue, then placement --csv is launched in parallel on the hosts (using ssh),
+# The measures are repeated every --time seconds (without drift), each line starts with the time and the jobid
+# squeue is called once per measure for all the jobs, a finished job is removed from the list
+# The program stops when every job is finished, OR when the user sends SIGINT (ctrl-c)
 # 
 # You can start this program BEFORE the job is running: it will squeue the jobid until its state goes to R
 #
 
 SLEEPTIMEMIN=30               # Minimum sleep time you can specify (in s)
+HOST_WORKERS=16               # The hosts called in parallel
 
 # The PLACEMENT_ROOT env variable (should be correctly set by the install script)
 placement_root = os.environ['PLACEMENT_ROOT']
@@ -50,15 +55,19 @@ placement_root = os.environ['PLACEMENT_ROOT']
 # Path to the placement shell script
 PLACEMENT=placement_root + '/bin/placement'
 
+# The running jobs
+snapshot = SqueueSnapshot()
+
 def main():
 	# Analysing the command line arguments
 	#epilog = ""
-	ver="1.5.0"
+	ver="1.6.0"
 	parser = argparse.ArgumentParser(description="placement-cont " + ver)
 	group = parser.add_argument_group('continuously checking jobs running on compute nodes')
 	group.add_argument("--continuous",dest='cont',action="store_true",help="required")
-	group.add_argument("-j","--jobid",dest='jobid',action="store",help="Continuously check this running job")
+	group.add_argument("-j","--jobid",dest='jobid',action="append",help="Continuously check this running job (may be repeated)")
 	group.add_argument("--time",dest='time',action='store',type=int,default=SLEEPTIMEMIN,help="Sleeping time between two measures")
+	group.add_argument("--store",dest='store',action='store',help="Append the measures to the binary store STORE (a directory), instead of printing them (see tsstore.py)")
 	group.add_argument("--from-frontal",action="store_true",default=False,dest="ff",help=argparse.SUPPRESS)
 	
 	options=parser.parse_args()
@@ -82,48 +91,72 @@ def main():
 			sys.stderr.write ("ERROR - --time should NOT be lower than " + str(SLEEPTIMEMIN) + "\n")
 			exit(1)
 
-	# Detect the partition, the compute hosts and the user from the jobid
-	[partition,hosts,user] = jobid2hosts(options.jobid)
+	# Detect the partition, the compute hosts and the user of each job
+	jobids = options.jobid
+	jobs   = {}
+	for jobid in jobids:
+		[partition,nodeset,user] = jobid2hosts(jobid)
+		jobs[jobid] = [partition,expandNodeset(nodeset),user]
 
-	sys.stderr.write ("jobid    = "+options.jobid+"\n")
-	sys.stderr.write ("hosts    = "+str(hosts)+"\n")
-	sys.stderr.write ("partition= "+str(partition)+"\n")
-	sys.stderr.write ("user     = "+str(user)+"\n")
+		sys.stderr.write ("jobid    = "+jobid+"\n")
+		sys.stderr.write ("hosts    = "+str(nodeset)+"\n")
+		sys.stderr.write ("partition= "+str(partition)+"\n")
+		sys.stderr.write ("user     = "+str(user)+"\n")
 
-	sys.stderr.write ("Sleeping " + str(options.time) + "s between measures, press CTRL-C to stop !\n\n")
+	sys.stderr.write ("Measuring every " + str(options.time) + "s, press CTRL-C to stop !\n\n")
 	
-	# The printHeaders will create a new hardware, and will use this env variable
-	# callPlacement, too
-	os.environ['PLACEMENT_PARTITION'] = partition
-	printHeaders()
+	# The getColumns will create a new hardware, and will use this env variable
+	# One header per partition
+	columns = {}
+	for jobid in jobids:
+		partition = jobs[jobid][0]
+		if not partition in columns:
+			os.environ['PLACEMENT_PARTITION'] = partition
+			columns[partition] = getColumns()
+			if options.store == None:
+				printHeaders(columns[partition])
+
+	store = None
+	if options.store != None:
+		store = TsStore(options.store)
+		sys.stderr.write ("Writing the measures to " + options.store + "\n")
 
+	# The measures start every options.time seconds, whatever the time spent by the measures
+	ticker = Ticker(options.time)
 	try:
 		while True:
-			if not isRunning(options.jobid):
+			# Timings records every command (see runCmd): forget them at each measure
+			Timings.reset()
+			for jobid in finishedJobs(jobs):
+				sys.stderr.write ("job " + jobid + " is finished\n")
+				del jobs[jobid]
+			if len(jobs) == 0:
 				exit(0)
-			callPlacement(partition, hosts, user)
-			time.sleep(SLEEPTIMEMIN)
+			callPlacement(jobs, options.time, columns, store)
+			skipped = ticker.wait()
+			if skipped > 0:
+				sys.stderr.write ("WARNING - The measures last more than " + str(options.time) + "s, " + str(skipped) + " measure(s) skipped\n")
 	except KeyboardInterrupt:
 		exit(0)
 
 #
-# Is the job still running ?
+# Return the list of the finished jobs (ie not found in the squeue snapshot)
+# squeue is called once for all the jobs
 #
-# input = jobid
-# output = True/False
+# input = the jobs (a dict, key = jobid)
+# output = a list of jobids
 #
-def isRunning(jobid):
-	cmd = ['squeue','-j',str(jobid),'-o','%t','-h']
+def finishedJobs(jobs):
 	try:
-		out=runCmd(cmd).rstrip('\n')
-		return (out=='R')
+		running = set(snapshot.getJobIds())
 	except PlacementException:
-		return False
+		return list(jobs.keys())
+	return [ j for j in jobs if not j in running ]
 	
 #
-# Guess the hardware using the env var PLACEMENT_PARTITION, and print the headers of the csv
+# Guess the hardware using the env var PLACEMENT_PARTITION, and return the names of the columns of placement --csv
 #
-def printHeaders():
+def getColumns():
 	hard = '';
 	try:
 		hard = hardware.Hardware.factory()
@@ -132,32 +165,83 @@ def printHeaders():
 		print (e)
 		exit(1)
 	
-	h='nodename,';
+	columns = []
 	for c in range(0,hard.CORES_PER_NODE):
-		h += 'CPU'
-		h += str(c)
-		h += ','
-	h += 'MEM,'
+		columns.append('CPU' + str(c))
+	columns.append('MEM')
 	
 	gpus=hard.GPUS
 	if gpus != None:
 		gpus=compactString2List(gpus)
 		for g in gpus:
-			h +='GPU'+str(g)+'_U'+','
-			h +='GPU'+str(g)+'_M'+','
-			h += 'GPU'+str(g)+'_P'+','
+			columns.append('GPU'+str(g)+'_U')
+			columns.append('GPU'+str(g)+'_M')
+			columns.append('GPU'+str(g)+'_P')
 	
-	print((h.replace(' ','')))
+	return columns
 
 #
-# Call placement on a list of hosts, using clush and print the result
+# Print the headers of the csv
 #
-def callPlacement(partition, hosts, user):
-	cmd=['clush','-w',hosts,PLACEMENT,'--check',user,'--csv']	# 
-	out=runCmd(cmd).rstrip('\n').split(': ')	# totocomp: 100,100,100,99,... -> ['totocomp: ','100','100',...]
-	out=','.join(out)                                           # 'totocomp,100,100,100,99,...
-	print(out)
-	
+def printHeaders(columns):
+	print('time,jobid,nodename,' + ','.join(columns) + ',')
+
+#
+# Call placement on every host of the jobs, in parallel, and print the result
+# Each host is called once per job: on a shared node, only the processes of the job are measured
+# A host which does not answer after timeout seconds is ignored for this measure
+# The ssh connections are kept between two calls (see SshMux)
+#
+# input = the jobs (a dict, key = jobid, val = [partition, list of hostnames, user])
+#         the timeout (in s)
+#         the columns of each partition
+#         the store, or None (print the result)
+#
+def callPlacement(jobs, timeout, columns, store=None):
+	t         = time.time()
+	timestamp = time.strftime(TIME_FORMAT,time.localtime(t))
+	calls     = []
+	for jobid in jobs:
+		[partition,hosts,user] = jobs[jobid]
+		for host in hosts:
+			calls.append((host,user,jobid))
+
+	with ThreadPoolExecutor(max_workers=min(HOST_WORKERS,len(calls))) as pool:
+		outputs = dict(zip(calls,pool.map(lambda c: callPlacementHost(c[0],c[1],c[2],timeout),calls)))
+
+	for jobid in jobs:
+		[partition,hosts,user] = jobs[jobid]
+		for host in hosts:
+			out = outputs[(host,user,jobid)]
+			if out == None:
+				continue
+			if store == None:
+				print(timestamp + ',' + jobid + ',' + host + ',' + out)
+				continue
+			try:
+				values = [ float(v) if v.strip() != '' else None for v in out.rstrip(',').split(',') ]
+				store.append(jobid,host,t,values,{'partition':partition, 'columns':columns[partition]})
+			except (ValueError,PlacementException) as e:
+				sys.stderr.write ("WARNING - " + host + ": " + str(e) + "\n")
+	sys.stdout.flush()
+
+#
+# Call placement --check user --jobid jobid --csv on host, return the csv line or None
+#
+def callPlacementHost(host, user, jobid, timeout):
+	try:
+		out = runCmd([PLACEMENT,'--check',user,'--jobid',jobid,'--csv','--from-frontal'],host,timeout)
+	except PlacementException as e:
+		sys.stderr.write ("WARNING - " + host + ": " + str(e) + "\n")
+		return None
+
+	# placement --jobid prints the line jobid xxx before the csv line
+	lines = [ l for l in out.split('\n') if l.strip() != '' and not l.startswith('jobid ') ]
+	if len(lines) == 0:
+		sys.stderr.write ("WARNING - " + host + ": no measure for the job " + jobid + "\n")
+		return None
+	return lines[-1]
+
 
 #
 # Detect and return the list of hosts corresponding to a jobid
@@ -169,7 +253,15 @@ def callPlacement(partition, hosts, user):
 #
 def jobid2hosts(jobid):
 
-	# Call squeue to know the list of compute nodes for this job
+	# Look for the job in the snapshot of the running jobs (shared with the other placement processes)
+	try:
+		job = snapshot.findJob(jobid)
+	except PlacementException:
+		job = None
+	if job != None:
+		return [job[2],job[3],job[1]]
+
+	# Not running: call squeue to know if the job is pending
 	cmd = ['squeue','-o','"%t@%P@%R@%u','-h','-j',str(jobid)]
 
 	while(True):
@@ -28,20 +28,29 @@ import os
 import argparse
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from utilities import *
+from squeue import SqueueSnapshot
+from agent import queryAgent
 import hardware
 from socket import gethostname
 import datetime
+import collections
 
 SLEEPTIMEMIN=3                                                          # Minimum sleep time you can specify (in s)
-SQUEUECMD   =['squeue','-t','R','-p','exclusive','-o','%i','-h']        # The command to send for finding the jobs 
+PARTITION   ='exclusive'                                               # The partition of the jobs to check
 #
 # placement-patho is automatically launched by the bash call script when the switch --pathological is detected
 #
-# It uses squeue to get the list of running jobs, then for each job it runs placement --summary.
+# It uses squeue to get the list of running jobs, then it runs placement --summary on the first node of each job
+# The jobs are grouped by node: placement is started once per node (--jobids) and the nodes are checked in parallel
 # It detects the pathological jobs 
 # This is done 5 times, sleeping a while between launches
 # The jobs which were detected EACH TIME  as pathological are printed with the summary message
+# The ssh connections to the compute nodes are shared by the successive placement --summary (see utilities.SshMux)
+#
+# With --daemon, the running jobs are checked every --time seconds until ctrl-c, the last --window summaries of each job are kept
+# and the jobs pathological during the whole window are printed as soon as they are detected
 #
 # It may be a good idea then to have a look to these jobs, with placement --threads, or placement --continuous to understand
 # what happens with them
@@ -63,9 +72,14 @@ def main():
 	group.add_argument("--pathological",dest='patho',action="store_true",help="required")
 	group.add_argument("--time",dest='time',action='store',type=int,default=SLEEPTIMEMIN,help="Sleeping time between two measures")
 	group.add_argument("--oneshot",dest='oneshot',action='store_true',help="Check one time and leave")
+	group.add_argument("--daemon",dest='daemon',action='store_true',help="Check the running jobs every TIME seconds, until ctrl-c, and print the jobs pathological during the last WINDOW measures")
+	group.add_argument("--window",dest='window',action='store',type=int,default=5,help="With --daemon: number of measures used to detect a pathological job (5)")
+	group.add_argument("--alerts",dest='alerts',action='store',help="With --daemon: append the pathological jobs to this file")
 	parser.add_argument("--cpu_threshold",dest="cpu_thr",action="store",type=int,default=50,help="Threshold to consider the cpu use as \"low\" ")
 	parser.add_argument("--mem_threshold",dest="mem_thr",action="store",type=int,default=80,help="Threshold to consider the mem allocated as \"high\" ")
 	parser.add_argument("--show_depop","--show_depop",action="store_true",default=False,help="Show as pathological the depopulated jobs, ie jobs with low cpu use and high memory allocation")
+	parser.add_argument("--host_workers",dest='host_workers',action="store",type=int,default=16,help="Number of nodes checked at the same time (16)")
+	parser.add_argument("--host_timeout",dest='host_timeout',action="store",type=float,default=60,help="Give up a node after HOST_TIMEOUT seconds (60)")
 
 	
 	options=parser.parse_args()
@@ -81,17 +95,25 @@ def main():
 			sys.stderr.write ("ERROR - --time should NOT be lower than " + str(SLEEPTIMEMIN) + "\n")
 			exit(1)
 
+	if options.window < 1:
+		sys.stderr.write ("ERROR - --window should be at least 1\n")
+		exit(1)
+
+	if options.daemon:
+		runDaemon(options)
+
 	# Get the list of running jobs
 	running_jobs = detectRunningJobs()
 
 	#
 	# Do 5 times:
-	#	- Call placement --jobid --summary for each running job
+	#	- Call placement --jobids --summary once for each node, with the list of the jobs running on it
 	#	- Wait options.time
 	#
 	# NOTE - We are looking for jobs remaining pathological for the 5 iterations
 	#        So we do not consider jobs starting after the first iteration, 
 	#        as well as jobs finishing after the last iteration
+	#        The iterations 2 to 5 check only the jobs found pathological by the previous iteration, and we stop if there is none
 	if options.oneshot:
 		N = 1
 	else:
@@ -116,10 +138,15 @@ def main():
 	sys.stderr.write("  | \____________ Overlap status N = normal, O = Overlap\n")
 	sys.stderr.write("  \______________ Time to poll the node (s)\n")
 
-	sys.stderr.write("\nNow checking " + str(len(running_jobs)) + " running jobs. Please be patient\n")
+	nb_jobs = sum([ len(j) for j in running_jobs.values() ])
+	sys.stderr.write("\nNow checking " + str(nb_jobs) + " running jobs on " + str(len(running_jobs)) + " nodes. Please be patient\n")
 	for i in range(N):
 		res = callPlacementSummary(running_jobs,options)
 		results.append(res)
+		running_jobs = keepSuspects(running_jobs,res)
+		if len(running_jobs) == 0:
+			sys.stderr.write("Found 0 pathological jobs, stopping\n\n")
+			break
 		if i < N-1:
 			sys.stderr.write("Found " + str(len(res)) + " pathological jobs, now waiting for a while\n")
 			time.sleep(options.time)
@@ -173,57 +200,201 @@ def printHeaders(N):
 	
 	
 		
+#
+# runDaemon
+#
+# Check the running jobs every options.time seconds, until ctrl-c
+# The last options.window summaries of each job are kept, a job is printed (and appended to options.alerts)
+# when its options.window last summaries are pathological, then once again when it is back to normal
+# Each node is called once per measure, for all the jobs running on it
+#
+def runDaemon(options):
+	sys.stderr.write("Checking the running jobs every " + str(options.time) + "s, a job is pathological if its last " + str(options.window) + " summaries are pathological\n")
+	sys.stderr.write("Press CTRL-C to stop !\n\n")
+
+	snapshot = SqueueSnapshot()
+	windows  = {}		# key = jobid, val = a deque of the last summaries (see parseSummary)
+	alerted  = set()	# The jobs already printed
+	ticker   = Ticker(options.time)
+	try:
+		while True:
+			# Timings records every command (see runCmd): forget them at each tick, the daemon runs for weeks
+			Timings.reset()
+			try:
+				running_jobs = detectRunningJobs(snapshot)
+			except PlacementException as e:
+				sys.stderr.write("WARNING - " + str(e) + "\n")
+				running_jobs = {}
+
+			# Forget the finished jobs
+			running = set([ j for jobids in running_jobs.values() for j in jobids ])
+			for j in list(windows.keys()):
+				if not j in running:
+					del windows[j]
+					alerted.discard(j)
+
+			now = time.time()
+			for (j,summary) in callPlacementSummaries(running_jobs,options).items():
+				sample = parseSummary(summary)
+				if sample == None:
+					continue
+				sample['time'] = now
+				windows.setdefault(j,collections.deque(maxlen=options.window)).append(sample)
+				window = windows[j]
+
+				if len(window) == options.window and all([ s['warning'] for s in window ]):
+					if not j in alerted:
+						alerted.add(j)
+						printAlert(options,'PATHOLOGICAL',j,window)
+				elif j in alerted and not sample['warning']:
+					alerted.discard(j)
+					printAlert(options,'NORMAL',j,window)
+
+			ticker.wait()
+	except KeyboardInterrupt:
+		exit(0)
+
+#
+# printAlert
+#
+# Print an alert line: date status jobid node summary1 summary2 ...
+# and append it to options.alerts if specified
+#
+def printAlert(options,status,j,window):
+	line  = str(datetime.datetime.today().replace(microsecond=0)) + ' ' + status + ' ' + j + ' ' + window[-1]['node']
+	line += ' ' + ' '.join([ s['summary'] for s in window ])
+	print(line)
+	sys.stdout.flush()
+	if options.alerts != None:
+		with open(options.alerts,'a') as f:
+			f.write(line + '\n')
+
+#
+# parseSummary
+#
+# input = The output of placement --summary for a job: node 0.1:N:N:80:50:90[:U:M:P...] [W]
+# return= A dict: node, summary, duration, overlap, hyper, cpu, run, mem, gpus (a list of (U,M,P)), warning
+#         None if the summary cannot be parsed (placement error)
+#
+def parseSummary(summary):
+	fields = summary.split(' ')
+	if len(fields) < 2:
+		return None
+	values = fields[1].split(':')
+	if len(values) < 6:
+		return None
+	try:
+		return {
+			'node'    : fields[0],
+			'summary' : fields[1],
+			'duration': float(values[0]),
+			'overlap' : values[1] == 'O',
+			'hyper'   : values[2] == 'H',
+			'cpu'     : int(values[3]),
+			'run'     : int(values[4]),
+			'mem'     : int(values[5]),
+			'gpus'    : [ tuple(values[i:i+3]) for i in range(6,len(values)-2,3) ],
+			'warning' : fields[-1] == 'W'
+		}
+	except ValueError:
+		return None
+
+#
+# keepSuspects
+#
+# input = The running jobs, grouped by node (see detectRunningJobs)
+#         The pathological jobs (see callPlacementSummary)
+# return= The running jobs, grouped by node, keeping only the pathological jobs
+#
+def keepSuspects(running_jobs,res):
+	suspects = {}
+	for node in running_jobs:
+		jobids = [ j for j in running_jobs[node] if j in res ]
+		if len(jobids) > 0:
+			suspects[node] = jobids
+	return suspects
+
 #
 # callPlacementSummary
 #
-# input = The list of running jobs
+# input = The running jobs, grouped by node (see detectRunningJobs)
 # return= A dict:
 #	      key = jobid of a pathological running job
 #         val = The output of placement --summary for each PATHOLOGIC running job
 #               A pathological running job is a job whose summary ends with the letter W
 #				The nonpathological running jobs are filtered out
 #
-def callPlacementSummary(jobids,options):
+# placement is called once per node (placement --jobids), options.host_workers nodes at a time
+#
+def callPlacementSummary(running_jobs,options):
+	summaries = callPlacementSummaries(running_jobs,options)
+	return { j:summaries[j] for j in summaries if summaries[j].endswith('W') }
+
+#
+# callPlacementSummaries
+#
+# input = The running jobs, grouped by node (see detectRunningJobs)
+# return= A dict: key = jobid, val = The output of placement --summary for this job (all the jobs, pathological or not)
+#
+def callPlacementSummaries(running_jobs,options):
+	nodes = list(running_jobs.keys())
+	if len(nodes) == 0:
+		return {}
+
+	with ThreadPoolExecutor(max_workers=min(options.host_workers,len(nodes))) as pool:
+		outs = pool.map(lambda n: callPlacementNode(n,running_jobs[n],options),nodes)
+
 	output = {}
-#	for j in jobids[0:10]:
-	for j in jobids:
-		
-		# Ignore errors in placement --summary, they are probably due to a finished job
-		try:
-			cmd = [PLACEMENT,'--jobid',j,'--summary','--no_ansi']
-			if options.cpu_thr != None:
-				cmd.append('--cpu_threshold')
-				cmd.append(str(options.cpu_thr))
-			if options.mem_thr != None:
-				cmd.append('--mem_threshold')
-				cmd.append(str(options.mem_thr))
-			if options.show_depop != None:
-				cmd.append('--show_depop')
-
-			#print(cmd)				
-			out=runCmd(cmd).rstrip('\n')
-		except PlacementException:
-			pass
-		if out.endswith('W'):
-			output[j] = out
-
-#		if not out.endswith('W'):
-#			print ("j=" + j + "  " + out + " ==> FILTERED OUT")
-#		else:
-#			output[j] = out
-#			print ("j=" + j + "  " + out + " ==> KEPT")
-		
+	for out in outs:
+		for l in out.split('\n'):
+			(j,sep,summary) = l.partition(' ')
+			if summary != '':
+				output[j] = summary
 	return output
+
+#
+# callPlacementNode
+#
+# input = A node and the list of jobs running on it
+# return= The output of placement --jobids --summary: 1 line per job: jobid node summary
+#
+def callPlacementNode(node,jobids,options):
+	cmd = [PLACEMENT,'--check','ALL','--summary','--no_ansi','--jobids',','.join(jobids)]
+	if options.cpu_thr != None:
+		cmd.append('--cpu_threshold')
+		cmd.append(str(options.cpu_thr))
+	if options.mem_thr != None:
+		cmd.append('--mem_threshold')
+		cmd.append(str(options.mem_thr))
+	if options.show_depop:
+		cmd.append('--show_depop')
+	cmd.append('--from-frontal')
+
+	# Use the agent if there is one on this node
+	# Ignore errors in placement --summary, they are probably due to finished jobs
+	try:
+		answer = queryAgent(node,cmd,timeout=options.host_timeout)
+		if answer != None:
+			return answer[1]
+		return runCmd(cmd,node,options.host_timeout)
+	except PlacementException as e:
+		if e.output == None:
+			return ''
+		return e.output
 		
 #
-# detect running jobs from an squeue call
+# detect running jobs from the squeue snapshot (shared with the other placement processes)
 #
-# return the list of jobids
+# return a dict: key = the first node of the job, val = the list of the jobids
 #
-def detectRunningJobs():
-	cmd = SQUEUECMD
-	out = runCmd(cmd).split('\n')
-	return out
+def detectRunningJobs(snapshot=None):
+	if snapshot == None:
+		snapshot = SqueueSnapshot()
+	running_jobs = {}
+	for (jobid,user,partition,nodeset) in snapshot.getJobs():
+		if partition == PARTITION:
+			running_jobs.setdefault(firstNode(nodeset),[]).append(jobid)
+	return running_jobs
 
 if __name__ == "__main__":
     main()
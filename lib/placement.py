@@ -89,6 +89,9 @@ https://www.calmip.univ-toulouse.fr
 
 import os
 import sys
+import time
+import json
+import cProfile
 #import argparse
 from itertools import chain,product
 import hardware
@@ -102,6 +105,7 @@ from utilities import *
 from printing import *
 from front import *
 from params import *
+from agent import *
 
 # ----------------------------------------------------------------------
 #                                Main program
@@ -111,8 +115,17 @@ def main():
 
     # options = The options parsed from the command line
     # fn      = The object FrontNode, encapsulating the job scheduler, if any
-    # args    = The positional arguments
     (options, fn) = params()
+
+    # --profile: run under the control of cProfile
+    if options.profile != None:
+        return profile(options,fn)
+    else:
+        return run(options,fn)
+
+def run(options,fn):
+
+    # args    = The positional arguments
     args=(options.tasks,options.nbthreads)
 
     if options.noansi:
@@ -131,6 +144,9 @@ def main():
         make_mpi_aware()
         return 0
 
+    if options.agent != None:
+        return serveAgent(options)
+
     # If necessary run another exe may be on another host
     try:
         if fn.runPlacement():
@@ -160,6 +176,12 @@ def main():
             show_hard(hard)
             return 0
             
+        # --jobids: one summary per job, the hardware is guessed only once (see --pathological)
+        if options.check != None and options.jobids != None:
+            (status,output) = summaryPerJob(options,hard,fn.getJobSched())
+            sys.stdout.write(output)
+            return status
+
         # First stage: Compute data and store them inside tasks_binding
         # If --check specified, data are computed from the running job(s)
         if options.check != None:
@@ -179,8 +201,9 @@ def main():
 
         if 'jobid' in options and options.jobid != None:
             print("jobid " + str(options.jobid))
-        for o in outputs:
-            print (o)
+        with Timings.phase('printing'):
+            for o in outputs:
+                print (o)
             
     except PlacementException as e:
         if options.summary == False:
@@ -190,6 +213,125 @@ def main():
         return 1
 
 
+def serveAgent(options):
+    """ placement --agent: keep the hardware and a rolling sample of the threads in memory, and answer the --check requests
+        sent by the front node (see agent.py) """
+
+    hard    = hardware.Hardware.factory()
+    sampler = RollingSampler()
+    sampler.start()
+
+    agent = PlacementAgent(options.agent,lambda argv: agentRequest(argv,hard,sampler))
+    print ("placement agent listening on " + agent.address())
+    if not '/' in options.agent and not isTrustedPort(int(agent.address().rpartition(':')[2])):
+        print ("WARNING - The port is not privileged, the front node will not use this agent")
+    sys.stdout.flush()
+    try:
+        agent.serve_forever()
+    except KeyboardInterrupt:
+        agent.shutdown()
+    return 0
+
+# The switches refused by agentRequest: (dest,switch)
+AGENT_REFUSED = [('sample_window','--sample_window'),('profile','--profile'),('host','--host'),('agent','--agent'),
+                 ('continuous','--continuous'),('pathological','--pathological'),('daemon','--daemon'),('store','--store')]
+
+def agentRequest(argv,hard,sampler):
+    """ Answer a request sent to the agent: argv is a placement command line
+        Return (status,output), output is what placement would have printed """
+
+    (options,fn) = params(argv)
+    if options.check == None:
+        return (1,"ERROR - The agent answers only the --check requests\n")
+
+    # The requests are answered one at a time: the switches which wait, write files or call other hosts are refused
+    for (dest,switch) in AGENT_REFUSED:
+        if getattr(options,dest,None) not in (None,False):
+            return (1,"ERROR - The agent does not accept " + switch + "\n")
+
+    Timings.reset()
+    if options.noansi:
+        AnsiCodes.noAnsi()
+    else:
+        AnsiCodes.Ansi()
+
+    if options.jobids != None:
+        return summaryPerJob(options,hard,fn.getJobSched(),sampler)
+
+    output = ''
+    try:
+        tasks_binding = RunningMode(options,hard,BuildTasksBoundFromPs(),fn.getJobSched(),sampler)
+        outputs = buildOutputs(options,tasks_binding)
+        if options.jobid != None:
+            output += "jobid " + str(options.jobid) + '\n'
+        for o in outputs:
+            output += str(o) + '\n'
+
+    except PlacementException as e:
+        if options.summary == False:
+            return (1,"PLACEMENT_ERROR_FOUND\nPLACEMENT " + str(e) + '\n')
+        return (1,"0.0:0\n")
+
+    return (0,output)
+
+def summaryPerJob(options,hard,jobsched,sampler=None):
+    """ placement --check --summary --jobids J1,J2,...: the processes of each job running on this node are inspected in turn
+        Return (status,output), output = 1 line per job: jobid host summary
+        If a job cannot be inspected (probably finished), its summary is 0.0:0 and status is 1 """
+
+    options.summary = True
+    options.csv     = False
+    options.threads = False
+    options.verbose = False
+
+    status = 0
+    output = ''
+    jobids = options.jobids.split(',')
+    removeBlanks(jobids)
+    for jobid in jobids:
+        options.jobid = jobid
+        try:
+            tasks_binding = RunningMode(options,hard,BuildTasksBoundFromPs(),jobsched,sampler)
+            if len(tasks_binding.pid) == 0:
+                raise PlacementException("ERROR - No process found for the job " + jobid)
+            for o in buildOutputs(options,tasks_binding):
+                output += jobid + ' ' + str(o) + '\n'
+        except PlacementException:
+            output += jobid + ' ' + getHostname() + ' 0.0:0\n'
+            status = 1
+    return (status,output)
+
+def profile(options,fn):
+    """ Call run under the control of cProfile, then write:
+           PROFILE.<host>.prof = The cProfile stats (python3 -m pstats PROFILE.<host>.prof)
+           PROFILE.<host>.json = The timings of the phases and of the external commands (see utilities.Timings)
+    """
+
+    profiler = cProfile.Profile()
+    begin    = time.time()
+    status   = None
+    try:
+        status = profiler.runcall(run,options,fn)
+    finally:
+        writeProfile(options.profile,profiler,status,time.time() - begin)
+    return status
+
+def writeProfile(prefix,profiler,status,total):
+    """ Write the profile files, see profile """
+
+    host   = getHostname()
+    prefix = prefix + '.' + host
+    profiler.dump_stats(prefix + '.prof')
+
+    record = Timings.toDict()
+    record['host']    = host
+    record['version'] = PLACEMENT_VERSION
+    record['argv']    = sys.argv
+    record['status']  = status
+    record['total']   = total
+    with open(prefix + '.json','w') as f:
+        json.dump(record,f,indent=1)
+
 def buildOutputs(options,tasks_binding):
     """  Return an array with different objects deriving from the PrintingFor abstract class, following the commandline
 
@@ -371,35 +371,20 @@ class PrintingForMatrixThreads(PrintingFor):
 
         archi         = tasks_binding.archi
         threads_bound = tasks_binding.threads_bound
+        snapshot      = tasks_binding.snapshot
         gpus_info     = tasks_binding.gpus_info
 
-        # 1/ For each task in threads_bound, compute the ppsr_min and ppsr_max, ie the min and max physical cores
-        ppsr_min = 999999
-        ppsr_max = 0
-        for pid in list(threads_bound.keys()):
-            p_ppsr_min = 9999
-            threads = threads_bound[pid]['threads']
-
-            for tid in threads:
-                ppsr = threads[tid]['ppsr']
-                if ppsr_min>ppsr:
-                    ppsr_min=ppsr
-                if p_ppsr_min>ppsr:
-                    p_ppsr_min=ppsr
-                if ppsr_max<ppsr:
-                    ppsr_max=ppsr
-                
-                    
-            threads_bound[pid]['ppsr_min'] = p_ppsr_min
+        # 1/ Compute the ppsr_min and ppsr_max, ie the min and max physical cores, and the ppsr_min of each task
+        if len(snapshot) > 0:
+            ppsr_min = min(snapshot.ppsr)
+            ppsr_max = max(snapshot.ppsr)
+        else:
+            ppsr_min = 999999
+            ppsr_max = 0
+        task_ppsr_min = snapshot.perTask(min,snapshot.ppsr)
 
-        # 2/ Create a copy of threads_bound, to sid_threads_bound (sid = session id)
-        sid_threads_bound = {}
-        for pid in list(threads_bound.keys()):
-            proc = threads_bound[pid]           # info about the process
-            sid = proc['sid']                   # The session id
-            if not sid in sid_threads_bound:
-                sid_threads_bound[sid] = {}
-            sid_threads_bound[sid][pid] = proc  # Store the infos about the processes in session indexed data structure
+        # 2/ Group the tasks by session id
+        sid_tasks = snapshot.groupBy(snapshot.task_sid)
 
         # If memory printing, or gpu_info, or if not threads detected, consider the whole machine
         if self.__print_numamem or gpus_info != None or len(threads_bound)==0:
@@ -420,47 +405,48 @@ class PrintingForMatrixThreads(PrintingFor):
 
         # Printing the body, sorting by sid
         one_line_printed = False
-        for sid in sorted(list(sid_threads_bound.keys())):
-            local_threads_bound = sid_threads_bound[sid]
-            # Sort local_threads_bound, on processes or on threads
+        pids  = snapshot.task_pid
+        tids  = snapshot.tid
+        ppsrs = snapshot.ppsr
+        ppsrs_tids = list(zip(ppsrs,tids))
+        for sid in sorted(sid_tasks.keys()):
+            # Sort the tasks of this session, on processes or on threads
             if self.__sorted_processes_cores:
-                sorted_processes = sorted(iter(local_threads_bound.items()),key=lambda k_v1:(k_v1[1]['ppsr_min'],k_v1[0]))
+                sorted_tasks = sorted(sid_tasks[sid],key=lambda t:(task_ppsr_min[t],pids[t]))
             else:
-                sorted_processes = sorted(local_threads_bound.items())
+                sorted_tasks = sorted(sid_tasks[sid],key=pids.__getitem__)
 
             # Print one line/thread
-            for (pid,thr) in sorted_processes:
-                l = local_threads_bound[pid]['tag']            # The letter (A,B,C,...)
-                j = local_threads_bound[pid]['jobtag']         # The tag corresponding to the job --> the color
-                threads = local_threads_bound[pid]['threads']  # The list of threads
+            for t in sorted_tasks:
+                pid = pids[t]
+                l   = snapshot.task_tag[t]                 # The letter (A,B,C,...)
+                j   = snapshot.task_jobtag[t]              # The tag corresponding to the job --> the color
+                rows= snapshot.taskRows(t)                 # The list of threads
 
                 # Sorting the threads
                 if self.__sorted_threads_cores:
-                    sorted_threads = sorted(iter(threads.items()),key=lambda k_v:(k_v[1]['ppsr'],k_v[0]))
+                    sorted_rows = sorted(rows,key=ppsrs_tids.__getitem__)
                 else:
-                    sorted_threads = sorted(threads.items())
+                    sorted_rows = sorted(rows,key=tids.__getitem__)
     
                 # 
-                for (tid,thr) in sorted_threads:
-                    if not self.__show_idle and threads[tid]['state'] != 'R':
+                for r in sorted_rows:
+                    state = snapshot.state[r]
+                    if not self.__show_idle and state != 82:   # 82 = ord('R')
                         continue
                         
                     S = AnsiCodes.map(j)
                     
-                    if thr['state'] == 'R':
+                    if state == 82:
                         S += l
-                    elif thr['state'] == 'S':
+                    elif state == 83:                        # 83 = ord('S')
                         S += '.'
                     else:
                         S += '?'
                     S += AnsiCodes.normal()
                     
-                    if 'mem' in thr:
-                        rvl += m.getLine(pid,tid,threads[tid]['ppsr'],S,l,threads[tid]['cpu'],threads[tid]['mem'],thr['sid'])
-                        one_line_printed = True
-                    else:
-                        rvl += m.getLine(pid,tid,threads[tid]['ppsr'],S,l,threads[tid]['cpu'],thr['sid'])
-                        one_line_printed = True
+                    rvl += m.getLine(pid,tids[r],ppsrs[r],S,l,snapshot.cpu[r],snapshot.mem[r],sid)
+                    one_line_printed = True
 
         # No process running on the cpu
         if not one_line_printed:
@@ -537,22 +523,13 @@ class PrintingForSummary(PrintingFor):
     def _getUse(self,hyper):
         '''return sum(cpu-usages) / nb_of_cores
            nb_of_cores depends of hyper status'''
-        #processes = self._tasks_binding.pid
-        threads   = self._tasks_binding.threads_bound
-        
-        cpu      = 0.0
-        running  = 0
-        total    = 0
-        mem=0.0
-        
-        for pid,p in threads.items():
-            mem += float(p['mem'])
-            if p['R']:    # If the process is running
-                for tid,t in p['threads'].items():
-                    cpu += float(t['cpu'])
-                    if t['state'] == 'R':
-                        running += 1
-                    total += 1
+        snapshot = self._tasks_binding.snapshot
+
+        # Only the threads of the running processes are considered
+        mem     = sum(snapshot.task_mem,0.0)
+        cpu     = sum(itertools.compress(snapshot.cpu,snapshot.process_r))
+        running = sum(itertools.compress(snapshot.thread_r,snapshot.process_r))
+        total   = sum(snapshot.process_r)
                             
         if hyper:
             nb_of_cores = self._tasks_binding.hardware.CORES_PER_NODE * self._tasks_binding.hardware.THREADS_PER_CORE
@@ -560,7 +537,10 @@ class PrintingForSummary(PrintingFor):
             nb_of_cores = self._tasks_binding.hardware.CORES_PER_NODE
 
         cpu = int(cpu // nb_of_cores)
-        run = int( (100 * running) / total )
+        if total > 0:
+            run = int( (100 * running) / total )
+        else:
+            run = 0
         return [ cpu, run, mem ]
         
     def __str__(self):
@@ -572,8 +552,13 @@ class PrintingForSummary(PrintingFor):
             summary += "Pathological status of the job:\n"
             summary += "0.1:N:N:80:50:90 \n"
             summary += "  | | |  |  |  \_ Memory allocated by the tasks (max = 100%)\n"
-            summary += "  | | |  |  \____ Part of the threads in state Running at poll time % (max = 100%)\n"
-            summary += "  | | |  \_______ Total cpu used by the threads since start of job (max = 100%)\n"
+            sample_window = self._tasks_binding.sample_window
+            if sample_window:
+                summary += "  | | |  |  \____ Part of the threads Running during the last " + str(sample_window) + " s % (max = 100%)\n"
+                summary += "  | | |  \_______ Total cpu used by the threads during the last " + str(sample_window) + " s (max = 100%)\n"
+            else:
+                summary += "  | | |  |  \____ Part of the threads in state Running at poll time % (max = 100%)\n"
+                summary += "  | | |  \_______ Total cpu used by the threads since start of job (max = 100%)\n"
             summary += "  | | \__________ Hyper threading used ? N = no, H = yes\n"
             summary += "  | \____________ Overlap status N = normal, O = Overlap\n"
             summary += "  \______________ Time to poll the node (s)\n\n"
@@ -638,24 +623,11 @@ class PrintingForCsv(PrintingFor):
     def __getUse(self,hyper=True):
         '''return cpu use for each physical core - Return an array, sorted in core number'''
 
-        threads   = self._tasks_binding.threads_bound
-
-        cores={}
-        mem=0.0
-        for pid,p in threads.items():
-            mem += float(p['mem'])
-            if p['R']:    # If the process is running
-                for tid,t in p['threads'].items():
-                    use  = float(t['cpu'])
-                    core = int(t['ppsr'])              # Using physical psr, ie cumulating core threads (hyperthreading)
-                    if t['state'] == 'R':
-                        cpu  = float(t['cpu'])
-                    else:
-                        cpu = 0.0
-                    if core in cores:
-                        cores[core] += cpu
-                    else:
-                        cores[core] = cpu
+        snapshot = self._tasks_binding.snapshot
+
+        # Using physical psr, ie cumulating core threads (hyperthreading), only the running threads are considered
+        cores = snapshot.cpuPerCore()
+        mem   = sum(snapshot.task_mem,0.0)
         
         core_use=[]
         nb_of_cores = self._tasks_binding.hardware.CORES_PER_NODE
@@ -694,4 +666,4 @@ class PrintingForVerbose(PrintingFor):
         if not isinstance(self._tasks_binding,RunningMode):
             return "ERROR - The switch --verbose can be used ONLY with --check"
         else:
-            return self._tasks_binding.PrintingForVerbose()
+            return self._tasks_binding.PrintingForVerbose() + '\n' + Timings.report()
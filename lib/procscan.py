@@ -0,0 +1,382 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu-cores
+#
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  Copyright (C) 2015-2018 Emmanuel Courcelle
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+import os
+import re
+import pwd
+import time
+from exception import *
+from utilities import runCmd
+
+#
+# The scanners are used by RunningMode to discover the processes and their threads
+#
+# They all return the same thing: a list of processes, each process is a dictionary:
+#     {'user':'user', 'sid':sid, 'pid':pid, 'cmd':'command', 'mem':%mem, 'threads':[(tid,psr,state,%cpu), ...]}
+#
+# ProcScanner reads the /proc pseudo filesystem, it is the default
+# PsScanner   calls the command ps, it is the historical way and is kept as a fallback
+#
+# The %cpu returned by both scanners is an average since the start of each thread
+# ProcScanner.sample replaces it by the %cpu used during a time window
+#
+
+class PsScanner(object):
+    """ Discover the processes and threads from the output of ps -m """
+
+    __cmd = 'ps --no-headers -m -o ruser:15 -o sid -o pid -o tid -o psr -o %c -o state -o %cpu -o %mem '
+    __re_proc   = re.compile('([a-z0-9]+) +(\d+) +(\d+) +- +- +([^ ]+) +- +[0-9.]+ +([0-9.]+)$')
+    __re_thread = re.compile('[a-z0-9]+ +- +- +(\d+) +(\d+) +- +([A-Z]) +([0-9.]+)')
+
+    def scan(self,selection='ALL',pids=None):
+        """ Call ps and return the list of processes
+
+        Arguments:
+        selection: ALL, or a user name, or a command name
+        pids     : If not None, only those pids are considered (selection is ignored)
+        """
+
+        return self.parse(self.__callPs(selection,pids))
+
+    def __callPs(self,selection,pids):
+        """ Call ps, may be twice (-U then -C) and return its output as a list of lines """
+
+        # --jobid: the pids are already known
+        if pids != None:
+            if len(pids) == 0:
+                return []
+            try:
+                return runCmd(self.__cmd + '-p ' + ','.join(map(str,pids))).split('\n')
+            except PlacementException as e:
+                return []
+
+        # --check=ALL ==> No selection among the processes
+        if selection == 'ALL':
+            return runCmd(self.__cmd + 'ax').split('\n')
+
+        # --check='some_name' Let's suppose it is a user name
+        try:
+            return runCmd(self.__cmd + '-U ' + selection).split('\n')
+        except PlacementException as e:
+            if e.err != 1:
+                raise e
+
+        # No result: let's suppose it is a command name
+        try:
+            return runCmd(self.__cmd + '-C ' + selection).split('\n')
+
+        # Still no result...
+        except PlacementException as e:
+            return []
+
+    def parse(self,ps_res):
+        """ Parse the output of ps (a list of lines) and return the list of processes
+
+        This output is a mixture of lines representing a processus OR a thread
+        BUT For each process, the first line represents the process itself AND the 1st thread,
+        following lines represent the other threads
+        """
+
+        processes = []
+        current   = None
+        for l in ps_res:
+
+            # Detecting the processes
+            mp = self.__re_proc.match(l)
+            if mp != None:
+                current = {}
+                current['user']    = mp.group(1)
+                current['sid']     = int(mp.group(2))
+                current['pid']     = int(mp.group(3))
+                current['cmd']     = mp.group(4)
+                current['mem']     = float(mp.group(5))
+                current['threads'] = []
+                processes.append(current)
+                continue
+
+            # Detecting threads - If no current process, skip this line. However this should not happen
+            mt = self.__re_thread.match(l)
+            if mt != None and current != None:
+                current['threads'].append((int(mt.group(1)),int(mt.group(2)),mt.group(3),float(mt.group(4))))
+
+        return processes
+
+class ProcScanner(object):
+    """ Discover the processes and threads reading directly /proc/<pid>/stat, /proc/<pid>/status
+        and /proc/<pid>/task/<tid>/stat
+
+        The processes are filtered (uid or command name) BEFORE reading their threads
+        The %cpu and %mem are computed exactly as ps does
+    """
+
+    def __init__(self,proc_root='/proc'):
+        self.__proc_root = proc_root
+        self.__hz        = os.sysconf('SC_CLK_TCK')
+        self.__uptime    = None
+        self.__mem_total = None
+        self.__uid2user  = {}
+
+    def scan(self,selection='ALL',pids=None):
+        """ Read /proc and return the list of processes
+
+        Arguments:
+        selection: ALL, or a user name, or a command name (same semantics as ps -U then -C)
+        pids     : If not None, only those pids are considered (selection is ignored)
+        """
+
+        if not os.path.isfile(self.__proc_root + '/uptime'):
+            raise PlacementException("ERROR - " + self.__proc_root + " does not look like a proc filesystem")
+
+        self.__uptime    = self.__readUptime()
+        self.__mem_total = self.__readMemTotal()
+
+        if pids != None:
+            return self.__scan(map(str,pids),None,None)
+
+        all_pids = [ p for p in os.listdir(self.__proc_root) if p.isdigit() ]
+        if selection == 'ALL':
+            return self.__scan(all_pids,None,None)
+
+        # Let's suppose it is a user name...
+        try:
+            uid = pwd.getpwnam(selection).pw_uid
+            processes = self.__scan(all_pids,uid,None)
+            if len(processes) > 0:
+                return processes
+        except KeyError:
+            pass
+
+        # ... and if no result, a command name
+        return self.__scan(all_pids,None,selection)
+
+    def __scan(self,pids,uid,comm):
+        """ Return the list of processes for those pids, keeping only uid (if not None) or comm (if not None) """
+
+        processes = []
+        for pid in pids:
+            pid_dir = self.__proc_root + '/' + pid
+
+            # The process may have disappeared: skip it
+            status = self.__readStatus(pid_dir + '/status')
+            if status == None:
+                continue
+            if uid != None and status['uid'] != uid:
+                continue
+            stat = self.__readStat(pid_dir + '/stat')
+            if stat == None:
+                continue
+            if comm != None and stat[-1] != comm:
+                continue
+
+            process = {}
+            process['user']    = self.__getUser(status['uid'])
+            process['sid']     = int(stat[3])
+            process['pid']     = int(pid)
+            process['cmd']     = stat[-1]
+            process['mem']     = self.__pmem(status['rss'])
+            process['threads'] = self.__readThreads(pid_dir)
+            if len(process['threads']) > 0:
+                processes.append(process)
+
+        return processes
+
+    def sample(self,processes,window):
+        """ Read the ticks (utime+stime) of every thread of processes, wait window seconds, read them again
+            Return processes with the %cpu of each thread replaced by its use during the window
+            A thread which used the cpu during the window is considered as running ('R'), the other ones keep their state
+            The threads finished during the window are removed, so are the processes without any thread left
+        """
+
+        if not os.path.isfile(self.__proc_root + '/uptime'):
+            raise PlacementException("ERROR - " + self.__proc_root + " does not look like a proc filesystem")
+
+        tasks = [ (p['pid'],t[0]) for p in processes for t in p['threads'] ]
+
+        begin       = time.time()
+        begin_ticks = self.readThreadsTicks(tasks)
+        time.sleep(window)
+        end_ticks   = self.readThreadsTicks(tasks)
+        elapsed     = time.time() - begin
+
+        return self.resample(processes,begin_ticks,end_ticks,elapsed)
+
+    def resample(self,processes,begin_ticks,end_ticks,elapsed):
+        """ Return processes with the %cpu of each thread replaced by its use between begin_ticks and end_ticks (elapsed seconds)
+            The threads absent from end_ticks are finished: they are removed, so are the processes without any thread left
+            The threads absent from begin_ticks were not known at the beginning: they are kept unchanged
+        """
+
+        sampled = []
+        for p in processes:
+            threads = []
+            for (tid,psr,state,cpu) in p['threads']:
+                if not tid in end_ticks:
+                    continue
+                if not tid in begin_ticks:
+                    threads.append((tid,psr,state,cpu))
+                    continue
+                # A thread which did not use the cpu keeps its state: a stalled job is shown with 0 %cpu, not hidden
+                ticks = end_ticks[tid] - begin_ticks[tid]
+                if ticks > 0:
+                    state = 'R'
+                threads.append((tid,psr,state,round(100.0 * ticks / (self.__hz * elapsed),1)))
+            if len(threads) > 0:
+                process = p.copy()
+                process['threads'] = threads
+                sampled.append(process)
+        return sampled
+
+    def readThreadsTicks(self,tasks):
+        """ Return a dict: key = tid, val = the ticks (utime+stime) used by the thread since its start
+            tasks is a list of (pid,tid), the finished threads are absent from the dict
+        """
+
+        ticks = {}
+        for (pid,tid) in tasks:
+            stat = self.__readStat(self.__proc_root + '/' + str(pid) + '/task/' + str(tid) + '/stat')
+            if stat != None:
+                ticks[tid] = int(stat[11]) + int(stat[12])
+        return ticks
+
+    def readAllThreadsTicks(self):
+        """ Return a dict: key = tid, val = the ticks (utime+stime) used by the thread since its start, for every thread of the node """
+
+        ticks = {}
+        for pid in os.listdir(self.__proc_root):
+            if not pid.isdigit():
+                continue
+            task_dir = self.__proc_root + '/' + pid + '/task'
+            try:
+                tids = os.listdir(task_dir)
+            except OSError:
+                continue
+            for tid in tids:
+                stat = self.__readStat(task_dir + '/' + tid + '/stat')
+                if stat != None:
+                    ticks[int(tid)] = int(stat[11]) + int(stat[12])
+        return ticks
+
+    def __readThreads(self,pid_dir):
+        """ Return the list of threads (tid,psr,state,cpu) of a process """
+
+        threads  = []
+        task_dir = pid_dir + '/task'
+        try:
+            tids = os.listdir(task_dir)
+        except OSError:
+            return threads
+
+        for tid in sorted(tids,key=int):
+            stat = self.__readStat(task_dir + '/' + tid + '/stat')
+            if stat == None:
+                continue
+            ticks = int(stat[11]) + int(stat[12])
+            threads.append((int(tid),int(stat[36]),stat[0],self.__pcpu(ticks,int(stat[19]))))
+        return threads
+
+    def __readStat(self,path):
+        """ Read a stat file and return the fields after the command name, the command name being appended at the end
+            Return None if the file could not be read (the process or thread is finished)
+
+            Field n (see man 5 proc) is at index n-3
+        """
+
+        stat = self.__readFile(path)
+        if stat == None:
+            return None
+
+        # The command name may contain blanks or parenthesis
+        (head,sep,tail) = stat.rpartition(')')
+        fields = tail.split()
+        fields.append(head.partition('(')[2])
+        return fields
+
+    def __readStatus(self,path):
+        """ Read a status file and return a dict with the real uid and the resident memory (kB) """
+
+        content = self.__readFile(path)
+        if content == None:
+            return None
+
+        status = {'uid':-1, 'rss':0}
+        for l in content.split('\n'):
+            if l.startswith('Uid:'):
+                status['uid'] = int(l.split()[1])
+            elif l.startswith('VmRSS:'):
+                status['rss'] = int(l.split()[1])
+                break
+        return status
+
+    def __readFile(self,path):
+        """ Return the content of a (small) file, or None if it cannot be read
+            Using os.open/os.read is much cheaper than open() for thousands of tiny files """
+
+        try:
+            fd = os.open(path,os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            return os.read(fd,8192).decode('utf-8','replace')
+        except OSError:
+            return None
+        finally:
+            os.close(fd)
+
+    def __readUptime(self):
+        with open(self.__proc_root + '/uptime','r') as f:
+            return int(float(f.read().split()[0]))
+
+    def __readMemTotal(self):
+        with open(self.__proc_root + '/meminfo','r') as f:
+            for l in f:
+                if l.startswith('MemTotal:'):
+                    return int(l.split()[1])
+        return 0
+
+    def __getUser(self,uid):
+        """ Return the user name from the uid, the map is cached """
+
+        if not uid in self.__uid2user:
+            try:
+                self.__uid2user[uid] = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                self.__uid2user[uid] = str(uid)
+        return self.__uid2user[uid]
+
+    def __pcpu(self,ticks,start_time):
+        """ Same computation as ps: %cpu since the thread start """
+
+        seconds = self.__uptime - start_time // self.__hz
+        if seconds <= 0:
+            return 0.0
+        return ((ticks * 1000 // self.__hz) // seconds) / 10.0
+
+    def __pmem(self,rss):
+        """ Same computation as ps: %mem from the resident memory """
+
+        if self.__mem_total == 0:
+            return 0.0
+        return (rss * 1000 // self.__mem_total) / 10.0
@@ -27,11 +27,15 @@
 import os
 import re
 import time
-import xml.etree.ElementTree as et
+from itertools import combinations
 from exception import *
 from tasksbinding import *
 from utilities import *
 from architecture import *
+from procscan import *
+from numamem import *
+from gpuinfo import *
+from snapshot import *
 
 #
 # class RunningMode, Extends TasksBinding.
@@ -44,7 +48,7 @@ class RunningMode(TasksBinding):
         ==> Hardware is guessed from the node name, as usual
             Architecture is guessed from the running job """
 
-    def __init__(self,options,hardware,buildTasksBound,jobsched=None):
+    def __init__(self,options,hardware,buildTasksBound,jobsched=None,sampler=None):
         """ Constructor
 
         Arguments:
@@ -52,13 +56,24 @@ class RunningMode(TasksBinding):
         hardware       : The hardware we run on 
         buildTasksbound: How to build the tasks_bound data structure ? An object-function implementating the algorithm
         withMemory     : If True, try to know memory occupation / socket using a numastat command
+        use_ps         : If True, call ps instead of reading /proc to discover the processes
+        gpu_csv        : If True, call nvidia-smi in csv mode (--query-gpu) instead of xml mode (-q -x)
+        sample_window  : If not None, the %cpu of the threads is measured during sample_window seconds
         jobsched       : If not None, an object extending JobSched (ex = slurm)
                          Used to map processes and jobs (ex: slurm jobs)
+        sampler        : If not None, an object with a sample(processes) method, used by the agent (see agent.py)
+                         The %cpu of the threads is measured since the last sample, without waiting
         """
 
         TasksBinding.__init__(self,None,0,0,jobsched)
         self.path       = options.check
         self.withMemory = options.memory
+        self.use_ps     = options.use_ps
+        self.gpu_csv    = options.gpu_csv
+        self.sample_window = options.sample_window
+        self.sampler       = sampler
+        self.__ps_used     = False     # True if the processes were found by ps, not by reading /proc
+        self.__window      = 0.0       # The time spent in the sample window
 
         self.hardware   = hardware
         
@@ -86,108 +101,31 @@ class RunningMode(TasksBinding):
             gpus_bound = A list of lists.
                          1st level of list = The socket numbers of the node
                          2nd level of lists= The gpus (objects) attached to each socket
-            gpu        = A dictionary describing the gpu utilization (built from nvidia-smi -q -x output)"""
+            gpu        = A dictionary describing the gpu utilization (built from nvidia-smi output, see gpuinfo.py)"""
 
         gpus = self.hardware.GPUS
         if gpus == '':
             return
             
-        # --check='+' ==> Just using the file called gpu.xml in the current directory, used ONLY for debugging 
+        # --check='+' ==> Just using the files called gpu.xml (or gpu-query.csv and gpu-apps.csv) in the current directory, used ONLY for debugging
         if self.path == '+':
             try:
-                tree = et.parse('gpu.xml')
+                if self.gpu_csv:
+                    with open('gpu-query.csv','r') as f_gpus, open('gpu-apps.csv','r') as f_apps:
+                        index = GpuCsvReader().parse(f_gpus.read().split('\n'),f_apps.read().split('\n'))
+                else:
+                    index = GpuXmlReader().parse('gpu.xml')
             except:
                 return
+        elif self.gpu_csv:
+            index = GpuCsvReader().read()
         else:
-            xml_header = '<?xml version="1.0" ?>\n<!DOCTYPE nvidia_smi_log'
-            cmd = 'nvidia-smi -q -x'
-            xml = runCmd(cmd)
-
-            # May be there are some lines before the xml (if the user has some stuff in its .bashrc)
-            # So we detect and keep only from the first xml line
-            if not xml.startswith(xml_header):
-                start_xml = xml.find(xml_header)
-                if start_xml == -1:
-                    raise PlacementException("ERROR - bad xml header returned by nvidia-smi")
-                else:
-                    xml = xml[start_xml:]
-
-            tree = et.fromstring(xml)
+            index = GpuXmlReader().read()
 
         # '0-1,2-3' ==> ['0-1','2-3'] ==> [[0,1],[2,3]]
-        gpus_bound_tmp = []
-        for s in gpus.split(','):
-            gpus_bound_tmp.append(compactString2List(s))
-
         gpus_bound = []
-        for s in gpus_bound_tmp:
-            sg = []
-            for g in s:
-                gpu = {}
-                xpath_request = ".//gpu/[minor_number='"+str(g)+"']";
-                tmp = tree.findall(xpath_request)
-
-                # If no information about this gpu (eg gpu not used))
-                if len(tmp)==0:
-                    gpu['M'] = 0
-                    gpu['P'] = 0
-                    gpu['U'] = 0
-                    gpu['id'] = g
-                    gpu['PS'] = []
-                    sg.append(gpu)
-                    continue
-
-                obj_g = tree.findall(xpath_request)[0]  # TODO - check there is only 1 element here !
-                
-                # Memory used
-                mem_used = int(obj_g.find(".//fb_memory_usage/used").text.partition(' ')[0])
-                mem_total= int(obj_g.find(".//fb_memory_usage/total").text.partition(' ')[0])
-                gpu['M'] = int((100.0*mem_used)/mem_total);
-                
-                # gpu utilization
-                gpu['U'] = int(obj_g.find(".//utilization/gpu_util").text.strip('%'))
-                
-                # power used
-                pwr_used_obj = obj_g.find(".//power_readings/power_draw")
-                if pwr_used_obj is None:
-                    pwr_used_obj = obj_g.find(".//gpu_power_readings/instant_power_draw")
-                elif pwr_used_obj is None:
-                    print("Unable to find power draw, maybe counter name has changed again !")
-                
-                # power limit
-                pwr_limit_obj = obj_g.find(".//power_readings/power_limit")
-                if pwr_limit_obj is None:
-                    pwr_limit_obj = obj_g.find(".//gpu_power_readings/current_power_limit")
-                elif pwr_limit_obj is None:
-                    print("Unable to find power limit, maybe counter name has changed again !")
-
-                pwr_used = float(pwr_used_obj.text.partition(' ')[0])
-                pwr_limit = float(pwr_limit_obj.text.partition(' ')[0])
-
-                gpu['P'] = int(100 * pwr_used / pwr_limit)
-                
-                # gpu number
-                gpu['id'] = g
-                
-                # processes
-                processes = []
-                max_mem = 0
-                for obj_proc in obj_g.findall(".//processes/process_info"):
-                    pid = int(obj_proc.find(".//pid").text)
-                    mem = convertMemory(obj_proc.find(".//used_memory").text)
-                    if mem>max_mem:
-                        max_mem=mem
-                    processes.append([pid,mem])
-                    
-                # normalize the memory used (0..100)
-                if max_mem>0:
-                    for ps in processes:
-                        ps[1] = int(100.0*ps[1]/max_mem)
-
-                gpu['PS'] = processes
-                
-                sg.append(gpu)
-            gpus_bound.append(sg)
+        for s in gpus.split(','):
+            gpus_bound.append([ gpuStatus(index,g) for g in compactString2List(s) ])
 
         self.gpus_info = gpus_bound
     
@@ -205,43 +143,34 @@ class RunningMode(TasksBinding):
 
                 
     def __identNumaMem(self):
-        """ Call numastat for each pid of threads_bound, and keep the returned info inside threads_bound"""
-                
-        for pid in self.threads_bound:
-            # --check='+' ==> Just using the file called PROCESSES.txt in the current directory, used ONLY for debugging 
-            if self.path == '+':
+        """ Collect the memory used by each pid of threads_bound on each socket (see numamem.py), and keep the returned info inside threads_bound"""
+
+        sockets = self.hardware.SOCKETS_PER_NODE
+
+        # --check='+' ==> Just using the files called pid.NUMASTAT.txt in the current directory, used ONLY for debugging 
+        if self.path == '+':
+            numamems = {}
+            for pid in self.threads_bound:
                 fh_numastat = open(str(pid)+'.NUMASTAT.txt','r')
                 tmp = fh_numastat.readlines()
+                fh_numastat.close()
                 tmp = [x.replace('\n','') for x in tmp]
-            else:
-                cmd = 'numastat ' + str(pid)
-                tmp = runCmd(cmd).split('\n')
-                tmp.pop()
-            #print ('\n'.join(tmp))
-            #print(tmp)
-
-            # Keep only last line (should Total=)
-            ttl = tmp[-1].split()
-
-            # If the first word does not start with Total, we have a problem ! (probably a permission problem)
-            if ttl[0].lower().startswith('total'):
-                # remove first and last columns
-                ttl.pop()
-                ttl.pop(0)
-                ttl = list(map(float,ttl))
-    
-                # We must have same number of numbers / sockets !
-                if self.hardware.SOCKETS_PER_NODE != len(ttl):
-                    raise PlacementException("INTERNAL ERROR - numastat returns " + str(len(ttl)) + " columns, but we have " + SOCKETS_PER_NODE + " sockets !")
-                self.threads_bound[pid]['numamem']=ttl
+                ttl = parseNumastat(tmp,sockets)
+                if ttl == None:
+                    break
+                numamems[pid] = ttl
+        else:
+            numamems = NumaMemCollector(sockets).collect(self.threads_bound.keys())
+
+        for pid in numamems:
+            self.threads_bound[pid]['numamem']=numamems[pid]
                 
-            # Disable other checks - If we do not have permission for first process, it will be the same for the others
-            else:
-                self.withMemory = False
-                break
+        # Disable other checks - If we do not have permission for some process (probably other users' processes)
+        if len(numamems) < len(self.threads_bound):
+            self.withMemory = False
 
     def __identProcesses(self):
-        """Identify the interesting processes together with their threads, from a set of commands ps
+        """Identify the interesting processes together with their threads, reading /proc (or calling ps)
 
         We keep only processes selected by the switch --check, ie processes launched by a command, or belonging
         to some user... pr all processes
@@ -258,130 +187,58 @@ class RunningMode(TasksBinding):
 
         """
 
-        # the result of the 'ps' command
-        ps_res=''
-
-        # --check='+' ==> Just using the file called PROCESSES.txt in the current directory, used ONLY for debugging 
-        if self.path == '+':
-            fh_processes = open('PROCESSES.txt','r')
-            ps_res = fh_processes.readlines()
-            fh_processes.close()
-            for i,l in enumerate(ps_res):
-                ps_res[i] = l.replace('\n','')
-                
-        # Build a complicated command ps
-        else:
-            cmd = 'ps --no-headers -m -o ruser:15 -o sid -o pid -o tid -o psr -o %c -o state -o %cpu -o %mem '
-            
-            # --check=ALL ==> No selection among the processes
-            if self.path == 'ALL':
-                exe = cmd + 'ax'
-                tmp    = runCmd(exe)
-                ps_res = tmp.split('\n')
-                for i,l in enumerate(ps_res):
-                    ps_res[i] = l.replace('\n','')
-
-            # --check='some_name' Let's suppose it is a user name
-            else:
-                exe = cmd + "-U "
-                exe += self.path
-
-                try:
-                    tmp    = runCmd(exe)
-                    ps_res = tmp.split('\n')
-                    for i,l in enumerate(ps_res):
-                        ps_res[i] = l.replace('\n','')
-
-                except PlacementException as e:
-                    if (e.err != 1):
-                        raise e
-                    else:
-                        ps_res = ""
-
-                # No result: let's suppose it is a command name
-                if ps_res == "":
-                    exe = cmd + "-C "
-                    exe += self.path
-
-                    try:
-                        tmp    = runCmd(exe)
-                        ps_res = tmp.split('\n')
-                        for i,l in enumerate(ps_res):
-                            ps_res[i] = l.replace('\n','')
-                    
-                    # Still no result... 
-                    except PlacementException as e:
-                        pass
+        # --jobid: if the job scheduler knows the pids of the job (from the cgroups), only those pids are inspected
+        self.__job_pids = None
+        if self.path != '+' and self.jobid != None and self.jobsched != None:
+            with Timings.phase('job_pids'):
+                self.__job_pids = self.jobsched.findPidsFromJob(self.jobid)
+
+        # The processes, as returned by the scanner (see procscan.py)
+        with Timings.phase('processes'):
+            scanned = self.__scanProcesses(self.__job_pids)
+
+        # --sample_window: the %cpu is measured now, during the window
+        # Not possible if the processes were found by ps (/proc cannot be read): the %cpu of ps is kept
+        self.__window = 0.0
+        if self.sample_window and self.path != '+' and not self.__ps_used:
+            with Timings.phase('sample_window'):
+                begin   = time.time()
+                scanned = ProcScanner().sample(scanned,self.sample_window)
+                self.__window = time.time() - begin
+
+        # The agent: the %cpu is measured since its last sample
+        elif self.sampler != None and self.path != '+' and not self.__ps_used:
+            scanned = self.sampler.sample(scanned)
         
-        # Creating data structures processus and pid from the output of the ps command
-        # This output is a mixture of lines representing a processus OR a thread
-        # BUT For each process, the first line represents the process itself AND the 1st thread, 
-        # following lines represent the other threads
+        # Creating data structures processus and pid from the scanned processes
 
         # The processus - key = pid, val = A dict (see processus_courant under)
         processus         = {}
         
-        # The current process - key = processus properties, val = The property (ex: pid, sid, etc)
-        processus_courant = {}
-        
         # The session id - key = session id, val = A list of pid (the processes belonging to the group)
         sids             = {}
         
-        for l in ps_res:
-               
-            # Detecting the processes
-            mp=re.match('([a-z0-9]+) +(\d+) +(\d+) +- +- +([^ ]+) +- +[0-9.]+ +([0-9.]+)$',l)
-            if mp != None:
-
-                # If there is at least 1 active thread in the current process, it is tagged and saved
-                #print ( "mp = " + str(mp))
-                if 'pid' in processus_courant:
-                    pid=processus_courant['pid']
-                else:
-                    pid="-1"
-                    
-                if 'R' in processus_courant or pid in self.gpus_processes:
-                    sid = processus_courant['sid']
-                    processus[pid] = processus_courant
-                    if not sid in sids.keys():
-                        sids[sid] = []
-                    sids[sid].append(pid)
-                    
-                # Reinit the current processes dictionary, as we start a new process
-                processus_courant={}
-                user= mp.group(1)
-                sid= int(mp.group(2))
-                pid = int(mp.group(3))
-                cmd = mp.group(4)
-                mem = float(mp.group(5))
-                if cmd in self.__processus_reserves:
-                    continue
-                if user in self.__users_reserves:
-                    continue
-
-                processus_courant['user']=user
-                processus_courant['sid']=sid
-                processus_courant['pid']=pid
-                processus_courant['cmd']=cmd
-                processus_courant['mem']=mem
+        for p in scanned:
+            if p['cmd'] in self.__processus_reserves:
+                continue
+            if p['user'] in self.__users_reserves:
                 continue
 
-            # Detecting threads
-            mt = re.match('[a-z0-9]+ +- +- +(\d+) +(\d+) +- +([A-Z]) +([0-9.]+)',l)
-            if mt != None:
-                # If no current process, skip this line. However this should not happen
-                if len(processus_courant)==0:
-                    continue
-                
+            # The current process - key = processus properties, val = The property (ex: pid, sid, etc)
+            processus_courant = {}
+            processus_courant['user']=p['user']
+            processus_courant['sid']=p['sid']
+            processus_courant['pid']=p['pid']
+            processus_courant['cmd']=p['cmd']
+            processus_courant['mem']=p['mem']
+
+            for (tid,psr,state,cpu) in p['threads']:
+
                 # If at least 1 thread is 'R', remember !
-                state = mt.group(3)
                 if state == 'R':
                     processus_courant['R']=True
 
                 # Keeping track of this thread
-                tid   = int(mt.group(1))
-                psr   = int(mt.group(2))
-                cpu   = float(mt.group(4))
                 thread_courant        = {}
                 thread_courant['tid'] = tid                                     # thread id
                 thread_courant['psr'] = self.hardware.getAddr2Core(psr)         # core number (internal representation)
@@ -396,14 +253,14 @@ class RunningMode(TasksBinding):
 
                 processus_courant['threads'][tid] = thread_courant
 
-        # If there is at least 1 active thread in the current process when exiting from the loop, it is tagged and saved
-        if 'R' in processus_courant:
-            pid  = processus_courant['pid']
-            sid = int(processus_courant['sid'])
-            processus[pid] = processus_courant
-            if not sid in sids.keys():
-                sids[sid] = []
-            sids[sid].append(pid)
+            # If there is at least 1 active thread in the current process, it is tagged and saved
+            pid = processus_courant['pid']
+            if 'R' in processus_courant or pid in self.gpus_processes:
+                sid = processus_courant['sid']
+                processus[pid] = processus_courant
+                if not sid in sids.keys():
+                    sids[sid] = []
+                sids[sid].append(pid)
                 
         # Sort the processes to tag them: The sort order is:
         #   1/ sid asc
@@ -425,14 +282,19 @@ class RunningMode(TasksBinding):
         
         js = self.jobsched
         if js != None:
-            for pid in list(processus):
-                jobid = js.findJobFromPid(pid)
-                processus[pid]['job']    = jobid
-                processus[pid]['jobtag'] = js.findTagFromJob(jobid)
+            with Timings.phase('jobsched'):
+                for pid in list(processus):
+
+                    # If the pids were found in the job cgroups, we already know the job
+                    if self.__job_pids != None:
+                        jobid = str(self.jobid)
+                    else:
+                        jobid = js.findJobFromPid(pid)
+                    processus[pid]['job']    = jobid
+                    processus[pid]['jobtag'] = js.findTagFromJob(jobid)
                 
-                # TODO - This is not optimized, we worked hard on this process before removing it....
-                if self.jobid != None and jobid != str(self.jobid):
-                    del(processus[pid])
+                    if self.jobid != None and jobid != str(self.jobid):
+                        del(processus[pid])
             
         # Add default values for job and jobtag !
         else:
@@ -444,6 +306,35 @@ class RunningMode(TasksBinding):
         self.processus = processus
         self.pid = sorted(processus.keys())
 
+    def __scanProcesses(self,pids):
+        """ Return the processes selected by --check, reading /proc or calling ps (see procscan.py)
+            If pids is not None, only those pids are inspected """
+
+        # --check='+' ==> Just using the file called PROCESSES.txt in the current directory, used ONLY for debugging 
+        if self.path == '+':
+            fh_processes = open('PROCESSES.txt','r')
+            ps_res = fh_processes.readlines()
+            fh_processes.close()
+            for i,l in enumerate(ps_res):
+                ps_res[i] = l.replace('\n','')
+            return PsScanner().parse(ps_res)
+
+        # Reading /proc is the default, ps is used if asked for or if /proc cannot be read
+        processes      = None
+        self.__ps_used = False
+        if not self.use_ps:
+            try:
+                processes = ProcScanner().scan(self.path,pids)
+            except (PlacementException,OSError) as e:
+                if 'PLACEMENT_DEBUG' in os.environ:
+                    print("Cannot read /proc, falling back to ps (" + str(e) + ")")
+
+        if processes == None:
+            processes = PsScanner().scan(self.path,pids)
+            self.__ps_used = True
+
+        return processes
+
     def __buildArchi(self,tasks_bound):
         """ Guess architecture from observed tasks_bound"""
 
@@ -467,28 +358,30 @@ class RunningMode(TasksBinding):
         # Measure time
         begin = time.time()
         
-       # Call the gpu information
-        self.__identGpus()
+        # Call the gpu information
+        with Timings.phase('gpus'):
+            self.__identGpus()
 
         # Retrieve the list of processes
         self.__identProcesses()
 
-        # Determine their affinity
-        self.tasks_bound   = self.__buildTasksBound(self)
-        self.threads_bound = self.processus
-
-        # Detect overlaps, if any
-        [self.overlap,self.over_cores] = _detectOverlap(self.tasks_bound)
+        # Store them in columns, determine their affinity, detect overlaps, if any
+        with Timings.phase('tasks_bound'):
+            self.snapshot      = ThreadsSnapshot(self.processus)
+            self.tasks_bound   = self.__buildTasksBound(self)
+            self.threads_bound = self.processus
+            [self.overlap,self.over_cores] = _detectOverlap(self.tasks_bound)
 
         # Guess the architecture
         self.__buildArchi(self.tasks_bound)
 
         # Call numastat to get information about the memory
         if self.withMemory:
-            self.__identNumaMem()
+            with Timings.phase('numamem'):
+                self.__identNumaMem()
             
-        # Measure duration
-        self.duration = time.time() - begin
+        # Measure duration (the time spent in the sample window is not taken into account)
+        self.duration = time.time() - begin - self.__window
 
     def PrintingForVerbose(self):
         """Return some verbose information"""
@@ -554,47 +447,50 @@ class BuildTasksBound:
         raise("INTERNAL ERROR - VIRTUAL PURE FUNCTION !")
 
 # This functor builds the tasks_bound data structure from ps
-# Construit tasks_bound à partir de la structure de données tasksBinding.processus
+# Construit tasks_bound à partir de tasksBinding.snapshot (construit à partir de tasksBinding.processus)
 # tasks_bound est construit dans l'ordre donné par les labels des processes (cf. __identProcesses)
 # Ne considère QUE les threads en état 'R' !
 # Renvoie tasks_bound
 class BuildTasksBoundFromPs(BuildTasksBound):
-    """ This is just a rewriting of the data structure processus !"""
+    """ This is just a rewriting of the data structure processus, read from the snapshot (tasks sorted by tag) !"""
 
     def __call__(self,tasksBinding):
-        tasks_bound=[]
-        #for pid in sorted(tasksBinding.processus.keys()):
-        for (pid,proc) in sorted(iter(tasksBinding.processus.items()),key=lambda k_v1:(k_v1[1]['tag'],k_v1[0])):
-            cores=[]
-            threads=proc['threads']
-            for tid in list(threads.keys()):
-                if threads[tid]['state']=='R':
-                    cores.append(threads[tid]['psr'])
-            tasks_bound.append(cores)
-
-        return tasks_bound
+        return tasksBinding.snapshot.tasksBound()
 
 
 def _detectOverlap(tasks_bound):
     """ Return couples of overlapping as a list of pairs, together with the list of impacted cores"""
 
-    over=[]
-    over_cores=[]
-    for i in range(len(tasks_bound)):
-        for j in range(i+1,len(tasks_bound)):
-            overlap = list(set(tasks_bound[i])&set(tasks_bound[j]))
-            if len(overlap)!=0:
-                over.append((i,j))
-                over_cores.extend(overlap)
+    (over,over_cores) = _overlappingTasks(tasks_bound)
 
     # Use 1-char tags instead of numbers, however the number should be < 296 (and we do not check, shame !)
     over_l = []
     for c in over:
         over_l.append( (numTaskToLetter(c[0]),numTaskToLetter(c[1])) )
 
-    # Removing duplications
-    over_cores = set(over_cores)
-    over_cores = list(over_cores)
-    over_cores.sort()
-    
     return (over_l,over_cores)
+
+def _overlappingTasks(tasks_bound):
+    """ Return the sorted list of pairs (i,j), i<j, of overlapping tasks, together with the sorted list of impacted cores
+
+        An index core => tasks is built, so that the time is linear in the number of bound cores
+        (plus the number of overlapping pairs), instead of comparing every pair of tasks """
+
+    core2tasks = {}
+    for (i,cores) in enumerate(tasks_bound):
+        for c in set(cores):
+            if c in core2tasks:
+                core2tasks[c].append(i)
+            else:
+                core2tasks[c] = [i]
+
+    over       = set()
+    over_cores = []
+    for (c,tasks) in core2tasks.items():
+        if len(tasks) > 1:
+            over_cores.append(c)
+            over.update(combinations(tasks,2))
+
+    over = sorted(over)
+    over_cores.sort()
+    return (over,over_cores)
@@ -25,130 +25,249 @@
 #
 
 from jobsched import *
-from utilities import runCmd
+from utilities import runCmd,compactString2List,getCacheDir,Timings
+from squeue import SqueueSnapshot
 from exception import *
 import os
+import re
+import glob
+import json
 
 class Slurm(JobSched):
     """This class extends JobSched, it should be used with the Slurm job scheduler
        See the documentation in jobsched.py
     """
 
-    def __init__(self):
-        self.__pid2jobid = None
+    # The job is read from the cgroup path of the process, cgroup v1 or v2:
+    #     4:cpuset:/slurm/uid_xxx/job_yyyyyy/step_zzz
+    #     0::/system.slice/slurmstepd.scope/job_yyyyyy/step_zzz/user/task_0
+    __re_job = re.compile('/job_(\d+)/step_')
+
+    # The cpusets of the jobs are kept in a cache file (see utilities.getCacheDir)
+    __cache_version = 2    # 2: the empty cpuset.cpus of cgroup v2 are skipped
+
+    def __init__(self,cgroup_root='/sys/fs/cgroup',proc_root='/proc',cache_dir=None):
+        self.__pid2jobid = {}
         self.__core2jobid= None
         self._job2tag    = None
+        self.__cgroup_root = cgroup_root
+        self.__proc_root   = proc_root
+
+        self.__cache_dir   = cache_dir
+        self.__squeue      = SqueueSnapshot(cache_dir=cache_dir)
         
-    def __initDataStructures(self):
-        '''Init self.__pid2jobid, self.__core2jobid and self._job2tag
-           Explore the /sys/fs/cgroup/cpuset pseudo filesystem'''
+    def __jobDirs(self,jobid='*'):
+        '''Return the list of the job cgroup directories
+           cgroup v1: /sys/fs/cgroup/cpuset/slurm/uid_xxx/job_yyyyyy
+           cgroup v2: /sys/fs/cgroup/system.slice/slurmstepd.scope/job_yyyyyy'''
+
+        job_dirs  = glob.glob(self.__cgroup_root + '/cpuset/slurm*/uid_*/job_' + str(jobid))
+        job_dirs += glob.glob(self.__cgroup_root + '/system.slice/*slurmstepd.scope/job_' + str(jobid))
+        return job_dirs
+
+    def __initJob2Tag(self):
+        '''Init self._job2tag from the list of the job directories
+           Only the jobs which still have tasks are tagged: a leftover cgroup of a finished job does not shift the tags
+           Only the cgroup.procs files are read, squeue is not called'''
+
+        if self._job2tag == None:
+            jobs = {}
+            for job_dir in self.__jobDirs():
+                jobs.setdefault(os.path.basename(job_dir).replace('job_',''),[]).append(job_dir)
+            jobids = sorted([ j for j in jobs if len(self.__jobPids(jobs[j])) > 0 ])
+            self._job2tag = { j:t+1 for (t,j) in enumerate(jobids) }
+
+    def __initCore2Jobid(self):
+        '''Init self.__core2jobid, reading the cpusets of the running jobs
+           Called only when a printer needs the jobs of the cores
+           The jobs already known from the cache file are not read again, squeue is called only for the new jobs'''
         
         # If the data do not exist, build them, else return
-        if self.__pid2jobid == None or self.__core2jobid == None:
+        if self.__core2jobid == None:
             
-            pid2jobid = {}
             core2jobid= {}
             
-            # Looking for /sys/fs/cgroup/cpuset/slurm/uid_xxx/job_yyyyyy/step_batch
-            top_dir = "/sys/fs/cgroup/cpuset/slurm/"
-
-            # This is a cache, avoiding more squeue than necessary
-            jobids={}
-            for root, dirs, files in os.walk(top_dir,False):
-                leaf = os.path.basename(root)
-                if leaf.startswith('step_'):
-                    job_path = os.path.split(root)[0];    # => .../slurm/uid_xxx/job_yyyyyy
-                    job_dir  = os.path.split(job_path)[1] # => job_yyyyyy
-                    jobid    = job_dir.replace('job_','') # => yyyyyy
-
-                    # If the job is not recognized by slurm, ignore it: this is an old trace
-                    if jobid in jobids:
-                        if not jobid in jobids:
-                            continue
-
-                    else:
-                        # If we do not know, execute squeue
-                        try:
-                            # We do not need the output, only the exit status
-                            runCmd(f'squeue -j {jobid} -o ""')
-                            jobids[jobid] = True
-                            
-                        except PlacementException as e:
-                            jobids[jobid] = False
-                            continue
-                    
-                    # The pids are in the file cgroup.procs
-                    pids = []
-                    cgroup_procs = root + '/cgroup.procs'
-                    with open(cgroup_procs, 'r') as infile:
-                        for line in infile:
-                            line = line.strip()
-                            if line != '':
-                                pid2jobid[line] = jobid
-                                
-                    # The cores are in the file cpuset.cpus
-                    cpuset_cpus = root + '/cpuset.cpus'
-                    with open(cpuset_cpus, 'r') as infile:
-                        for line in infile:
-                            line = line.strip()
-                            if line != '':
-                                # Nearly same format for the cpusets as for the nodesets !
-                                cores = self.nodesetToHosts('['+line+']')
-                                for core in cores:
-                                    core2jobid[core] = jobid
+            # The job directories, key = jobid, val = list of directories
+            jobs = {}
+            for job_dir in self.__jobDirs():
+                jobid = os.path.basename(job_dir).replace('job_','')
+                jobs.setdefault(jobid,[]).append(job_dir)
+
+            # A job is reused from the cache if its directories did not change
+            cached  = self.__readCache()
+            entries = {}
+            rebuilt = []
+            for jobid in jobs:
+                signature = self.__signature(jobs[jobid])
+                if jobid in cached and cached[jobid]['signature'] == signature:
+                    entries[jobid] = cached[jobid]
+                else:
+                    entries[jobid] = {'signature':signature, 'running':False, 'cores':[]}
+                    rebuilt.append(jobid)
+
+            Timings.count('slurm_cache_hits',len(entries)-len(rebuilt))
+            Timings.count('slurm_cache_rebuilds',len(rebuilt))
+
+            # If the job is not recognized by slurm, ignore it: this is an old trace
+            running = self.__runningJobs(set(rebuilt))
+
+            for jobid in running:
+                entries[jobid]['running'] = True
+                entries[jobid]['cores']   = self.__readCores(jobs[jobid])
+
+            # The jobs ended are removed from the cache
+            if len(rebuilt) > 0 or len(cached) != len(entries):
+                self.__writeCache(entries)
+
+            for jobid in sorted(entries):
+                if entries[jobid]['running']:
+                    for core in entries[jobid]['cores']:
+                        core2jobid[str(core)] = jobid
         
-            # build the map self._job2tag
-            jobids = sorted(list(set(core2jobid.values())))
-            
-            t = 0;
-            m = {}
-            for j in jobids:
-                t += 1;
-                m[j] = t
-                
-            
-            self.__pid2jobid = pid2jobid
             self.__core2jobid= core2jobid
-            self._job2tag    = m
             
             #import pprint
-            #pprint.pprint(pid2jobid)
             #pprint.pprint(core2jobid)
 
+    def __readCores(self,job_dirs):
+        '''Return the sorted list of the cores found in the cpusets of a job'''
+
+        cores = set()
+        for job_dir in job_dirs:
+            for root, dirs, files in os.walk(job_dir):
+
+                # cgroup v2 = cpuset.cpus.effective (cpuset.cpus exists too, but it is usually empty), cgroup v1 = cpuset.cpus
+                # The first file which is not empty is used
+                for cpuset_cpus in ('cpuset.cpus.effective','cpuset.cpus'):
+                    if not cpuset_cpus in files:
+                        continue
+
+                    # The step may have finished since the walk
+                    found = False
+                    try:
+                        with open(root + '/' + cpuset_cpus, 'r') as infile:
+                            for line in infile:
+                                line = line.strip()
+                                if line != '':
+                                    # Expanded here: nodeset is kept for the host names
+                                    cores.update(compactString2List(line))
+                                    found = True
+                    except OSError:
+                        pass
+                    if found:
+                        break
+
+        return sorted(cores)
+
+    def __signature(self,job_dirs):
+        '''Return the mtimes of the job directories and of their step directories
+           They change when a step starts or ends'''
+
+        signature = []
+        for job_dir in sorted(job_dirs):
+            try:
+                signature.append([job_dir,os.stat(job_dir).st_mtime_ns])
+                for step in sorted(os.listdir(job_dir)):
+                    if step.startswith('step_'):
+                        signature.append([step,os.stat(job_dir + '/' + step).st_mtime_ns])
+            except OSError:
+                pass
+        return signature
+
+    def __cacheFile(self):
+        '''Return the path of the cache file, or None if there is no cache
+           cache_dir = None: the default directory, '': no cache'''
+
+        cache_dir = self.__cache_dir
+        if cache_dir == None:
+            cache_dir = getCacheDir()
+        if cache_dir == None or cache_dir == '':
+            return None
+        return cache_dir + '/slurm-jobs.json'
+
+    def __readCache(self):
+        '''Return the jobs saved by the previous execution, or {} if the cache cannot be used'''
+
+        cache_file = self.__cacheFile()
+        if cache_file == None:
+            return {}
+        try:
+            with open(cache_file,'r') as infile:
+                cache = json.load(infile)
+            if cache['version'] == self.__cache_version and cache['cgroup_root'] == self.__cgroup_root:
+                return cache['jobs']
+        except (OSError,ValueError,KeyError,TypeError):
+            pass
+        return {}
+
+    def __writeCache(self,entries):
+        '''Save the jobs, the file is replaced atomically so that several placement may run together'''
+
+        cache_file = self.__cacheFile()
+        if cache_file == None:
+            return
+        tmp = cache_file + '.' + str(os.getpid())
+        try:
+            with open(tmp,'w') as outfile:
+                json.dump({'version':self.__cache_version, 'cgroup_root':self.__cgroup_root, 'jobs':entries},outfile)
+            os.replace(tmp,cache_file)
+        except OSError:
+            pass
+
+    def __runningJobs(self,jobids):
+        """Return the subset of jobids (a set of strings) which are running jobs
+           squeue is called only once for all the jobs, but if it fails (some jobs are unknown to slurm),
+           it is called once per job
+        """
+
+        if len(jobids) == 0:
+            return set()
+
+        try:
+            return jobids & set(self._runSqueue(['-h','-t','R','-o','%A','-j',','.join(sorted(jobids))]).split())
+
+        except PlacementException as e:
+            running = set()
+            for jobid in sorted(jobids):
+                try:
+                    if jobid in self._runSqueue(['-h','-t','R','-o','%A','-j',jobid]).split():
+                        running.add(jobid)
+                except PlacementException as e:
+                    pass
+            return running
+
+    def _runSqueue(self,args):
+        """Call squeue with the arguments args (a list), return the output - May be overridden by the tests"""
+
+        return runCmd(['squeue'] + args)
+
     def findJobFromId(self,jobid):
-        """Call squeue and return a tuple with user/nodeset/jobid """
+        """Return a tuple with nodeset/user/jobid, from the squeue snapshot"""
         
-        cmd = 'squeue -t RUNNING -j ' + str(jobid) + ' --noheader -o %.16R@%.15u@%.7A'
         try:
-            rvl = runCmd(cmd)
-        except:
+            job = self.__squeue.findJob(jobid)
+        except (PlacementException,OSError):
             return ("","","")
         
-        if rvl == "":
+        if job == None:
             return ("","","")
 
-        # host[0-4]@   user@jobid  @partition ==> (host[0-4],user,jobid,partition)
-        return tuple(map(str.strip,rvl.split('@'))) 
+        # (jobid,user,partition,host[0-4]) ==> (host[0-4],user,jobid)
+        return (job[3],job[1],job[0])
 
     def findJobsFromUser(self,user):
-        """Call squeue and return a list of tuples corresponding to the jobs running for this user"""
+        """Return a list of tuples corresponding to the jobs running for this user, from the squeue snapshot"""
         
-        cmd = 'squeue -t RUNNING -u ' + user + ' --noheader -o %.16R@%.15u@%.7A'
         try:
-            rvl = runCmd(cmd)
-        except:
+            jobs = self.__squeue.findJobsFromUser(user)
+        except (PlacementException,OSError):
             return [("","","")]
         
-        if rvl == "":
+        if len(jobs) == 0:
             return [("","","")]
 
-        tuples = []
-
-        # host[0-4]@   user@jobid  @partition ==> (host[0-4],user,jobid,partition)
-        for j in rvl.split('\n'):
-            tuples.append(tuple(map(str.strip,j.split('@'))))
-            
-        return tuples
+        # (jobid,user,partition,host[0-4]) ==> (host[0-4],user,jobid)
+        return [ (j[3],j[1],j[0]) for j in jobs ]
 
     def nodesetToHosts(self,nodeset):
         """Expand the nodeset to a list of hosts"""
@@ -160,21 +279,68 @@ class Slurm(JobSched):
 
         return nodes
 
+    def findPidsFromJob(self,jobid):
+        """Return the list of pids found in the cgroup.procs files of the job, or None if the job cgroup is not found
+           cgroup v1: /sys/fs/cgroup/cpuset/slurm/uid_xxx/job_yyyyyy/step_zzz/cgroup.procs
+           cgroup v2: /sys/fs/cgroup/system.slice/slurmstepd.scope/job_yyyyyy/step_zzz/.../cgroup.procs
+        """
+
+        job_dirs = self.__jobDirs(jobid)
+        if len(job_dirs) == 0:
+            return None
+
+        return self.__jobPids(job_dirs)
+
+    def __jobPids(self,job_dirs):
+        """Return the sorted list of the pids found in the cgroup.procs files below the job directories"""
+
+        pids = []
+        for job_dir in job_dirs:
+            for root, dirs, files in os.walk(job_dir):
+                if 'cgroup.procs' in files:
+                    try:
+                        with open(root + '/cgroup.procs', 'r') as infile:
+                            for line in infile:
+                                line = line.strip()
+                                if line != '':
+                                    pids.append(int(line))
+
+                    # The step may have finished in the meantime
+                    except OSError:
+                        pass
+
+        return sorted(set(pids))
+
     def findJobFromPid(self,pid):
-        """Return the jobid from the pid, or "" if not found"""
+        """Return the jobid from the pid, or "" if not found
+           Only /proc/<pid>/cgroup is read, the result is cached"""
         
-        self.__initDataStructures()
         pid = str(pid)
-        if pid in self.__pid2jobid:
-            return self.__pid2jobid[pid]
-        
-        else:
-            return ""
+        if not pid in self.__pid2jobid:
+            jobid = ""
+            try:
+                with open(self.__proc_root + '/' + pid + '/cgroup','r') as infile:
+                    m = self.__re_job.search(infile.read())
+                    if m != None:
+                        jobid = m.group(1)
+
+            # The process may have finished
+            except OSError:
+                pass
+            self.__pid2jobid[pid] = jobid
+
+        return self.__pid2jobid[pid]
+
+    def findTagFromJob(self,jobid):
+        """Same as JobSched.findTagFromJob, but the map is built if necessary"""
+
+        self.__initJob2Tag()
+        return JobSched.findTagFromJob(self,jobid)
 
     def findJobFromCore(self,core):
         """Return the jobid from the core, or "" if not found"""
         
-        self.__initDataStructures()
+        self.__initCore2Jobid()
         core = str(core)
         if core in self.__core2jobid:
             return self.__core2jobid[core]
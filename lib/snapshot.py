@@ -0,0 +1,177 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu-cores
+#
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  Copyright (C) 2015-2018 Emmanuel Courcelle
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from array import array
+from itertools import compress
+from operator import itemgetter, mul
+
+#
+# class ThreadsSnapshot: the threads observed in running mode, stored in columns
+#
+# threads_bound (see running.py) is a dict of dicts of dicts, convenient to build but slow to walk
+# The snapshot is built once from threads_bound, then the printers and BuildTasksBoundFromPs use it
+#
+# Columns, 1 item/thread:
+#     pid, tid, psr, ppsr, sid, jobtag, task (the task number, ie the process tag as an integer)
+#     cpu, mem (%mem of the process)
+#     state  (a bytearray: b'R', b'S', ...)
+#     thread_r  (a bytearray: 1 if the thread is running)
+#     process_r (a bytearray: 1 if the process has at least 1 running thread)
+#
+# Columns, 1 item/task (the tasks are sorted as the tags, ie as the tasks_bound):
+#     task_pid, task_tag, task_sid, task_jobtag, task_mem
+#     task_start: the first row of each task, plus a last item = the number of rows
+#
+
+class ThreadsSnapshot(object):
+    """ Column store of the threads observed in running mode, with some group-by operations """
+
+    def __init__(self,threads_bound):
+        self.pid       = array('l')
+        self.tid       = array('l')
+        self.psr       = array('l')
+        self.ppsr      = array('l')
+        self.sid       = array('l')
+        self.jobtag    = array('l')
+        self.task      = array('l')
+        self.cpu       = array('d')
+        self.mem       = array('d')
+        self.state     = bytearray()
+        self.thread_r  = bytearray()
+        self.process_r = bytearray()
+
+        self.task_pid    = array('l')
+        self.task_tag    = []
+        self.task_sid    = array('l')
+        self.task_jobtag = array('l')
+        self.task_mem    = array('d')
+        self.task_start  = array('l')
+
+        thread_cols = itemgetter('tid','psr','ppsr','cpu','state')
+        for (t,(pid,proc)) in enumerate(sorted(threads_bound.items(),key=lambda k_v:(k_v[1]['tag'],k_v[0]))):
+            sid    = proc['sid']
+            jobtag = proc['jobtag']
+            mem    = float(proc['mem'])
+            p_r    = 1 if proc.get('R',False) else 0
+            self.task_pid.append(pid)
+            self.task_tag.append(proc['tag'])
+            self.task_sid.append(sid)
+            self.task_jobtag.append(jobtag)
+            self.task_mem.append(mem)
+            self.task_start.append(len(self.tid))
+
+            threads = proc['threads']
+            n       = len(threads)
+            if n == 0:
+                continue
+            self.pid.extend([pid] * n)
+            self.sid.extend([sid] * n)
+            self.jobtag.extend([jobtag] * n)
+            self.task.extend([t] * n)
+            self.mem.extend([mem] * n)
+            self.process_r.extend([p_r] * n)
+
+            # Transpose the threads (1 tuple/thread) to columns
+            (tids,psrs,ppsrs,cpus,states) = zip(*map(thread_cols,threads.values()))
+            self.tid.extend(tids)
+            self.psr.extend(psrs)
+            self.ppsr.extend(ppsrs)
+            self.cpu.extend(map(float,cpus))
+            self.state.extend(map(ord,states))
+
+        self.task_start.append(len(self.tid))
+        self.thread_r = bytearray(map((82).__eq__,self.state))   # 82 = ord('R')
+
+    def __len__(self):
+        return len(self.tid)
+
+    def getTasks(self):
+        """ Return the number of tasks """
+        return len(self.task_pid)
+
+    def taskRows(self,task):
+        """ Return the range of rows of a task """
+        return range(self.task_start[task],self.task_start[task+1])
+
+    def tasksBound(self):
+        """ Return the tasks_bound data structure, ie for each task the list of psr of its running threads """
+
+        return [ list(compress(self.psr[self.task_start[t]:self.task_start[t+1]],self.thread_r[self.task_start[t]:self.task_start[t+1]])) for t in range(self.getTasks()) ]
+
+    @staticmethod
+    def sumBy(keys,values,mask=None):
+        """ Return a dict: key = a value of the column keys, val = the sum of values for this key
+            If mask is not None, only the rows for which mask is not 0 are considered """
+
+        pairs = zip(keys,values)
+        if mask != None:
+            pairs = compress(pairs,mask)
+        sums = {}
+        for (k,v) in pairs:
+            if k in sums:
+                sums[k] += v
+            else:
+                sums[k] = v
+        return sums
+
+    def perTask(self,f,column):
+        """ Return a list: for each task, f applied to the slice of column corresponding to this task (ex: f=sum, f=min)
+            The tasks without any thread are skipped by f and give None """
+
+        start = self.task_start
+        return [ f(column[start[t]:start[t+1]]) if start[t] < start[t+1] else None for t in range(self.getTasks()) ]
+
+    @staticmethod
+    def groupBy(keys):
+        """ Return a dict: key = a value of the column keys, val = the list of indexes having this key """
+
+        groups = {}
+        for (i,k) in enumerate(keys):
+            if k in groups:
+                groups[k].append(i)
+            else:
+                groups[k] = [i]
+        return groups
+
+    def cpuPerCore(self,only_running=True):
+        """ Return a dict: key = physical core, val = sum of %cpu of the threads of the running processes
+            If only_running, the threads not running are counted, but with 0.0 %cpu """
+
+        if only_running:
+            cpu = map(mul,self.cpu,self.thread_r)
+        else:
+            cpu = self.cpu
+        return self.sumBy(self.ppsr,cpu,self.process_r)
+
+    def cpuPerTask(self):
+        """ Return a list: for each task, the sum of %cpu of its threads """
+
+        return self.perTask(sum,self.cpu)
+
+    def cpuPerJob(self):
+        """ Return a dict: key = jobtag, val = the sum of %cpu of the threads of the running processes """
+
+        return self.sumBy(self.jobtag,self.cpu,self.process_r)
@@ -0,0 +1,139 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu-cores
+#
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  Copyright (C) 2015-2018 Emmanuel Courcelle
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+import os
+import time
+import fcntl
+from exception import *
+from utilities import runCmd,getCacheDir
+
+#
+# A snapshot of the running jobs, ie the output of ONE call to squeue -t R
+#
+# It is used by Slurm (findJobFromId, findJobsFromUser), placement-cont and placement-patho
+# The snapshot is kept in a file of the cache directory (see utilities.getCacheDir), during PLACEMENT_SQUEUE_TTL seconds
+# The file is protected by a lock, so that several placement started together call squeue only once
+#
+
+SQUEUE_TTL = 10
+
+class SqueueSnapshot(object):
+    """ The running jobs: a list of tuples (jobid,user,partition,nodeset) """
+
+    __args = ['-h','-t','R','-o','%A@%u@%P@%R']
+
+    def __init__(self,ttl=None,cache_dir=None):
+        """ ttl       = the snapshot lifetime in seconds, default $PLACEMENT_SQUEUE_TTL or SQUEUE_TTL
+            cache_dir = the directory of the snapshot file, default getCacheDir(), '' = no file """
+
+        if ttl == None:
+            ttl = float(os.environ.get('PLACEMENT_SQUEUE_TTL',SQUEUE_TTL))
+        self.__ttl       = ttl
+        self.__cache_dir = cache_dir
+        self.__jobs      = None
+        self.__time      = 0
+
+    def getJobs(self):
+        """ Return the running jobs, calling squeue only if the snapshot is too old
+            May raise a PlacementException if squeue fails """
+
+        if self.__jobs == None or time.time() - self.__time >= self.__ttl:
+            self.__jobs = self.parse(self.__load())
+            self.__time = time.time()
+        return self.__jobs
+
+    def findJob(self,jobid):
+        """ Return the tuple (jobid,user,partition,nodeset) of a running job, or None """
+
+        jobid = str(jobid)
+        for job in self.getJobs():
+            if job[0] == jobid:
+                return job
+        return None
+
+    def findJobsFromUser(self,user):
+        """ Return the list of the running jobs of user """
+
+        return [ job for job in self.getJobs() if job[1] == user ]
+
+    def getJobIds(self,partition=None):
+        """ Return the list of the running jobids, may be only for one partition """
+
+        return [ job[0] for job in self.getJobs() if partition == None or job[2] == partition ]
+
+    def isRunning(self,jobid):
+        return self.findJob(jobid) != None
+
+    @staticmethod
+    def parse(out):
+        """ Parse the output of squeue -o %A@%u@%P@%R """
+
+        jobs = []
+        for l in out.split('\n'):
+            job = tuple(map(str.strip,l.split('@')))
+            if len(job) == 4:
+                jobs.append(job)
+        return jobs
+
+    def _runSqueue(self,args):
+        """ Call squeue with the arguments args (a list), return the output - May be overridden by the tests """
+
+        return runCmd(['squeue'] + args)
+
+    def __load(self):
+        """ Return the output of squeue, from the snapshot file if it is recent enough
+            The lock is kept while squeue is running: the other processes wait for the file """
+
+        cache_dir = self.__cache_dir
+        if cache_dir == None:
+            cache_dir = getCacheDir()
+        if cache_dir == None or cache_dir == '':
+            return self._runSqueue(self.__args)
+
+        snapshot = cache_dir + '/squeue.txt'
+        try:
+            lock = open(cache_dir + '/squeue.lock','w')
+        except OSError:
+            return self._runSqueue(self.__args)
+
+        with lock:
+            fcntl.flock(lock,fcntl.LOCK_EX)
+            try:
+                if time.time() - os.stat(snapshot).st_mtime < self.__ttl:
+                    with open(snapshot,'r') as infile:
+                        return infile.read()
+            except OSError:
+                pass
+
+            out = self._runSqueue(self.__args)
+            try:
+                tmp = snapshot + '.' + str(os.getpid())
+                with open(tmp,'w') as outfile:
+                    outfile.write(out)
+                os.replace(tmp,snapshot)
+            except OSError:
+                pass
+            return out
@@ -34,6 +34,7 @@ class TasksBinding(object):
 
     DATA STRUCTURES:
     threads_bound = Only built in running mode: see running.py, functions __identProcesses, __identNumaMem
+    snapshot      = Only built in running mode: the same threads stored in columns, see snapshot.py
     tasks_bound   = A list of lists, describing the list of cores(inner lists) used by the tasks (outer list)
     over_cores    = A list of cores bound to 2 or more tasks (overlapping tasks, should not happen)
     """
@@ -50,6 +51,7 @@ class TasksBinding(object):
             self.tasks         = tasks
         self.tasks_bound   = None
         self.threads_bound = None
+        self.snapshot      = None
         self.over_cores    = None
         self.duration      = 0 # cf. RunningMode.__initTasksThreadsBound
         self.jobsched      = jobsched
@@ -0,0 +1,271 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu-cores
+#
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  Copyright (C) 2015-2018 Emmanuel Courcelle
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+from exception import *
+
+#
+# A binary store for the measures of placement --continuous
+#
+# The store is a directory, with one file per job and node: <directory>/<jobid>/<node>.pts
+# Each file is append only:
+#     - A header: MAGIC, version, length of the description, the description (json: jobid, node, partition, columns)
+#     - Fixed size records: the time of the measure (double, seconds since the epoch) + 1 float per column
+# The files are read through mmap, the records of a time range are found by binary search (the times are increasing)
+# An incomplete record at the end of a file (interrupted write) is ignored, and removed when the file is opened again to append
+# A file of 0 byte (just created, the header is not written yet) is read as an empty series
+#
+# exportCsv writes the same lines as placement --continuous without --store (placement --csv ends with a comma)
+#
+
+MAGIC       = b'PLTS'
+VERSION     = 1
+HEADER      = struct.Struct('<4sHI')
+SUFFIX      = '.pts'
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+def _recordStruct(nb_columns):
+    return struct.Struct('<d' + 'f' * nb_columns)
+
+def _headerSize(description):
+    """ The header is padded to a multiple of 8 bytes """
+    size = HEADER.size + len(description)
+    return size + (-size) % 8
+
+class TsWriter(object):
+    """ Append the measures of a node to a file of the store """
+
+    def __init__(self,path,description):
+        """ path        = the file, created if it does not exist
+            description = a dict, must contain 'columns' (the list of the column names) """
+
+        self.__columns = description['columns']
+        self.__record  = _recordStruct(len(self.__columns))
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            reader = TsReader(path)
+            if reader.getColumns() != self.__columns:
+                raise PlacementException("ERROR - " + path + " was written with other columns")
+            size = reader.getSize()
+            reader.close()
+
+            # An incomplete record at the end (interrupted write) is removed, the next records would be misaligned
+            self.__file = open(path,'r+b')
+            self.__file.truncate(size)
+            self.__file.seek(size)
+        else:
+            self.__file = open(path,'wb')
+            data = json.dumps(description).encode()
+            self.__file.write(HEADER.pack(MAGIC,VERSION,len(data)) + data)
+            self.__file.write(b'\0' * (_headerSize(data) - HEADER.size - len(data)))
+            self.__file.flush()
+
+    def append(self,t,values):
+        """ Append a record: t = time in s since the epoch, values = 1 number per column (None = no value) """
+
+        if len(values) != len(self.__columns):
+            raise PlacementException("ERROR - " + str(len(values)) + " values, but " + str(len(self.__columns)) + " columns")
+        values = [ float('nan') if v == None else v for v in values ]
+        self.__file.write(self.__record.pack(t,*values))
+        self.__file.flush()
+
+    def close(self):
+        self.__file.close()
+
+class TsReader(object):
+    """ Read a file of the store without parsing any text """
+
+    def __init__(self,path):
+        with open(path,'rb') as f:
+            # A file just created by TsWriter, the header is not written yet: an empty series (mmap cannot map 0 byte)
+            if os.fstat(f.fileno()).st_size == 0:
+                self.__map         = None
+                self.__description = {'columns':[]}
+                self.__offset      = 0
+                self.__record      = _recordStruct(0)
+                return
+            self.__map = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        if len(self.__map) < HEADER.size:
+            raise PlacementException("ERROR - " + path + " is not a placement store file")
+        (magic,version,length) = HEADER.unpack_from(self.__map,0)
+        if magic != MAGIC or version != VERSION:
+            raise PlacementException("ERROR - " + path + " is not a placement store file (or a newer version)")
+        data = self.__map[HEADER.size:HEADER.size+length]
+        self.__description = json.loads(data.decode())
+        self.__offset      = _headerSize(data)
+        self.__record      = _recordStruct(len(self.getColumns()))
+
+    def getDescription(self):
+        return self.__description
+
+    def getColumns(self):
+        return self.__description['columns']
+
+    def __len__(self):
+        """ The number of (complete) records """
+        if self.__map == None:
+            return 0
+        return (len(self.__map) - self.__offset) // self.__record.size
+
+    def getSize(self):
+        """ The size of the header and of the complete records """
+        return self.__offset + len(self) * self.__record.size
+
+    def getTime(self,i):
+        return struct.unpack_from('<d',self.__map,self.__offset + i * self.__record.size)[0]
+
+    def getRecord(self,i):
+        """ Return the record i: a tuple (t, value0, value1, ...) """
+        return self.__record.unpack_from(self.__map,self.__offset + i * self.__record.size)
+
+    def __search(self,t):
+        """ Return the index of the first record whose time is >= t """
+        low  = 0
+        high = len(self)
+        while low < high:
+            mid = (low + high) // 2
+            if self.getTime(mid) < t:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def read(self,begin=None,end=None):
+        """ Return the list of the records whose time is in [begin,end[ (None = no limit) """
+
+        first = 0 if begin == None else self.__search(begin)
+        last  = len(self) if end == None else self.__search(end)
+        return [ self.getRecord(i) for i in range(first,last) ]
+
+    def readColumn(self,name,begin=None,end=None):
+        """ Return the list of the (t,value) of a column whose time is in [begin,end[ """
+
+        if len(self) == 0:
+            return []
+        col = self.getColumns().index(name) + 1
+        return [ (r[0],r[col]) for r in self.read(begin,end) ]
+
+    def close(self):
+        if self.__map != None:
+            self.__map.close()
+
+class TsStore(object):
+    """ A directory containing one file per job and node """
+
+    def __init__(self,directory):
+        self.__directory = directory
+        self.__writers   = {}
+
+    def __path(self,jobid,node):
+        return self.__directory + '/' + str(jobid) + '/' + node + SUFFIX
+
+    def append(self,jobid,node,t,values,description):
+        """ Append a record to the file of (jobid,node), created with description (see TsWriter) if needed """
+
+        key = (str(jobid),node)
+        if not key in self.__writers:
+            os.makedirs(self.__directory + '/' + str(jobid),exist_ok=True)
+            description = dict(description,jobid=str(jobid),node=node)
+            self.__writers[key] = TsWriter(self.__path(jobid,node),description)
+        self.__writers[key].append(t,values)
+
+    def getSeries(self):
+        """ Return the sorted list of the (jobid,node) found in the store """
+
+        series = []
+        if not os.path.isdir(self.__directory):
+            return series
+        for jobid in sorted(os.listdir(self.__directory)):
+            if not os.path.isdir(self.__directory + '/' + jobid):
+                continue
+            for f in sorted(os.listdir(self.__directory + '/' + jobid)):
+                if f.endswith(SUFFIX):
+                    series.append((jobid,f[0:-len(SUFFIX)]))
+        return series
+
+    def open(self,jobid,node):
+        """ Return a TsReader on the file of (jobid,node) """
+        return TsReader(self.__path(jobid,node))
+
+    def read(self,jobid,node,begin=None,end=None):
+        """ Return the records of (jobid,node) whose time is in [begin,end[ """
+
+        reader = self.open(jobid,node)
+        try:
+            return reader.read(begin,end)
+        finally:
+            reader.close()
+
+    def exportCsv(self,out=sys.stdout,jobids=None,nodes=None,begin=None,end=None):
+        """ Write the records as placement --continuous does: a header per list of columns, then
+            time,jobid,nodename,value0,value1,...
+            The records are sorted by time, then in the order of the series """
+
+        records = []
+        headers = []
+        for (jobid,node) in self.getSeries():
+            if (jobids != None and not jobid in jobids) or (nodes != None and not node in nodes):
+                continue
+            reader  = self.open(jobid,node)
+            if len(reader) == 0:
+                reader.close()
+                continue
+            columns = reader.getColumns()
+            if not columns in headers:
+                headers.append(columns)
+                out.write('time,jobid,nodename,' + ','.join(columns) + ',\n')
+            for r in reader.read(begin,end):
+                records.append((r[0],len(records),jobid,node,r[1:]))
+            reader.close()
+
+        for (t,n,jobid,node,values) in sorted(records):
+            out.write(time.strftime(TIME_FORMAT,time.localtime(t)) + ',' + jobid + ',' + node + ',' + ','.join(map(_formatValue,values)) + ',\n')
+
+    def close(self):
+        for w in self.__writers.values():
+            w.close()
+        self.__writers = {}
+
+def _formatValue(v):
+    if v != v:
+        return ''
+    if v == int(v):
+        return str(int(v))
+    return str(round(v,2))
+
+#
+# Use: tsstore.py directory [jobid...] : export the store to csv
+#
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.stderr.write("Usage: tsstore.py directory [jobid ...]\n")
+        exit(1)
+    jobids = sys.argv[2:] if len(sys.argv) > 2 else None
+    TsStore(sys.argv[1]).exportCsv(sys.stdout,jobids)
@@ -26,7 +26,11 @@
 import os
 import copy
 import re
+import bisect
 import subprocess
+import time
+import tempfile
+from contextlib import contextmanager
 from exception import *
 from itertools import chain,product
 
@@ -113,40 +117,395 @@ def strminlen(x,l):
     else:
         return rvl
         
+#
+# NodeSet: a set of host names, described by a nodeset (ex: node[001-100],fat[1-4]-ib,r[1-20]c[1-40]n[1-64])
+#
+# The nodeset is never expanded: each element of the comma list is a shape and a box:
+#     shape = the literal parts of the names, and the width of each number (ex: ('r','c','n',''), (1,1,1))
+#     box   = for each number, a sorted list of intervals (ex: ((1,20),), ((1,40),), ((1,64),))
+# The widths are canonical: a number written with width digits is padded with 0 only if it is < 10**(width-1),
+# the other ones are stored with width 1. Thus a name belongs to only one shape, and the boxes of a shape are kept disjoint:
+# len, membership, union, intersection and difference are computed on the intervals
+# The digits of a name become numbers (node12 = 'node' + 12), the digits written before a [ are merged with it (node1[0-5] = node[10-15])
+# Two adjacent numbers (x[1-20][1-5]) are kept as written: their names are matched digit by digit, but the duplicates (x11 + 1 = x1 + 11) are not removed
+#
+
+def _mergeIntervals(intervals):
+    """ Sort and merge the intervals [(5,7),(1,2),(3,3)] => ((1,3),(5,7)) """
+
+    rvl = []
+    for (low,high) in sorted(intervals):
+        if len(rvl) > 0 and low <= rvl[-1][1] + 1:
+            if high > rvl[-1][1]:
+                rvl[-1] = (rvl[-1][0],high)
+        else:
+            rvl.append((low,high))
+    return tuple(rvl)
+
+def _intersectIntervals(a,b):
+    rvl = []
+    i = 0
+    j = 0
+    while i < len(a) and j < len(b):
+        low  = max(a[i][0],b[j][0])
+        high = min(a[i][1],b[j][1])
+        if low <= high:
+            rvl.append((low,high))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return tuple(rvl)
+
+def _subtractIntervals(a,b):
+    rvl = []
+    for (low,high) in a:
+        for (l,h) in b:
+            if h < low or l > high:
+                continue
+            if l > low:
+                rvl.append((low,l-1))
+            low = h + 1
+            if low > high:
+                break
+        if low <= high:
+            rvl.append((low,high))
+    return tuple(rvl)
+
+def _inIntervals(intervals,value):
+    i = bisect.bisect_right(intervals,(value,float('inf'))) - 1
+    return i >= 0 and intervals[i][1] >= value
+
+def _canonicalWidths(width,intervals):
+    """ Return the list of (width,intervals) of a number: the values >= 10**(width-1) are not padded, their width becomes 1 """
+
+    if width <= 1:
+        return [(1,intervals)]
+    limit = 10**(width-1)
+    rvl   = [(width,_intersectIntervals(intervals,((0,limit-1),))),(1,_intersectIntervals(intervals,((limit,float('inf')),)))]
+    return [ (w,i) for (w,i) in rvl if len(i) > 0 ]
+
+def _prefixDigits(digits,width,intervals):
+    """ Return the list of (width,intervals) of digits followed by a number: 1[0-5] => [(1,((10,15),))] """
+
+    rvl = []
+    for (w,i) in _canonicalWidths(width,intervals):
+        # Group the values by their number of digits
+        lengths = [w] if w > 1 else range(1,len(str(i[-1][1])) + 1)
+        for length in lengths:
+            part = i if w > 1 else _intersectIntervals(i,((0 if length == 1 else 10**(length-1),10**length-1),))
+            if len(part) == 0:
+                continue
+            base = int(digits) * 10**length
+            part = tuple([ (base+low,base+high) for (low,high) in part ])
+            rvl += _canonicalWidths(len(digits) + length if digits[0] == '0' else 1,part)
+    return rvl
+
+def _intersectBoxes(a,b):
+    rvl = []
+    for (i,j) in zip(a,b):
+        k = _intersectIntervals(i,j)
+        if len(k) == 0:
+            return None
+        rvl.append(k)
+    return tuple(rvl)
+
+def _subtractBoxes(a,b):
+    """ Return a list of disjoint boxes: a - b """
+
+    inter = _intersectBoxes(a,b)
+    if inter == None:
+        return [a]
+    rvl = []
+    for d in range(len(a)):
+        rest = _subtractIntervals(a[d],b[d])
+        if len(rest) > 0:
+            rvl.append(inter[0:d] + (rest,) + a[d+1:])
+    return rvl
+
+def _boxLen(box):
+    rvl = 1
+    for intervals in box:
+        rvl *= sum([ high-low+1 for (low,high) in intervals ])
+    return rvl
+
+def _boxValues(box):
+    """ Generate the tuples of values of a box, without building the list """
+
+    if len(box) == 0:
+        yield ()
+        return
+    for (low,high) in box[0]:
+        for v in range(low,high+1):
+            for rest in _boxValues(box[1:]):
+                yield (v,) + rest
+
+class NodeSet(object):
+    """ A set of hosts, described by a nodeset, never expanded
+
+        ns = NodeSet('node[1-100],fat1')
+        len(ns)          => 101
+        'node7' in ns    => True
+        str(ns - NodeSet('node[2-99]'))  => 'fat1,node[1,100]'
+        for host in ns:  => the hosts, one by one """
+
+    def __init__(self,nodeset=''):
+        # key = (literals,widths), val = list of disjoint boxes
+        self.__shapes = {}
+        for pattern in re.split(r',(?![^\[]*\])',nodeset):
+            if pattern != '':
+                for (literals,widths,box) in NodeSet.__parse(pattern):
+                    self.__add((literals,widths),box)
+
+    @staticmethod
+    def __parse(pattern):
+        """ Return a list of (literals,widths,box), several ones if the widths are not canonical """
+
+        if re.match(r'^(\[[^\[\]]*\]|[^\[\],]+)+$',pattern) == None:
+            raise PlacementException("ERROR - Bad nodeset: " + pattern)
+
+        # literals has one more item than numbers, each number is a list of (width,intervals)
+        literals = ['']
+        numbers  = []
+        digits   = None
+        for (rge,d,literal) in re.findall(r'\[([^\]]*)\]|([0-9]+)|([^\[0-9]+)',pattern):
+            if literal != '':
+                literals[-1] += literal
+                digits = None
+            elif d != '':
+                literals.append('')
+                numbers.append(_canonicalWidths(len(d) if d[0] == '0' else 1,((int(d),int(d)),)))
+                digits = d
+            else:
+                intervals = []
+                for s in rge.split(','):
+                    c = s.split('-')
+                    if len(c) > 2 or not all([ x.isdigit() for x in c ]):
+                        raise PlacementException("ERROR - Bad nodeset: " + pattern)
+                    intervals.append((int(min(c,key=int)),int(max(c,key=int))))
+                width = len(rge.split(',')[0].split('-')[0])
+                if digits != None:
+                    numbers[-1] = _prefixDigits(digits,width,_mergeIntervals(intervals))
+                else:
+                    literals.append('')
+                    numbers.append(_canonicalWidths(width,_mergeIntervals(intervals)))
+                digits = None
+
+        rvl = []
+        for combination in product(*numbers):
+            rvl.append((tuple(literals),tuple([ w for (w,i) in combination ]),tuple([ i for (w,i) in combination ])))
+        return rvl
+
+    @staticmethod
+    def splitName(host):
+        """ Return (literals,widths,values) of a host name: node007-ib1 => (('node','-ib',''),(3,1),(7,1)) """
+
+        literals = ['']
+        widths   = []
+        values   = []
+        for (d,literal) in re.findall(r'([0-9]+)|([^0-9]+)',host):
+            if literal != '':
+                literals[-1] += literal
+            else:
+                literals.append('')
+                widths.append(len(d) if d[0] == '0' and len(d) > 1 else 1)
+                values.append(int(d))
+        return (tuple(literals),tuple(widths),tuple(values))
+
+    def __add(self,key,box):
+        """ Add box to the shape key, keeping the boxes disjoint """
+
+        boxes  = self.__shapes.setdefault(key,[])
+        pieces = [box]
+        for b in boxes:
+            pieces = [ p for piece in pieces for p in _subtractBoxes(piece,b) ]
+        boxes += pieces
+
+    def __len__(self):
+        return sum([ _boxLen(box) for boxes in self.__shapes.values() for box in boxes ])
+
+    def __contains__(self,host):
+        (literals,widths,values) = NodeSet.splitName(host)
+        for box in self.__shapes.get((literals,widths),[]):
+            if all([ _inIntervals(i,v) for (i,v) in zip(box,values) ]):
+                return True
+
+        # The shapes with adjacent numbers (empty literal between them)
+        for ((literals,widths),boxes) in self.__shapes.items():
+            if '' in literals[1:-1] and host.startswith(literals[0]) and host.endswith(literals[-1]):
+                for box in boxes:
+                    if NodeSet.__match(host,literals,widths,box,0,0):
+                        return True
+        return False
+
+    @staticmethod
+    def __match(host,literals,widths,box,n,pos):
+        """ Return True if host[pos:] matches the literal n and the following numbers and literals """
+
+        if not host.startswith(literals[n],pos):
+            return False
+        pos += len(literals[n])
+        if n == len(box):
+            return pos == len(host)
+
+        # Try every length of the digits found at pos
+        end = pos
+        while end < len(host) and host[end].isdigit():
+            end += 1
+        for e in range(end,pos,-1):
+            digits = host[pos:e]
+            value  = int(digits)
+            if digits == str(value).zfill(widths[n]) and _inIntervals(box[n],value) and NodeSet.__match(host,literals,widths,box,n+1,e):
+                return True
+        return False
+
+    def __iter__(self):
+        """ The hosts are generated one by one, in the order of the folded nodeset """
+
+        for (literals,widths,box) in self.__fold():
+            for values in _boxValues(box):
+                host = literals[0]
+                for n in range(len(values)):
+                    host += strminlen(values[n],widths[n]) + literals[n+1]
+                yield host
+
+    def __fold(self):
+        """ Return the sorted list of (literals,widths,box), with the fewest possible boxes """
+
+        # The numbers not padded are written with the width of a padded shape, if possible: node[08-10] instead of node10,node[08-09]
+        shapes = {}
+        for ((literals,widths),boxes) in self.__shapes.items():
+            for box in boxes:
+                w = list(widths)
+                for n in range(len(w)):
+                    if w[n] != 1:
+                        continue
+                    for (l,ws) in self.__shapes:
+                        if l == literals and len(ws) == len(w) and ws[n] > 1 and box[n][0][0] >= 10**(ws[n]-1) and list(ws[0:n]) + [1] + list(ws[n+1:]) == w:
+                            w[n] = ws[n]
+                            break
+                shapes.setdefault((literals,tuple(w)),[]).append(box)
+
+        # Merge the boxes which differ by one number only
+        rvl = []
+        for ((literals,widths),boxes) in shapes.items():
+            merged = True
+            while merged:
+                merged = False
+                for i in range(len(boxes)):
+                    for j in range(i+1,len(boxes)):
+                        diff = [ n for n in range(len(widths)) if boxes[i][n] != boxes[j][n] ]
+                        if len(diff) <= 1:
+                            n = diff[0] if len(diff) == 1 else 0
+                            box = boxes[i][0:n] + (_mergeIntervals(boxes[i][n] + boxes[j][n]),) + boxes[i][n+1:]
+                            boxes = boxes[0:i] + [box] + boxes[i+1:j] + boxes[j+1:]
+                            merged = True
+                            break
+                    if merged:
+                        break
+            rvl += [ (literals,widths,box) for box in boxes ]
+        return sorted(rvl,key=lambda x: (x[0],x[2],x[1]))
+
+    def fold(self):
+        """ Return the compact nodeset: node[1-3,5],fat1 """
+
+        rvl = []
+        for (literals,widths,box) in self.__fold():
+            s = literals[0]
+            for n in range(len(box)):
+                if len(box[n]) == 1 and box[n][0][0] == box[n][0][1]:
+                    s += strminlen(box[n][0][0],widths[n])
+                else:
+                    s += '[' + ','.join([ strminlen(low,widths[n]) + ('' if low == high else '-' + strminlen(high,widths[n])) for (low,high) in box[n] ]) + ']'
+                s += literals[n+1]
+            rvl.append(s)
+        return ','.join(rvl)
+
+    def __str__(self):
+        return self.fold()
+
+    def __repr__(self):
+        return "NodeSet('" + self.fold() + "')"
+
+    def __copy(self):
+        rvl = NodeSet()
+        rvl.__shapes = dict([ (key,list(boxes)) for (key,boxes) in self.__shapes.items() ])
+        return rvl
+
+    def union(self,other):
+        rvl = self.__copy()
+        for (key,boxes) in other.__shapes.items():
+            for box in boxes:
+                rvl.__add(key,box)
+        return rvl
+
+    def intersection(self,other):
+        rvl = NodeSet()
+        for (key,boxes) in self.__shapes.items():
+            for a in boxes:
+                for b in other.__shapes.get(key,[]):
+                    box = _intersectBoxes(a,b)
+                    if box != None:
+                        rvl.__shapes.setdefault(key,[]).append(box)
+        return rvl
+
+    def difference(self,other):
+        rvl = NodeSet()
+        for (key,boxes) in self.__shapes.items():
+            pieces = list(boxes)
+            for b in other.__shapes.get(key,[]):
+                pieces = [ p for piece in pieces for p in _subtractBoxes(piece,b) ]
+            if len(pieces) > 0:
+                rvl.__shapes[key] = pieces
+        return rvl
+
+    __or__  = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def __eq__(self,other):
+        return isinstance(other,NodeSet) and len(self) == len(other) and len(self - other) == 0
+
+    def __ne__(self,other):
+        return not self == other
+
+    __hash__ = None
+
+    def shapes(self):
+        """ Return the shapes and boxes, as lists (may be saved as json, see fromShapes) """
+        return [ [list(literals),list(widths),[ [ [ list(i) for i in intervals ] for intervals in box ] for box in boxes ]] for ((literals,widths),boxes) in self.__shapes.items() ]
+
+    @staticmethod
+    def fromShapes(shapes):
+        rvl = NodeSet()
+        for (literals,widths,boxes) in shapes:
+            rvl.__shapes[(tuple(literals),tuple(widths))] = [ tuple([ tuple([ tuple(i) for i in intervals ]) for intervals in box ]) for box in boxes ]
+        return rvl
+
 def expandNodeList(nodelist):
     """ Return a list nodes, just like ExpandNodeList
         toto[5-6]titi[5-6] returns ['toto5titi5','toto5titi6', 'toto6titi5','toto6titi6']
         toto[5-6] -> return ['toto5','toto6'] 
-        toto      -> return ['toto'] """
-    #import pprint
-    nodelists_out= [nodelist]
-    while True:
-        expanded = False
-        nodelists_in  = nodelists_out
-        nodelists_out = []
-        for ndlst in nodelists_in:
-            matches = re.match('(.+)\[(.+)\](.*)',ndlst)
-            if matches:
-                expanded = True
-                prefix = matches.group(1)
-                rge    = matches.group(2)
-                postfix= matches.group(3)
-                
-                # '001-004' ==> '001'
-                low = low=re.match('^([0-9]+)',rge).group(1)
+        toto      -> return ['toto']
+        The nodes are generated by NodeSet, sorted and without duplicates """
 
-                # '001'     ==> 3 (number of digits)
-                l   = len(low)
-                
-                #pprint.pprint([prefix+strminlen(x,l)+postfix for x in compactString2List(rge)])
-                nodelists_out += [prefix+strminlen(x,l)+postfix for x in compactString2List(rge)]
-            else:
-                nodelists_out.append(ndlst)
-        #pprint.pprint(nodelists_out)
-        if not expanded:
-            break
-            
-    return nodelists_out
+    return list(NodeSet(nodelist))
+
+def expandNodeset(nodeset):
+    """ Return the list of the nodes of a slurm nodeset, ex: node[1-2],node7 => ['node1','node2','node7']
+        nodeset -e (clustershell) is used, expandNodeList if it is not available """
+
+    try:
+        return runCmd(['nodeset','-e',nodeset]).split()
+    except (PlacementException,OSError):
+        return expandNodeList(nodeset)
+
+def firstNode(nodeset):
+    """ Return the first node of a slurm nodeset, without calling nodeset
+        node[005-008,012],node1 => node005 """
+
+    first = re.split(r',(?![^\[]*\])',nodeset)[0]
+    return re.sub(r'\[([0-9]+)[^\]]*\]',r'\1',first)
 
 def flatten(l):
     """ Return a flatten version of the list passed in parameter
@@ -339,27 +698,132 @@ def getGauge1(value):
         return chr(9605)
     return chr(9606)
 
-def runCmd(cmd,host=None):
+def getCacheDir():
+    '''Return the directory used to keep some data between two executions of placement on this node,
+       or None if there is no cache
+       The directory is $PLACEMENT_CACHE_DIR (no cache if empty), default /dev/shm/placement-<uid>
+       It is created if needed, but it is not used if it belongs to another user'''
+
+    if 'PLACEMENT_CACHE_DIR' in os.environ:
+        cache_dir = os.environ['PLACEMENT_CACHE_DIR']
+        if cache_dir == '':
+            return None
+    else:
+        top_dir = '/dev/shm'
+        if not os.path.isdir(top_dir):
+            top_dir = tempfile.gettempdir()
+        cache_dir = top_dir + '/placement-' + str(os.getuid())
+
+    try:
+        os.makedirs(cache_dir,0o700,exist_ok=True)
+        if os.stat(cache_dir).st_uid != os.getuid():
+            return None
+    except OSError:
+        return None
+
+    return cache_dir
+
+SSH_PERSIST = 60    # The ssh master connections are closed after 60 s without any use
+
+class SshMux(object):
+    '''Share one ssh connection per remote host (ssh ControlMaster), between the commands and between the placement processes
+       The control sockets are kept in the cache directory (see getCacheDir) during SSH_PERSIST seconds after the last use
+       The first command to a host opens the master connection (ssh -fN), the time of this handshake is kept next to the socket,
+       the following commands reuse the connection: the counters ssh_mux_reused and ssh_saved_ms are printed by --verbose
+       If the master connection cannot be opened (multiplexing not allowed, no cache directory...), plain ssh is used for this host
+       PLACEMENT_SSH_MUX=0 = never multiplex
+       This is a static class
+    '''
+
+    # static variables
+    __failed = set()    # The hosts on which multiplexing does not work
+
+    @staticmethod
+    def options():
+        '''Return the ssh options used to multiplex the connections (a list), or [] if multiplexing is disabled'''
+
+        if os.environ.get('PLACEMENT_SSH_MUX','1') == '0':
+            return []
+        cache_dir = getCacheDir()
+        if cache_dir == None:
+            return []
+        return ['-o','ControlMaster=auto','-o','ControlPath=' + cache_dir + '/ssh-%n','-o','ControlPersist=' + str(SSH_PERSIST)]
+
+    @staticmethod
+    def command(host,timeout=None):
+        '''Return the ssh command line (a list) to run a command on host, opening the master connection if needed'''
+
+        options = SshMux.options()
+        if len(options) == 0 or host in SshMux.__failed:
+            return ['ssh','-x',host]
+
+        socket_path = getCacheDir() + '/ssh-' + host
+        if os.path.exists(socket_path):
+            Timings.count('ssh_mux_reused')
+            try:
+                with open(socket_path + '.time','r') as f:
+                    Timings.count('ssh_saved_ms',int(float(f.read()) * 1000))
+            except (OSError,ValueError):
+                pass
+        elif not SshMux.__openMaster(host,options,socket_path,timeout):
+            SshMux.__failed.add(host)
+            return ['ssh','-x',host]
+
+        return ['ssh','-x'] + options + [host]
+
+    @staticmethod
+    def __openMaster(host,options,socket_path,timeout):
+        '''Open the master connection to host in the background, return True if it worked
+           The output is not captured: the background ssh would keep the pipe open'''
+
+        cmd   = ['ssh','-x','-f','-N'] + options + [host]
+        begin = time.time()
+        try:
+            returncode = subprocess.run(cmd,stdin=subprocess.DEVNULL,stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL,timeout=timeout).returncode
+        except subprocess.TimeoutExpired:
+            returncode = -1
+        duration = time.time() - begin
+        Timings.addCommand(cmd,duration,None,returncode)
+        if returncode != 0 or not os.path.exists(socket_path):
+            return False
+
+        Timings.count('ssh_mux_opened')
+        try:
+            with open(socket_path + '.time','w') as f:
+                f.write(str(duration))
+        except OSError:
+            pass
+        return True
+
+def runCmd(cmd,host=None,timeout=None):
     '''Run a command locally or on another host, through ssh
        cmd may be a string or a list, if a string it is converted to a list
        host is the remote host, or None
+       timeout is in seconds, the command is killed after it, or None
        Return the output as a string
-       Raises an exception if return value != 0
+       Raises an exception if return value != 0 or on timeout, the output is kept in the exception
     '''
     
     if isinstance(cmd,str):
         cmd = cmd.split(' ')
  
     if host != None:
-        cmd.insert(0,host)
-        cmd.insert(0,'-x')
-        cmd.insert(0,'ssh')
+        cmd = SshMux.command(host,timeout) + cmd
         
     # for debug only
     if 'PLACEMENT_DEBUG' in os.environ:
         print("Executing " + ' '.join(cmd))
 
-    cpltdProc=subprocess.run(cmd,stdout=subprocess.PIPE,stderr=subprocess.STDOUT,universal_newlines=True)
+    begin = time.time()
+    try:
+        cpltdProc=subprocess.run(cmd,stdout=subprocess.PIPE,stderr=subprocess.STDOUT,universal_newlines=True,timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        output = e.output
+        if isinstance(output,bytes):
+            output = output.decode('utf-8','replace')
+        Timings.addCommand(cmd,time.time()-begin,None,-1)
+        raise PlacementException(' '.join(cmd) + ' - TIMEOUT after ' + str(timeout) + 's',-1,output)
+    Timings.addCommand(cmd,time.time()-begin,len(cpltdProc.stdout.encode()),cpltdProc.returncode)
 
     if cpltdProc.returncode==0:
         # for debug only
@@ -371,7 +835,7 @@ def runCmd(cmd,host=None):
         msg = ' '.join(cmd)
         msg += ' - ERROR code = '
         msg += str(cpltdProc.returncode)
-        raise PlacementException(msg,cpltdProc.returncode)
+        raise PlacementException(msg,cpltdProc.returncode,cpltdProc.stdout)
 
 def runCmdNoOut(cmd,host=None):
     '''Run a command locally or on another host, through ssh
@@ -384,21 +848,133 @@ def runCmdNoOut(cmd,host=None):
         cmd = cmd.split(' ')
         
     if host != None:
-        cmd.insert(0,host)
-        cmd.insert(0,'-x')
-        cmd.insert(0,'ssh')
+        cmd = SshMux.command(host) + cmd
         
     # for debug only
     if 'PLACEMENT_DEBUG' in os.environ:
         print("Executing " + ' '.join(cmd))
 
+    begin = time.time()
     cpltdProc=subprocess.run(cmd)
+    Timings.addCommand(cmd,time.time()-begin,None,cpltdProc.returncode)
+
     if cpltdProc.returncode!=0:
         msg = ' '.join(cmd)
         msg += ' - ERROR code = '
         msg += str(cpltdProc.returncode)
         raise PlacementException(msg,cpltdProc.returncode)
         
+class Timings(object):
+    '''Record the duration of the phases (ex: reading /proc) and of the external commands (runCmd, runCmdNoOut)
+       Some counters (ex: cache hits) are recorded too
+       This is a static class, the records are kept for the whole execution
+
+       with Timings.phase('gpus'):
+           ...
+    '''
+
+    # static variables
+    __phases   = []    # (name, duration)
+    __commands = []    # (argv, duration, bytes of output or None, return code)
+    __counters = {}    # key = name, val = count
+
+    @staticmethod
+    def reset():
+        Timings.__phases   = []
+        Timings.__commands = []
+        Timings.__counters = {}
+
+    @staticmethod
+    @contextmanager
+    def phase(name):
+        begin = time.time()
+        try:
+            yield
+        finally:
+            Timings.__phases.append((name,time.time()-begin))
+
+    @staticmethod
+    def addCommand(argv,duration,nbytes,returncode):
+        Timings.__commands.append((list(argv),duration,nbytes,returncode))
+
+    @staticmethod
+    def count(name,n=1):
+        Timings.__counters[name] = Timings.__counters.get(name,0) + n
+
+    @staticmethod
+    def getPhases():
+        return Timings.__phases
+
+    @staticmethod
+    def getCommands():
+        return Timings.__commands
+
+    @staticmethod
+    def getCounters():
+        return Timings.__counters
+
+    @staticmethod
+    def toDict():
+        '''Return the records as a dictionary, ready to be dumped to json'''
+        return {
+            'phases'  : [ {'name':n, 'time':d} for (n,d) in Timings.__phases ],
+            'commands': [ {'argv':a, 'time':d, 'bytes':b, 'returncode':r} for (a,d,b,r) in Timings.__commands ],
+            'counters': Timings.__counters
+        }
+
+    @staticmethod
+    def report():
+        '''Return the records as a (humanly readable) string'''
+        rvl = ''
+        if len(Timings.__phases) > 0:
+            rvl += '{:<20} {:>10}\n'.format('PHASE','TIME (s)')
+            for (n,d) in Timings.__phases:
+                rvl += '{:<20} {:>10.3f}\n'.format(n,d)
+        if len(Timings.__commands) > 0:
+            rvl += '{:<50} {:>10} {:>10}\n'.format('COMMAND','TIME (s)','BYTES')
+            for (a,d,b,r) in Timings.__commands:
+                cmd = ' '.join(a)
+                if len(cmd) > 50:
+                    cmd = cmd[0:47] + '...'
+                if b == None:
+                    b = '-'
+                if r != 0:
+                    cmd = cmd[0:44] + ' (' + str(r) + ')'
+                rvl += '{:<50} {:>10.3f} {:>10}\n'.format(cmd,d,b)
+        if len(Timings.__counters) > 0:
+            rvl += '{:<20} {:>10}\n'.format('COUNTER','VALUE')
+            for n in sorted(Timings.__counters):
+                rvl += '{:<20} {:>10}\n'.format(n,Timings.__counters[n])
+        return rvl
+
+class Ticker(object):
+    '''Tick every period seconds, without drift: the n-th tick is at start + n * period, whatever the time spent between two ticks
+       If the work lasted more than period, the missed ticks are skipped
+
+       ticker = Ticker(60)
+       while True:
+           ...
+           ticker.wait()
+    '''
+
+    def __init__(self,period,clock=time.monotonic,sleep=time.sleep):
+        self.__period = period
+        self.__clock  = clock
+        self.__sleep  = sleep
+        self.__next   = clock() + period
+
+    def wait(self):
+        '''Sleep until the next tick, return the number of skipped ticks'''
+
+        now     = self.__clock()
+        skipped = 0
+        if now > self.__next:
+            skipped      = int((now - self.__next) // self.__period) + 1
+            self.__next += skipped * self.__period
+        self.__sleep(self.__next - now)
+        self.__next += self.__period
+        return skipped
+
 class AnsiCodes(object):
 	'''Write AnsiCodes, outputting in colored characters'''
 	
@@ -413,7 +989,7 @@ class AnsiCodes(object):
 
 	@staticmethod
 	def Ansi():
-		AnsiCodes.__using_ansi = False
+		AnsiCodes.__using_ansi = True
         
 	@staticmethod
 	def __returnCode(code):
@@ -0,0 +1,141 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+#
+# Benchmark: parsing the output of nvidia-smi
+#
+# Usage: python3 BenchGpuInfo.py [gpus [processes/gpu]]
+#
+# debug/gpu.xml is scaled to the requested number of gpus and processes, then parsed:
+#    - with the historical algorithm (whole tree + 2 xpath requests per gpu)
+#    - with GpuXmlReader (iterparse, single pass)
+#    - with GpuCsvReader (the same information as nvidia-smi --query-gpu / --query-compute-apps would return)
+#
+
+from gpuinfo import *
+from utilities import convertMemory
+import copy
+import io
+import sys
+import time
+import xml.etree.ElementTree as et
+
+DEBUG_XML = '../debug/gpu.xml'
+
+def measure(f,repeat=5):
+    """ Return the best time (s) of several calls to f, and the result of the last call """
+    best = None
+    for r in range(repeat):
+        begin = time.time()
+        rvl = f()
+        d = time.time() - begin
+        if best == None or d < best:
+            best = d
+    return (best,rvl)
+
+def scaleXml(nb_gpus,nb_processes):
+    """ Return the xml (bytes) and the csv outputs (lists of lines) for nb_gpus gpus, nb_processes processes each """
+
+    root  = et.parse(DEBUG_XML).getroot()
+    model = root.find('gpu')
+    for g in root.findall('gpu'):
+        root.remove(g)
+
+    gpus = []
+    apps = []
+    pid  = 10000
+    for g in range(nb_gpus):
+        gpu  = copy.deepcopy(model)
+        uuid = 'GPU-' + str(g)
+        gpu.find('minor_number').text = str(g)
+        gpu.find('uuid').text = uuid
+        processes = gpu.find('processes')
+        for p in processes.findall('process_info'):
+            processes.remove(p)
+        for p in range(nb_processes):
+            proc = et.SubElement(processes,'process_info')
+            et.SubElement(proc,'pid').text = str(pid)
+            et.SubElement(proc,'type').text = 'C'
+            et.SubElement(proc,'process_name').text = './a.out'
+            et.SubElement(proc,'used_memory').text = str(70+p%10) + ' MiB'
+            apps.append(uuid + ', ' + str(pid) + ', ' + str(70+p%10))
+            pid += 1
+        root.append(gpu)
+        gpus.append('{0}, 00000000:{0:02x}:00.0, {1}, 152, 11439, 60, 112.32, 149.00'.format(g,uuid))
+
+    xml = b'<?xml version="1.0" ?>\n<!DOCTYPE nvidia_smi_log SYSTEM "nvsmi_device_v8.dtd">\n' + et.tostring(root)
+    return (xml,gpus,apps)
+
+def historical(xml,nb_gpus):
+    """ The algorithm used by RunningMode.__identGpus up to placement 1.14 """
+
+    tree = et.fromstring(xml)
+    rvl  = []
+    for g in range(nb_gpus):
+        xpath_request = ".//gpu/[minor_number='"+str(g)+"']";
+        tmp = tree.findall(xpath_request)
+        if len(tmp)==0:
+            continue
+        obj_g = tree.findall(xpath_request)[0]
+        mem_used = int(obj_g.find(".//fb_memory_usage/used").text.partition(' ')[0])
+        mem_total= int(obj_g.find(".//fb_memory_usage/total").text.partition(' ')[0])
+        util     = int(obj_g.find(".//utilization/gpu_util").text.strip('%'))
+        pwr_used = float(obj_g.find(".//power_readings/power_draw").text.partition(' ')[0])
+        pwr_limit= float(obj_g.find(".//power_readings/power_limit").text.partition(' ')[0])
+        processes = []
+        for obj_proc in obj_g.findall(".//processes/process_info"):
+            processes.append([int(obj_proc.find(".//pid").text),convertMemory(obj_proc.find(".//used_memory").text)])
+        rvl.append((mem_used,mem_total,util,pwr_used,pwr_limit,processes))
+    return rvl
+
+def main():
+    nb_gpus      = 8
+    nb_processes = 64
+    if len(sys.argv) > 1:
+        nb_gpus = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        nb_processes = int(sys.argv[2])
+
+    (xml,gpus,apps) = scaleXml(nb_gpus,nb_processes)
+
+    (t_old,old) = measure(lambda: historical(xml,nb_gpus))
+    (t_xml,idx) = measure(lambda: GpuXmlReader().parse(io.BytesIO(xml)))
+    (t_csv,csv) = measure(lambda: GpuCsvReader('/nonexistent').parse(gpus,apps))
+
+    if idx != csv:
+        print("DIFFERENCE between xml and csv")
+    for (g,o) in enumerate(old):
+        n = idx[g]
+        if o != (n['mem_used'],n['mem_total'],n['util'],n['pwr_used'],n['pwr_limit'],n['processes']):
+            print("DIFFERENCE gpu " + str(g))
+
+    print("{} gpus, {} processes/gpu, xml = {} kB, csv = {} kB".format(nb_gpus,nb_processes,len(xml)//1024,len('\n'.join(gpus+apps))//1024))
+    print("Whole tree + xpath        {:8.4f} s".format(t_old))
+    print("GpuXmlReader (iterparse)  {:8.4f} s".format(t_xml))
+    print("GpuCsvReader              {:8.4f} s".format(t_csv))
+
+if __name__ == "__main__":
+    main()
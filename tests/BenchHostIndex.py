@@ -0,0 +1,99 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+#
+# Benchmark: finding the architecture of a host in the [hosts] section of placement.conf
+#
+# Usage: python3 BenchHostIndex.py [nodes [nodes/line]]
+#
+# The configuration describes nodes hosts (default 50000), nodes/line hosts per line (default 100, ie 500 lines)
+# The host searched is the last one, ie the worst case
+# Measured: expanding each line (historical), compiling the index, reading the compiled index from the cache, searching a host
+#
+
+from hostindex import *
+from utilities import expandNodeList
+import configparser
+import shutil
+import sys
+import tempfile
+import time
+
+def measure(f,repeat=3):
+    """ Return the best time (s) of several calls to f, and the result of the last call """
+    best = None
+    for r in range(repeat):
+        begin = time.time()
+        rvl = f()
+        d = time.time() - begin
+        if best == None or d < best:
+            best = d
+    return (best,rvl)
+
+def expandAlgorithm(config,host):
+    """ The historical algorithm: expand every line """
+    for o in config.options('hosts'):
+        if host in expandNodeList(o):
+            return config.get('hosts',o)
+    return None
+
+def writeConf(path,nodes,per_line):
+    with open(path,'w') as f:
+        f.write('[hard1]\nSOCKETS_PER_NODE: 2\n\n[hard2]\nSOCKETS_PER_NODE: 4\n\n[hosts]\n')
+        for l in range(nodes // per_line):
+            f.write('node[' + str(l*per_line+1).zfill(5) + '-' + str((l+1)*per_line).zfill(5) + ']: hard' + str(l%2+1) + '\n')
+
+def main():
+    nodes    = 50000
+    per_line = 100
+    if len(sys.argv) > 1:
+        nodes = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        per_line = int(sys.argv[2])
+
+    root = tempfile.mkdtemp()
+    try:
+        conf = root + '/placement.conf'
+        writeConf(conf,nodes,per_line)
+        config = configparser.RawConfigParser()
+        config.read(conf)
+        host = 'node' + str(nodes // per_line * per_line).zfill(5)
+
+        (t_expand,a_expand) = measure(lambda: expandAlgorithm(config,host))
+        (t_compile,index)   = measure(lambda: HostIndex.load(conf,config,''))
+        HostIndex.load(conf,config,root)
+        (t_cache,cached)    = measure(lambda: HostIndex.load(conf,config,root))
+        (t_find,a_find)     = measure(lambda: cached.find(host))
+        if a_expand != a_find or index.find(host) != a_find:
+            print("DIFFERENCE for " + host)
+
+        print("{:>8} {:>8} {:>12} {:>12} {:>12} {:>12}".format("nodes","lines","expand (s)","compile (s)","cache (s)","find (s)"))
+        print("{:>8} {:>8} {:>12.4f} {:>12.4f} {:>12.4f} {:>12.6f}".format(nodes,nodes//per_line,t_expand,t_compile,t_cache,t_find))
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+#
+# Benchmark: NumaMemCollector vs the historical loop (1 numastat per pid, serially)
+#
+# Usage: python3 BenchNumaMem.py [processes]
+#
+# The numastat outputs are taken from the files debug/*.NUMASTAT.txt (used round robin)
+# The historical loop forks 1 process per pid (cat pid.NUMASTAT.txt, because numastat itself needs real pids)
+# NumaMemCollector reads a synthetic /proc/<pid>/numa_maps with the same memory distribution
+#
+
+from numamem import *
+from utilities import runCmd
+import glob
+import sys
+import time
+import shutil
+import tempfile
+
+DEBUG_DIR = '../debug'
+
+def measure(f,repeat=3):
+    """ Return the best time (s) of several calls to f, and the result of the last call """
+    best = None
+    for r in range(repeat):
+        begin = time.time()
+        rvl = f()
+        d = time.time() - begin
+        if best == None or d < best:
+            best = d
+    return (best,rvl)
+
+def historicalLoop(pid2file,sockets):
+    numamems = {}
+    for pid in pid2file:
+        tmp = runCmd(['cat',pid2file[pid]]).split('\n')
+        tmp.pop()
+        ttl = parseNumastat(tmp,sockets)
+        if ttl == None:
+            break
+        numamems[pid] = ttl
+    return numamems
+
+def writeNumaMaps(path,ttl):
+    """ Write a numa_maps file with the same distribution (4 kB pages) as the numastat Total line """
+    with open(path,'w') as f:
+        f.write('00400000 default file=/usr/bin/a.out mapped=1 kernelpagesize_kB=4\n')
+        nodes = ' '.join([ 'N' + str(n) + '=' + str(int(round(mb*256))) for (n,mb) in enumerate(ttl) if mb > 0 ])
+        f.write('01000000 default heap anon=1 dirty=1 ' + nodes + ' kernelpagesize_kB=4\n')
+
+def main():
+    nb_processes = 128
+    if len(sys.argv) > 1:
+        nb_processes = int(sys.argv[1])
+    sockets = 2
+
+    files = sorted(glob.glob(DEBUG_DIR + '/[0-9]*.NUMASTAT.txt'))
+    pid2file = {}
+    for p in range(nb_processes):
+        pid2file[10000+p] = files[p % len(files)]
+
+    root = tempfile.mkdtemp()
+    try:
+        for (pid,f) in pid2file.items():
+            with open(f,'r') as fh:
+                ttl = parseNumastat(fh.read().rstrip('\n').split('\n'),sockets)
+            os.makedirs(root + '/' + str(pid))
+            writeNumaMaps(root + '/' + str(pid) + '/numa_maps',ttl)
+
+        (t_old,old) = measure(lambda: historicalLoop(pid2file,sockets))
+        (t_new,new) = measure(lambda: NumaMemCollector(sockets,root).collect(pid2file.keys()))
+
+        # Rounding may differ of 0.01 Mb
+        for pid in old:
+            for (o,n) in zip(old[pid],new[pid]):
+                if abs(o-n) > 0.011:
+                    print("DIFFERENCE pid " + str(pid) + ": " + str(old[pid]) + " " + str(new[pid]))
+                    break
+
+        print("{} processes".format(nb_processes))
+        print("1 fork/pid, serially      {:8.4f} s".format(t_old))
+        print("NumaMemCollector          {:8.4f} s".format(t_new))
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+#
+# Benchmark: overlap detection between tasks
+#
+# Usage: python3 BenchOverlap.py [tasks ...]
+#
+# Each task is bound to 4 cores, 1% of the tasks overlap another task
+# The historical algorithm (every pair of tasks compared) is measured only up to 2000 tasks
+#
+
+from running import _overlappingTasks
+import random
+import sys
+import time
+
+CORES_PER_TASK = 4
+MAX_PAIRS_TASKS = 2000
+
+def measure(f,repeat=3):
+    """ Return the best time (s) of several calls to f, and the result of the last call """
+    best = None
+    for r in range(repeat):
+        begin = time.time()
+        rvl = f()
+        d = time.time() - begin
+        if best == None or d < best:
+            best = d
+    return (best,rvl)
+
+def pairsAlgorithm(tasks_bound):
+    """ The historical algorithm: compare every pair of tasks """
+    over = []
+    over_cores = []
+    for i in range(len(tasks_bound)):
+        for j in range(i+1,len(tasks_bound)):
+            overlap = list(set(tasks_bound[i])&set(tasks_bound[j]))
+            if len(overlap)!=0:
+                over.append((i,j))
+                over_cores.extend(overlap)
+    over_cores = sorted(set(over_cores))
+    return (over,over_cores)
+
+def buildTasksBound(nb_tasks):
+    rand = random.Random(nb_tasks)
+    tasks_bound = [ list(range(t*CORES_PER_TASK,(t+1)*CORES_PER_TASK)) for t in range(nb_tasks) ]
+    for t in rand.sample(range(nb_tasks),max(1,nb_tasks//100)):
+        tasks_bound[t][0] = rand.randrange(nb_tasks*CORES_PER_TASK)
+    return tasks_bound
+
+def main():
+    sizes = [1000,10000,100000]
+    if len(sys.argv) > 1:
+        sizes = list(map(int,sys.argv[1:]))
+
+    print("{:>8} {:>12} {:>12} {:>10}".format("tasks","pairs (s)","index (s)","overlaps"))
+    for n in sizes:
+        tasks_bound = buildTasksBound(n)
+        (t_new,new) = measure(lambda: _overlappingTasks(tasks_bound))
+        t_old = '-'
+        if n <= MAX_PAIRS_TASKS:
+            (t,old) = measure(lambda: pairsAlgorithm(tasks_bound),1)
+            t_old = "{:.4f}".format(t)
+            if old != new:
+                print("DIFFERENCE for " + str(n) + " tasks")
+        print("{:>8} {:>12} {:>12.4f} {:>10}".format(n,t_old,t_new,len(new[0])))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+#
+# Benchmark: ProcScanner vs PsScanner
+#
+# Usage: python3 BenchProcScanner.py [processes [threads/process]]
+#
+# A synthetic /proc tree is built, with as many processes and threads as specified
+# ProcScanner reads this tree, PsScanner parses the equivalent ps output
+# The cost of forking ps on THIS machine is measured too, as it is not included in the parsing time
+#
+
+from procscan import *
+from fakeproc import *
+import sys
+import time
+import shutil
+import tempfile
+
+def measure(f,repeat=5):
+    """ Return the best time (s) of several calls to f """
+    best = None
+    for r in range(repeat):
+        begin = time.time()
+        f()
+        d = time.time() - begin
+        if best == None or d < best:
+            best = d
+    return best
+
+def main():
+    nb_processes = 128
+    nb_threads   = 20
+    if len(sys.argv) > 1:
+        nb_processes = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        nb_threads = int(sys.argv[2])
+
+    # Half of the processes belong to another uid, they should be filtered out before reading their threads
+    processes  = makeProcesses(nb_processes//2,nb_threads)
+    processes += makeProcesses(nb_processes//2,nb_threads,os.getuid()+1)
+    for p in processes[nb_processes//2:]:
+        p['pid'] += 10000000
+    user = pwd.getpwuid(os.getuid()).pw_name
+
+    root = tempfile.mkdtemp()
+    try:
+        makeFakeProc(root,processes)
+        lines = psOutput(processes)
+
+        print("{} processes, {} threads/process".format(nb_processes,nb_threads))
+        print("ProcScanner --check ALL    {:8.4f} s".format(measure(lambda: ProcScanner(root).scan('ALL'))))
+        print("ProcScanner --check {:<7}{:8.4f} s".format(user,measure(lambda: ProcScanner(root).scan(user))))
+        print("PsScanner   parsing only   {:8.4f} s".format(measure(lambda: PsScanner().parse(lines))))
+        print("ps -m ax on this machine   {:8.4f} s".format(measure(lambda: PsScanner().scan('ALL'))))
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+#
+# Benchmark: walking threads_bound (historical) vs using the ThreadsSnapshot
+#
+# Usage: python3 BenchSnapshot.py [processes [threads/process]]
+#
+# Measured: the aggregates needed by --summary, --csv, the tasks_bound and the order of the lines printed by --threads
+#
+
+from snapshot import *
+import itertools
+import sys
+import time
+
+CORES = 40
+
+def measure(f,repeat=5):
+    """ Return the best time (s) of several calls to f, and the result of the last call """
+    best = None
+    for r in range(repeat):
+        begin = time.time()
+        rvl = f()
+        d = time.time() - begin
+        if best == None or d < best:
+            best = d
+    return (best,rvl)
+
+def buildThreadsBound(nb_processes,nb_threads):
+    threads_bound = {}
+    tid = 1000
+    for p in range(nb_processes):
+        pid = tid
+        threads = {}
+        for t in range(nb_threads):
+            psr = (p*nb_threads+t) % (2*CORES)
+            threads[tid] = {'tid':tid, 'psr':psr, 'ppsr':psr % CORES, 'state':'R' if t%3 else 'S', 'cpu':float(t%100), 'mem':0.1, 'sid':p//10}
+            tid += 1
+        threads_bound[pid] = {'pid':pid, 'sid':p//10, 'tag':p, 'jobtag':p//10, 'mem':0.1, 'R':True, 'threads':threads}
+    return threads_bound
+
+def historical(threads_bound):
+    """ The walks done by PrintingForSummary, PrintingForCsv, BuildTasksBoundFromPs and PrintingForMatrixThreads up to placement 1.14 """
+
+    # PrintingForSummary._getUse
+    cpu = 0.0; running = 0; total = 0; mem = 0.0
+    for pid,p in threads_bound.items():
+        mem += float(p['mem'])
+        if p['R']:
+            for tid,t in p['threads'].items():
+                cpu += float(t['cpu'])
+                if t['state'] == 'R':
+                    running += 1
+                total += 1
+
+    # PrintingForCsv.__getUse
+    cores = {}
+    for pid,p in threads_bound.items():
+        if p['R']:
+            for tid,t in p['threads'].items():
+                c = float(t['cpu']) if t['state'] == 'R' else 0.0
+                core = int(t['ppsr'])
+                if core in cores:
+                    cores[core] += c
+                else:
+                    cores[core] = c
+
+    # BuildTasksBoundFromPs
+    tasks_bound = []
+    for (pid,proc) in sorted(iter(threads_bound.items()),key=lambda k_v1:(k_v1[1]['tag'],k_v1[0])):
+        tasks_bound.append([ t['psr'] for t in proc['threads'].values() if t['state']=='R' ])
+
+    # PrintingForMatrixThreads.__getCpuBinding
+    for pid in threads_bound:
+        threads_bound[pid]['ppsr_min'] = min([ t['ppsr'] for t in threads_bound[pid]['threads'].values() ])
+    sid_threads_bound = {}
+    for pid in threads_bound:
+        sid_threads_bound.setdefault(threads_bound[pid]['sid'],{})[pid] = threads_bound[pid]
+    lines = []
+    for sid in sorted(sid_threads_bound):
+        for (pid,thr) in sorted(sid_threads_bound[sid].items()):
+            for (tid,t) in sorted(iter(thr['threads'].items()),key=lambda k_v:(k_v[1]['ppsr'],k_v[0])):
+                lines.append(tid)
+
+    return (cpu,running,total,mem,cores,tasks_bound,lines)
+
+def withSnapshot(snapshot):
+    """ The same thing, with the snapshot """
+
+    mem     = sum(snapshot.task_mem,0.0)
+    cpu     = sum(itertools.compress(snapshot.cpu,snapshot.process_r))
+    running = sum(itertools.compress(snapshot.thread_r,snapshot.process_r))
+    total   = sum(snapshot.process_r)
+    cores   = snapshot.cpuPerCore()
+    tasks_bound = snapshot.tasksBound()
+
+    task_ppsr_min = snapshot.perTask(min,snapshot.ppsr)
+    sid_tasks = snapshot.groupBy(snapshot.task_sid)
+    pids  = snapshot.task_pid
+    tids  = snapshot.tid
+    ppsrs = snapshot.ppsr
+    ppsrs_tids = list(zip(ppsrs,tids))
+    lines = []
+    for sid in sorted(sid_tasks):
+        for t in sorted(sid_tasks[sid],key=pids.__getitem__):
+            for r in sorted(snapshot.taskRows(t),key=ppsrs_tids.__getitem__):
+                lines.append(tids[r])
+
+    return (cpu,running,total,mem,cores,tasks_bound,lines)
+
+def main():
+    nb_processes = 100
+    nb_threads   = 100
+    if len(sys.argv) > 1:
+        nb_processes = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        nb_threads = int(sys.argv[2])
+
+    threads_bound = buildThreadsBound(nb_processes,nb_threads)
+    (t_old,old)   = measure(lambda: historical(threads_bound))
+    (t_build,snapshot) = measure(lambda: ThreadsSnapshot(threads_bound))
+    (t_new,new)   = measure(lambda: withSnapshot(snapshot))
+
+    if old[1:] != new[1:] or abs(old[0]-new[0]) > 1e-6:
+        print("DIFFERENCE")
+
+    print("{} processes x {} threads".format(nb_processes,nb_threads))
+    print("Walking threads_bound      {:8.4f} s".format(t_old))
+    print("Building the snapshot      {:8.4f} s".format(t_build))
+    print("Using the snapshot         {:8.4f} s".format(t_new))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from agent import *
+from front import *
+from fakeproc import *
+import io
+import json
+import socket
+import os
+import stat
+import shutil
+import argparse
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+
+def echoHandler(argv):
+    """ A fake placement: prints its arguments """
+    if '--bogus' in argv:
+        raise SystemExit(2)
+    if '--fail' in argv:
+        raise PlacementException('ERROR - failing')
+    if '--crash' in argv:
+        raise OSError(2,'No such file or directory')
+    return (0,'checked ' + ' '.join(argv[1:]) + '\n')
+
+class TestAgent(unittest.TestCase):
+    def setUp(self):
+        # The tests cannot bind a privileged port
+        self.env = mock.patch.dict(os.environ,{'PLACEMENT_AGENT_UNPRIVILEGED':'1'})
+        self.env.start()
+        self.agent = PlacementAgent('127.0.0.1:0',echoHandler)
+        threading.Thread(target=self.agent.serve_forever,daemon=True).start()
+        self.port = int(self.agent.address().split(':')[1])
+
+    def tearDown(self):
+        self.agent.shutdown()
+        self.env.stop()
+
+    def test_query(self):
+        self.assertEqual(queryAgent('127.0.0.1',['placement','--check','ALL'],self.port),(0,'checked --check ALL\n'))
+
+    def test_errors(self):
+        self.assertEqual(queryAgent('127.0.0.1',['placement','--fail'],self.port),(1,'PLACEMENT ERROR - failing\n'))
+        self.assertEqual(queryAgent('127.0.0.1',['placement','--bogus'],self.port)[0],2)
+        self.assertEqual(queryAgent('127.0.0.1',['placement','--crash'],self.port),(1,'ERROR - FileNotFoundError: [Errno 2] No such file or directory\n'))
+        self.assertEqual(self.agent.answer(b'{"argv":"placement"}\n')['status'],1)
+        self.assertEqual(self.agent.answer(b'nothing\n')['status'],1)
+
+    def test_no_agent(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1',0))
+        port = sock.getsockname()[1]
+        sock.close()
+        self.assertEqual(queryAgent('127.0.0.1',['placement'],port),None)
+
+    def test_unprivileged(self):
+        """ Any job could listen on an unprivileged port: the agent is not used """
+        with mock.patch.dict(os.environ,{'PLACEMENT_AGENT_UNPRIVILEGED':'0'}):
+            self.assertEqual(queryAgent('127.0.0.1',['placement','--check','ALL'],self.port),None)
+        self.assertTrue(isTrustedPort(AGENT_PORT))
+
+    def test_refused(self):
+        """ The switches which block the agent are refused """
+        import placement
+        self.assertEqual(placement.agentRequest(['placement','--check','ALL','--sample_window','1000'],None,None),
+                         (1,'ERROR - The agent does not accept --sample_window\n'))
+        self.assertEqual(placement.agentRequest(['placement','--check','ALL','--host','node1'],None,None)[0],1)
+
+    def test_disabled(self):
+        with mock.patch.dict(os.environ,{'PLACEMENT_AGENT_PORT':'0'}):
+            self.assertEqual(queryAgent('127.0.0.1',['placement']),None)
+
+    def test_unix_socket(self):
+        tmp   = tempfile.mkdtemp()
+        agent = PlacementAgent(tmp + '/agent.sock',echoHandler)
+        threading.Thread(target=agent.serve_forever,daemon=True).start()
+        try:
+            sock = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+            sock.connect(tmp + '/agent.sock')
+            sock.sendall(b'{"argv":["placement","--summary"]}\n')
+            self.assertEqual(json.loads(sock.makefile().readline()),{'status':0, 'output':'checked --summary\n'})
+            sock.close()
+        finally:
+            agent.shutdown()
+            shutil.rmtree(tmp)
+
+    def test_front_node(self):
+        """ The front node uses the agent, ssh is not called """
+
+        tmp = tempfile.mkdtemp()
+        with open(tmp + '/ssh','w') as f:
+            f.write('#! /bin/bash\necho "ssh called"\nexit 1\n')
+        os.chmod(tmp + '/ssh',stat.S_IRWXU)
+        env = {'PATH':tmp + ':' + os.environ['PATH'], 'PLACEMENTBASH':'placement', 'PLACEMENT_AGENT_PORT':str(self.port)}
+        options = argparse.Namespace(ff=False,continuous=False,pathological=False,host='127.0.0.1',
+                                     host_workers=16,host_timeout=60,host_unordered=False)
+        fn = FrontNode([])
+        fn.setOptions(options,['placement.py','--host','127.0.0.1'])
+        out = io.StringIO()
+        try:
+            with mock.patch.dict(os.environ,env), redirect_stdout(out):
+                fn.runPlacement()
+        finally:
+            shutil.rmtree(tmp)
+        self.assertEqual(out.getvalue(),'checked --check ALL --from-frontal\n')
+
+class TestRollingSampler(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.processes = makeProcesses(2,2)
+        makeFakeProc(self.root,self.processes)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_sample(self):
+        sampler = RollingSampler(5,self.root)
+        scanned = ProcScanner(self.root).scan('ALL')
+
+        # No tick yet: nothing changes
+        self.assertEqual(sampler.sample(scanned),scanned)
+
+        # Thread 0 of process 0 uses 1 s during 4 s, a new thread appears in process 1
+        p = self.processes[0]
+        with mock.patch('agent.time') as fake_time:
+            fake_time.time.side_effect = [100.0,104.0]
+            sampler.tick()
+            (tid,psr,state,ticks) = p['threads'][0]
+            writeThreadStat(self.root,p,(tid,psr,state,ticks+HZ))
+            os.makedirs(self.root + '/' + str(self.processes[1]['pid']) + '/task/9999')
+            writeThreadStat(self.root,self.processes[1],(9999,7,'R',0))
+            scanned[1]['threads'].append((9999,7,'R',12.0))
+            sampled = sampler.sample(scanned)
+
+        self.assertEqual(sampled[0]['threads'],[(1000,0,'R',25.0),(1001,1,'S',0.0)])
+        self.assertEqual(sampled[1]['threads'],[(1003,2,'R',0.0),(1004,3,'S',0.0),(9999,7,'R',12.0)])
+
+if __name__ == '__main__':
+    unittest.main()
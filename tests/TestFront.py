@@ -0,0 +1,211 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from front import *
+from agent import PlacementAgent
+import io
+import os
+import stat
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+# A fake ssh: ssh -x host placement ... prints the host name
+#     The hosts in $SLOW answer after 0.5 s, the hosts in $BAD fail, the hosts in $HUNG never answer
+FAKE_SSH = '''#! /bin/bash
+host=$2
+[[ " $SLOW " == *" $host "* ]] && sleep 0.5
+[[ " $HUNG " == *" $host "* ]] && sleep 10
+if [[ " $* " == *" --summary "* ]]
+then
+    [[ " $WARN " == *" $host "* ]] && w=' W'
+    echo "$host 0.1:N:N:99:100:10$w"
+else
+    echo "checked $host"
+fi
+[[ " $BAD " == *" $host "* ]] && exit 2
+exit 0
+'''
+
+class TestFrontHosts(unittest.TestCase):
+    def setUp(self):
+        os.environ['PLACEMENT_AGENT_PORT'] = '0'
+        os.environ['PLACEMENT_SSH_MUX'] = '0'
+        self.bin = tempfile.mkdtemp()
+        with open(self.bin + '/ssh','w') as f:
+            f.write(FAKE_SSH)
+        os.chmod(self.bin + '/ssh',stat.S_IRWXU)
+        self.env = os.environ.copy()
+        os.environ['PATH'] = self.bin + ':' + os.environ['PATH']
+        os.environ['PLACEMENTBASH'] = 'placement'
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.env)
+        shutil.rmtree(self.bin)
+
+    def __run(self,hosts,workers=16,timeout=60,unordered=False,slow='',bad='',hung=''):
+        os.environ['SLOW'] = slow
+        os.environ['BAD']  = bad
+        os.environ['HUNG'] = hung
+        options = argparse.Namespace(ff=False,continuous=False,pathological=False,host=hosts,
+                                     host_workers=workers,host_timeout=timeout,host_unordered=unordered)
+        fn = FrontNode([])
+        fn.setOptions(options,['placement.py','--host',hosts])
+        out = io.StringIO()
+        begin = time.time()
+        with redirect_stdout(out):
+            self.assertTrue(fn.runPlacement())
+        return (out.getvalue().split('\n'),time.time()-begin)
+
+    def test_ordered(self):
+        (out,t) = self.__run('node[1-5]',slow='node1 node5')
+        self.assertEqual(out,[ 'checked node' + str(i) for i in range(1,6) ] + [''])
+        self.assertLess(t,0.9)
+
+    def test_unordered(self):
+        (out,t) = self.__run('node[1-4]',unordered=True,slow='node1')
+        self.assertEqual(out[-2],'checked node1')
+        self.assertEqual(sorted(out[0:3]),['checked node2','checked node3','checked node4'])
+
+    def test_sequential(self):
+        (out,t) = self.__run('node[1-2]',workers=1,slow='node1 node2')
+        self.assertGreater(t,0.9)
+
+    def test_errors(self):
+        (out,t) = self.__run('node[1-4]',timeout=1,bad='node2',hung='node3')
+        self.assertEqual(out[0],'checked node1')
+        self.assertEqual(out[1:4],['checked node2','host node2','ssh -x node2 placement --check ALL --from-frontal - ERROR code = 2'])
+        self.assertEqual(out[5],'host node3')
+        self.assertIn('TIMEOUT',out[6])
+        self.assertEqual(out[8],'checked node4')
+        self.assertLess(t,5)
+
+    def test_header(self):
+        """ With a header, the host name of a failing host is printed once """
+        os.environ['SLOW'] = ''
+        os.environ['BAD']  = 'node2'
+        os.environ['HUNG'] = ''
+        options = argparse.Namespace(ff=False,continuous=False,pathological=False,host='node[1-2]',
+                                     host_workers=16,host_timeout=60,host_unordered=False)
+        fn = FrontNode([])
+        fn.setOptions(options,['placement.py','--host','node[1-2]'])
+        out = io.StringIO()
+        with redirect_stdout(out):
+            fn._FrontNode__runPlacementHosts(['node1','node2'],header=True)
+        out = out.getvalue().split('\n')
+        self.assertEqual(out[0:4],['host node1','checked node1','host node2','checked node2'])
+        self.assertEqual(out.count('host node2'),1)
+
+    def test_agent(self):
+        """ --host with an agent on the host: the front node switches are not sent to the agent """
+        import placement
+        agent = PlacementAgent('127.0.0.1:0',lambda argv: placement.agentRequest(argv,None,None))
+        threading.Thread(target=agent.serve_forever,daemon=True).start()
+        env = {'PLACEMENT_AGENT_PORT':agent.address().split(':')[1], 'PLACEMENT_AGENT_UNPRIVILEGED':'1'}
+        options = argparse.Namespace(ff=False,continuous=False,pathological=False,host='127.0.0.1',
+                                     host_workers=4,host_timeout=60,host_unordered=True)
+        fn = FrontNode([])
+        fn.setOptions(options,['placement.py','--host','127.0.0.1','--host_workers','4','--host_timeout=60','--host_unordered'])
+        out = io.StringIO()
+        try:
+            with mock.patch.dict(os.environ,env), mock.patch('placement.RunningMode'), \
+                 mock.patch('placement.buildOutputs',return_value=['checked by the agent']), redirect_stdout(out):
+                self.assertTrue(fn.runPlacement())
+        finally:
+            agent.shutdown()
+        self.assertEqual(out.getvalue(),'checked by the agent\n')
+
+# A job running on 4 nodes
+class TestFrontJob(unittest.TestCase):
+    def setUp(self):
+        os.environ['PLACEMENT_AGENT_PORT'] = '0'
+        os.environ['PLACEMENT_SSH_MUX'] = '0'
+        self.tmp = tempfile.mkdtemp()
+        with open(self.tmp + '/ssh','w') as f:
+            f.write(FAKE_SSH)
+        os.chmod(self.tmp + '/ssh',stat.S_IRWXU)
+        with open(self.tmp + '/squeue.txt','w') as f:
+            f.write('1001@alice@shared@node[1-4]\n')
+        self.env = os.environ.copy()
+        os.environ['PATH'] = self.tmp + ':' + os.environ['PATH']
+        os.environ['PLACEMENTBASH'] = 'placement'
+        os.environ['PLACEMENT_CACHE_DIR'] = self.tmp
+        os.environ['PLACEMENT_SQUEUE_TTL'] = '3600'
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.env)
+        shutil.rmtree(self.tmp)
+
+    def __run(self,warn='',bad=''):
+        os.environ['SLOW'] = ''
+        os.environ['HUNG'] = ''
+        os.environ['WARN'] = warn
+        os.environ['BAD']  = bad
+        options = argparse.Namespace(ff=False,continuous=False,pathological=False,host=None,jobid=1001,checkme=False,all_nodes=True,
+                                     host_workers=16,host_timeout=60,host_unordered=False)
+        fn = FrontNode(['squeue'])
+        fn.setOptions(options,['placement.py','--jobid','1001','--all_nodes'])
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertTrue(fn.runPlacement())
+        return out.getvalue().split('\n')
+
+    def test_all_nodes(self):
+        out = self.__run(warn='node2 node4',bad='node3')
+        self.assertEqual(out[0:4],['node1 0.1:N:N:99:100:10',
+                                   'node2 0.1:N:N:99:100:10 W',
+                                   'node3 ssh -x node3 placement --jobid 1001 --check alice --summary --no_ansi --from-frontal - ERROR code = 2',
+                                   'node4 0.1:N:N:99:100:10 W'])
+        self.assertEqual(out[5],'2 node(s) with a warning out of 4')
+        self.assertEqual(out[7:],['host node2','checked node2','host node4','checked node4',''])
+
+    def test_no_warning(self):
+        out = self.__run()
+        self.assertEqual(out[5:],['0 node(s) with a warning out of 4',''])
+
+    def test_host(self):
+        """ --host with a job scheduler: the hosts are found without nodeset -e """
+        os.environ['SLOW'] = ''
+        os.environ['HUNG'] = ''
+        os.environ['BAD']  = ''
+        options = argparse.Namespace(ff=False,continuous=False,pathological=False,host='node[1-2],node7',jobid=None,checkme=False,
+                                     host_workers=16,host_timeout=60,host_unordered=False)
+        fn = FrontNode(['squeue'])
+        fn.setOptions(options,['placement.py','--host','node[1-2],node7'])
+        out = io.StringIO()
+        with mock.patch('slurm.runCmd',side_effect=PlacementException('nodeset not found')), redirect_stdout(out):
+            self.assertTrue(fn.runPlacement())
+        self.assertEqual(out.getvalue().split('\n'),['checked node1','checked node2','checked node7',''])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from gpuinfo import *
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+# A recent nvidia-smi: no power_readings, but gpu_power_readings
+RECENT_XML = b"""<?xml version="1.0" ?>
+<!DOCTYPE nvidia_smi_log SYSTEM "nvsmi_device_v12.dtd">
+<nvidia_smi_log>
+    <gpu id="00000000:07:00.0">
+        <minor_number>5</minor_number>
+        <fb_memory_usage><total>40960 MiB</total><used>10240 MiB</used></fb_memory_usage>
+        <utilization><gpu_util>99 %</gpu_util></utilization>
+        <gpu_power_readings>
+            <power_draw>N/A</power_draw>
+            <instant_power_draw>200.00 W</instant_power_draw>
+            <current_power_limit>400.00 W</current_power_limit>
+        </gpu_power_readings>
+        <module_power_readings><power_draw>300.00 W</power_draw></module_power_readings>
+        <processes>
+            <process_info><pid>1234</pid><used_memory>1 GiB</used_memory></process_info>
+        </processes>
+    </gpu>
+</nvidia_smi_log>
+"""
+
+class TestGpuXmlReader(unittest.TestCase):
+    def test_debug_file(self):
+        index = GpuXmlReader().parse('../debug/gpu.xml')
+        self.assertEqual(sorted(index.keys()),[0,1,2,3])
+        self.assertEqual(index[0]['mem_used'],152)
+        self.assertEqual(index[0]['mem_total'],11439)
+        self.assertEqual(index[1]['util'],63)
+        self.assertEqual(index[2]['pwr_used'],27.62)
+        self.assertEqual(index[3]['pwr_limit'],149.0)
+        self.assertEqual(index[1]['processes'],[[23303,74*1048576],[23304,73*1048576]])
+        self.assertEqual(index[3]['processes'],[])
+
+    def test_gpu_power_readings(self):
+        index = GpuXmlReader().parse(io.BytesIO(RECENT_XML))
+        self.assertEqual(list(index.keys()),[5])
+        self.assertEqual(index[5]['pwr_used'],200.0)
+        self.assertEqual(index[5]['pwr_limit'],400.0)
+        self.assertEqual(gpuStatus(index,5),{'id':5, 'M':25, 'U':99, 'P':50, 'PS':[[1234,100]]})
+
+class TestGpuCsvReader(unittest.TestCase):
+    def setUp(self):
+        with open('../debug/gpu-query.csv','r') as f:
+            self.gpus = f.read().split('\n')
+        with open('../debug/gpu-apps.csv','r') as f:
+            self.apps = f.read().split('\n')
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_same_as_xml(self):
+        self.assertEqual(GpuCsvReader(self.root).parse(self.gpus,self.apps),GpuXmlReader().parse('../debug/gpu.xml'))
+
+    def test_minor_number(self):
+        # The minor number is not always the nvidia-smi index
+        os.makedirs(self.root + '/0000:04:00.0')
+        with open(self.root + '/0000:04:00.0/information','w') as f:
+            f.write('Model: \t\t Tesla K80\nIRQ:   \t\t 33\nDevice Minor: \t 7\n')
+        index = GpuCsvReader(self.root).parse(self.gpus,self.apps)
+        self.assertEqual(sorted(index.keys()),[1,2,3,7])
+        self.assertEqual(index[7]['processes'],[[23301,73*1048576],[23302,74*1048576]])
+
+    def test_not_available(self):
+        index = GpuCsvReader(self.root).parse(['0, 00000000:04:00.0, GPU-0, 10, 100, 5, [N/A], [N/A]'],['GPU-0, 12, [N/A]'])
+        self.assertEqual(gpuStatus(index,0),{'id':0, 'M':10, 'U':5, 'P':0, 'PS':[[12,0]]})
+
+class TestGpuStatus(unittest.TestCase):
+    def test_status(self):
+        index = GpuXmlReader().parse('../debug/gpu.xml')
+        self.assertEqual(gpuStatus(index,0),{'id':0, 'M':1, 'U':60, 'P':75, 'PS':[[23301,98],[23302,100]]})
+        self.assertEqual(gpuStatus(index,2),{'id':2, 'M':0, 'U':0, 'P':18, 'PS':[]})
+
+    def test_unknown_gpu(self):
+        self.assertEqual(gpuStatus({},4),{'id':4, 'M':0, 'U':0, 'P':0, 'PS':[]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,8 +26,13 @@
 
 from utilities import *
 from hardware import *
+import io
 import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
+from contextlib import redirect_stderr
 
 # Testing PLACEMENT_ARCHI
 class TestHardwareConf1(unittest.TestCase):
@@ -41,6 +46,7 @@ class TestHardwareConf1(unittest.TestCase):
  
     def test_archi_ko(self):
         os.environ['PLACEMENT_ARCHI']= 'toto'
+        os.environ['PLACEMENT_SYSROOT']= 'dir_does_not_exist'
         self.assertRaises(PlacementException,Hardware.factory)
 
 # Testing HOSTNAME
@@ -55,6 +61,7 @@ class TestHardwareConf3(unittest.TestCase):
  
     def test_archi_ko(self):
         os.environ['HOSTNALE']= 'toto'
+        os.environ['PLACEMENT_SYSROOT']= 'dir_does_not_exist'
         self.assertRaises(PlacementException,Hardware.factory)
 
 # Testing without any configuration
@@ -63,6 +70,7 @@ class TestHardwareNoConf(unittest.TestCase):
         os.environ.pop('PLACEMENT_ARCHI',0)
         os.environ['PLACEMENT_CONF'] = 'file_does_not_exist'
         os.environ['SLURM_CONF'] = 'file_does_not_exist'
+        os.environ['PLACEMENT_SYSROOT'] = 'dir_does_not_exist'
     
     def test_archi_ko(self):
         self.assertRaises(PlacementException,Hardware.factory)
@@ -209,5 +217,139 @@ class TestHardwareMesca2(unittest.TestCase):
         self.assertEqual(self.hardware.getCore2PhysCore(118),118)
         self.assertEqual(self.hardware.getCore2PhysCore(127),127)
         
+def makeFakeSys(root,cpus,mem_kb,online=None):
+    """ Write a fake /sys: cpus = a list of (cpu,socket,siblings), mem_kb = the MemTotal of each numa node """
+
+    for (cpu,socket,siblings) in cpus:
+        topology = root + '/sys/devices/system/cpu/cpu' + str(cpu) + '/topology'
+        os.makedirs(topology)
+        with open(topology + '/physical_package_id','w') as f:
+            f.write(str(socket) + '\n')
+        with open(topology + '/thread_siblings_list','w') as f:
+            f.write(list2CompactString(siblings) + '\n')
+    if online != None:
+        with open(root + '/sys/devices/system/cpu/online','w') as f:
+            f.write(online + '\n')
+    for n in range(len(mem_kb)):
+        os.makedirs(root + '/sys/devices/system/node/node' + str(n))
+        with open(root + '/sys/devices/system/node/node' + str(n) + '/meminfo','w') as f:
+            f.write('Node ' + str(n) + ' MemTotal:       ' + str(mem_kb[n]) + ' kB\n')
+
+def intelCpus(sockets,cores,threads):
+    """ cpu = thread * sockets * cores + socket * cores + core """
+    n = sockets * cores
+    return [ (t*n+s*cores+c,s,[ u*n+s*cores+c for u in range(threads) ]) for s in range(sockets) for c in range(cores) for t in range(threads) ]
+
+def consecutiveCpus(sockets,cores,threads,first_socket=0):
+    """ The threads of a core are consecutive (AMD, Power) """
+    return [ ((s*cores+c)*threads+t,first_socket+s,[ (s*cores+c)*threads+u for u in range(threads) ]) for s in range(sockets) for c in range(cores) for t in range(threads) ]
+
+class TestSysfsHardware(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_intel(self):
+        makeFakeSys(self.root,intelCpus(2,10,2),[32*1024*1024,32*1024*1024])
+        hard = SysfsHardware(self.root,'')
+        self.assertEqual((hard.SOCKETS_PER_NODE,hard.CORES_PER_SOCKET,hard.THREADS_PER_CORE,hard.HYPERTHREADING),(2,10,2,True))
+        self.assertEqual((hard.CORES_PER_NODE,hard.MEM_PER_SOCKET,hard.IS_SHARED),(20,32768,False))
+        self.assertEqual(hard.ADDRESSING,None)
+        self.assertEqual(hard.getCore2Socket(25),0)
+
+    def test_consecutive_threads(self):
+        makeFakeSys(self.root,consecutiveCpus(2,4,2),[16*1024*1024])
+        hard = SysfsHardware(self.root,'')
+        self.assertEqual((hard.SOCKETS_PER_NODE,hard.CORES_PER_SOCKET,hard.THREADS_PER_CORE,hard.MEM_PER_SOCKET),(2,4,2,8192))
+        self.assertEqual(hard.ADDRESSING,[0,2,4,6,8,10,12,14,1,3,5,7,9,11,13,15])
+        self.assertEqual(hard.getAddr2Core(9),12)
+        self.assertEqual(hard.getCore2Addr(hard.getAddr2Core(5)),5)
+
+    def test_smt4(self):
+        makeFakeSys(self.root,consecutiveCpus(1,2,4,first_socket=8),[8*1024*1024])
+        hard = SysfsHardware(self.root,'')
+        self.assertEqual((hard.SOCKETS_PER_NODE,hard.CORES_PER_SOCKET,hard.THREADS_PER_CORE),(1,2,4))
+        self.assertEqual(hard.ADDRESSING,[0,4,1,5,2,6,3,7])
+
+    def test_sockets_interleaved(self):
+        """ No hyperthreading, the even cpus on socket 0, the odd ones on socket 1 """
+        makeFakeSys(self.root,[ (c,c%2,[c]) for c in range(8) ],[4*1024*1024,4*1024*1024])
+        hard = SysfsHardware(self.root,'')
+        self.assertEqual((hard.SOCKETS_PER_NODE,hard.CORES_PER_SOCKET,hard.THREADS_PER_CORE,hard.HYPERTHREADING),(2,4,1,False))
+        self.assertEqual(hard.ADDRESSING,[0,2,4,6,1,3,5,7])
+
+    def test_offline(self):
+        """ The cpus 4-7 (the second thread of each core) are offline """
+        makeFakeSys(self.root,intelCpus(1,4,2),[4*1024*1024],online='0-3')
+        hard = SysfsHardware(self.root,'')
+        self.assertEqual((hard.SOCKETS_PER_NODE,hard.CORES_PER_SOCKET,hard.THREADS_PER_CORE),(1,4,1))
+
+    def test_irregular(self):
+        """ 2 cores with 2 threads, 2 cores with 1 thread (hybrid) """
+        makeFakeSys(self.root,[(0,0,[0,1]),(1,0,[0,1]),(2,0,[2,3]),(3,0,[2,3]),(4,0,[4]),(5,0,[5])],[4*1024*1024])
+        self.assertRaises(PlacementException,SysfsHardware,self.root,'')
+        self.assertRaises(PlacementException,SysfsHardware,self.root + '/dir_does_not_exist','')
+
+    def test_cache(self):
+        Timings.reset()
+        makeFakeSys(self.root + '/root',intelCpus(2,2,1),[1024*1024],online='0-3')
+        self.assertEqual(SysfsHardware(self.root + '/root',self.root).CORES_PER_SOCKET,2)
+        self.assertEqual(Timings.getCounters().get('topology_cache_hits',0),0)
+
+        # The topology is not read again
+        with open(self.root + '/root/sys/devices/system/cpu/cpu3/topology/physical_package_id','w') as f:
+            f.write('0\n')
+        self.assertEqual(SysfsHardware(self.root + '/root',self.root).CORES_PER_SOCKET,2)
+        self.assertEqual(Timings.getCounters()['topology_cache_hits'],1)
+
+        # The online cpus change: scanned again
+        with open(self.root + '/root/sys/devices/system/cpu/online','w') as f:
+            f.write('0-2\n')
+        self.assertRaises(PlacementException,SysfsHardware,self.root + '/root',self.root)
+
+    def test_factory(self):
+        """ The host is not described by the configuration """
+        makeFakeSys(self.root,intelCpus(2,10,2),[32*1024*1024,32*1024*1024])
+        env = {'PLACEMENT_CONF':'test3.conf', 'HOSTNAME':'unknown', 'PLACEMENT_SYSROOT':self.root, 'PLACEMENT_CACHE_DIR':''}
+        err = io.StringIO()
+        with mock.patch.dict(os.environ,env), redirect_stderr(err):
+            os.environ.pop('PLACEMENT_ARCHI',0)
+            os.environ.pop('PLACEMENT_IS_SHARED',0)
+            hard = Hardware.factory()
+            self.assertEqual((hard.NAME,hard.IS_SHARED),('sysfs',False))
+            self.assertIn('WARNING - unknown is not described by test3.conf',err.getvalue())
+            os.environ['HOSTNAME'] = 'node45'
+            self.assertEqual(Hardware.factory().NAME,'hard3')
+            os.environ['PLACEMENT_ARCHI'] = 'sysfs'
+            self.assertEqual(Hardware.factory().NAME,'sysfs')
+
+            # A typo in PLACEMENT_ARCHI is an error
+            os.environ['HOSTNAME'] = 'unknown'
+            os.environ['PLACEMENT_ARCHI'] = 'hard33'
+            self.assertRaises(PlacementException,Hardware.factory)
+
+    def test_shared(self):
+        """ IS_SHARED is read from PLACEMENT_IS_SHARED or from the section [sysfs] """
+        makeFakeSys(self.root + '/root',intelCpus(2,10,2),[32*1024*1024,32*1024*1024])
+        with open(self.root + '/placement.conf','w') as f:
+            f.write('[sysfs]\nIS_SHARED: True\n\n[hosts]\n')
+        env = {'PLACEMENT_CONF':self.root + '/placement.conf', 'HOSTNAME':'unknown', 'PLACEMENT_SYSROOT':self.root + '/root', 'PLACEMENT_CACHE_DIR':''}
+        with mock.patch.dict(os.environ,env), redirect_stderr(io.StringIO()):
+            os.environ.pop('PLACEMENT_ARCHI',0)
+            os.environ.pop('PLACEMENT_IS_SHARED',0)
+            self.assertEqual(Hardware.factory().IS_SHARED,True)
+            os.environ['PLACEMENT_IS_SHARED'] = 'False'
+            self.assertEqual(Hardware.factory().IS_SHARED,False)
+
+    def test_offline_address(self):
+        """ The cpus 2 and 3 are offline: they are not known """
+        makeFakeSys(self.root,[ (c,0,[c]) for c in (0,1,4,5) ],[4*1024*1024],online='0-1,4-5')
+        hard = SysfsHardware(self.root,'')
+        self.assertEqual(hard.getAddr2Core(4),2)
+        self.assertRaises(PlacementException,hard.getAddr2Core,2)
+        self.assertRaises(PlacementException,hard.getAddr2Core,9)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,106 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from hostindex import *
+from utilities import expandNodeList
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import configparser
+
+PATTERNS = ['node[1-100]','node[0001-0150]','fat[1,2,5]','n[1-2]-ib[3-4]','x[1-20][1-5]','login','gpu[07-10,15]','node1[0-5]','r[1-2]c[01-12]n[1-4]']
+
+class TestHostIndex(unittest.TestCase):
+    def test_bad_pattern(self):
+        self.assertRaises(PlacementException,HostIndex,[('node[a-b]','archi')])
+
+    def test_same_as_expand(self):
+        """ The index finds exactly the hosts of expandNodeList """
+        candidates = ['node' + str(i) for i in range(0,200)] + ['node' + str(i).zfill(4) for i in range(0,200)]
+        candidates+= ['fat' + str(i) for i in range(0,8)] + ['n1-ib3','n2-ib4','n3-ib3','n1-ib','login','login1']
+        candidates+= ['x' + str(i) for i in range(100,300)] + ['gpu' + str(i).zfill(2) for i in range(0,20)] + ['gpu7','gpu015']
+        candidates+= ['r' + str(r) + 'c' + str(c).zfill(2) + 'n' + str(n) for r in range(0,4) for c in range(0,14) for n in range(3,6)] + ['r1c1n1','r1c001n1']
+        for p in PATTERNS:
+            index    = HostIndex([(p,'archi')])
+            expanded = expandNodeList(p)
+            for c in candidates:
+                self.assertEqual(index.find(c) != None,c in expanded,p + ' ' + c)
+
+    def test_order(self):
+        index = HostIndex([('node[1-100]','hard3'),('node[50-150]','hard1')])
+        self.assertEqual(index.find('node60'),'hard3')
+        self.assertEqual(index.find('node120'),'hard1')
+        self.assertEqual(index.find('node151'),None)
+
+    def test_json(self):
+        index = HostIndex([('node[1-100]','hard3'),('login','hard1')])
+        index = HostIndex.fromJson(index.toJson())
+        self.assertEqual(index.find('node60'),'hard3')
+        self.assertEqual(index.find('login'),'hard1')
+
+class TestHostIndexCache(unittest.TestCase):
+    def setUp(self):
+        Timings.reset()
+        self.root = tempfile.mkdtemp()
+        self.conf = self.root + '/placement.conf'
+        self.writeConf('node[1-100]: hard3\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def writeConf(self,hosts):
+        with open(self.conf,'w') as f:
+            f.write('[hard3]\nSOCKETS_PER_NODE: 2\n\n[hosts]\n' + hosts)
+
+    def load(self):
+        config = configparser.RawConfigParser()
+        config.read(self.conf)
+        return HostIndex.load(self.conf,config,self.root)
+
+    def test_cache(self):
+        self.assertEqual(self.load().find('node5'),'hard3')
+        self.assertEqual(Timings.getCounters().get('hostindex_cache_hits',0),0)
+        self.assertEqual(self.load().find('node5'),'hard3')
+        self.assertEqual(Timings.getCounters()['hostindex_cache_hits'],1)
+
+    def test_modified(self):
+        self.load()
+        self.writeConf('node[1-100]: hard3\nnode[101-200]: hard1\n')
+        st = os.stat(self.conf)
+        os.utime(self.conf,ns=(st.st_atime_ns,st.st_mtime_ns + 1000000000))
+        self.assertEqual(self.load().find('node150'),'hard1')
+        self.assertEqual(Timings.getCounters().get('hostindex_cache_hits',0),0)
+
+    def test_no_cache(self):
+        config = configparser.RawConfigParser()
+        config.read(self.conf)
+        self.assertEqual(HostIndex.load(self.conf,config,'').find('node5'),'hard3')
+        self.assertEqual(os.listdir(self.root),['placement.conf'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from numamem import *
+import os
+import errno
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+NUMA_MAPS = """00400000 default file=/usr/bin/a.out mapped=256 N0=256 kernelpagesize_kB=4
+01000000 default heap anon=512 dirty=512 N0=256 N1=256 kernelpagesize_kB=4
+7f0000000000 default anon=4 dirty=4 N1=4 kernelpagesize_kB=2048
+7ffc00000000 default stack anon=3 dirty=3 N1=3 kernelpagesize_kB=4
+"""
+
+class TestParseNumastat(unittest.TestCase):
+    def test_debug_files(self):
+        with open('../debug/18596.NUMASTAT.txt','r') as f:
+            lines = f.read().rstrip('\n').split('\n')
+        self.assertEqual(parseNumastat(lines,2),[1.44,0.46])
+        self.assertRaises(PlacementException,parseNumastat,lines,4)
+
+    def test_permission(self):
+        self.assertEqual(parseNumastat(['Can\'t read /proc/1/numa_maps: Permission denied'],2),None)
+
+class TestNumaMemCollector(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for pid in range(100,110):
+            os.makedirs(self.root + '/' + str(pid))
+            with open(self.root + '/' + str(pid) + '/numa_maps','w') as f:
+                f.write(NUMA_MAPS)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_readNumaMaps(self):
+        self.assertEqual(NumaMemCollector(2,self.root).readNumaMaps(100),[2.0,9.01])
+        self.assertRaises(PlacementException,NumaMemCollector(1,self.root).readNumaMaps,100)
+
+    def test_collect(self):
+        numamems = NumaMemCollector(2,self.root,3).collect(list(range(100,112)))
+        self.assertEqual(sorted(numamems.keys()),list(range(100,110)))
+        self.assertEqual(numamems[105],[2.0,9.01])
+        self.assertEqual(NumaMemCollector(2,self.root).collect([]),{})
+
+    def test_process_exited(self):
+        """ A process which exits while its numa_maps is read is ignored """
+        read = NumaMemCollector.readNumaMaps
+        def readNumaMaps(collector,pid):
+            if pid == 103:
+                raise ProcessLookupError(errno.ESRCH,'No such process')
+            if pid == 104:
+                raise OSError(errno.ESRCH,'No such process')
+            return read(collector,pid)
+        with mock.patch.object(NumaMemCollector,'readNumaMaps',readNumaMaps):
+            numamems = NumaMemCollector(2,self.root,3).collect(list(range(100,110)))
+        self.assertEqual(sorted(numamems.keys()),[100,101,102,105,106,107,108,109])
+
+if __name__ == '__main__':
+    unittest.main()
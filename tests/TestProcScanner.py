@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from procscan import *
+from fakeproc import *
+import os
+import pwd
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+class TestProcScanner(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.processes = makeProcesses(3,4)
+        self.processes.append({'pid':5000, 'sid':5000, 'uid':os.getuid(), 'cmd':'my (cmd)', 'rss':0, 'threads':[(5000,3,'S',10)]})
+        makeFakeProc(self.root,self.processes)
+        self.user = pwd.getpwuid(os.getuid()).pw_name
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_same_as_ps(self):
+        from_proc = ProcScanner(self.root).scan('ALL')
+        from_ps   = PsScanner().parse(psOutput(self.processes[0:3]))
+        from_proc = sorted(from_proc,key=lambda p:p['pid'])
+        self.assertEqual(from_proc[0:3],from_ps)
+
+    def test_command_name(self):
+        scanned = ProcScanner(self.root).scan(pids=[5000])
+        self.assertEqual(scanned[0]['cmd'],'my (cmd)')
+        self.assertEqual(scanned[0]['sid'],5000)
+        self.assertEqual(len(ProcScanner(self.root).scan('my (cmd)')),1)
+
+    def test_selection(self):
+        self.assertEqual(len(ProcScanner(self.root).scan(self.user)),4)
+        self.assertEqual(len(ProcScanner(self.root).scan('a.out')),3)
+        self.assertEqual(len(ProcScanner(self.root).scan('no_such_command')),0)
+        self.assertEqual(len(ProcScanner(self.root).scan(pids=[1000,123456])),1)
+
+    def test_sample(self):
+        scanned = ProcScanner(self.root).scan('a.out')
+        p = self.processes[0]
+
+        # During the window (2 s): thread 0 uses 1 s of cpu and goes to sleep, thread 1 uses 0.5 s, thread 2 finishes
+        def work(window):
+            (tid,psr,state,ticks) = p['threads'][0]
+            writeThreadStat(self.root,p,(tid,psr,'S',ticks+HZ))
+            (tid,psr,state,ticks) = p['threads'][1]
+            writeThreadStat(self.root,p,(tid,psr,state,ticks+HZ//2))
+            os.remove(self.root + '/' + str(p['pid']) + '/task/' + str(p['threads'][2][0]) + '/stat')
+
+        with mock.patch('procscan.time') as fake_time:
+            fake_time.time.side_effect = [100.0,102.0]
+            fake_time.sleep.side_effect = work
+            sampled = ProcScanner(self.root).sample(scanned,2)
+
+        self.assertEqual(len(sampled),3)
+        self.assertEqual(sampled[0]['threads'],[(1000,0,'R',50.0),(1001,1,'R',25.0),(1003,3,'S',0.0)])
+        # A running thread which did not use the cpu keeps its state (a stalled job)
+        self.assertEqual(sampled[1]['threads'][0],(1005,4,'R',0.0))
+
+    def test_not_proc(self):
+        self.assertRaises(PlacementException,ProcScanner(self.root + '/nothing').scan)
+
+if __name__ == '__main__':
+    unittest.main()
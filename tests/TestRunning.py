@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from running import _detectOverlap, _overlappingTasks
+from running import *
+from hardware import *
+from params import params
+import io
+import os
+import random
+import argparse
+import unittest
+from unittest import mock
+from contextlib import redirect_stderr
+
+def bruteForce(tasks_bound):
+    """ Compare every pair of tasks (the historical algorithm) """
+    over = []
+    over_cores = set()
+    for i in range(len(tasks_bound)):
+        for j in range(i+1,len(tasks_bound)):
+            overlap = set(tasks_bound[i]) & set(tasks_bound[j])
+            if len(overlap) != 0:
+                over.append((i,j))
+                over_cores |= overlap
+    return (over,sorted(over_cores))
+
+class TestDetectOverlap(unittest.TestCase):
+    def test_no_overlap(self):
+        self.assertEqual(_detectOverlap([[0,1],[2,3],[4,5]]),([],[]))
+        self.assertEqual(_detectOverlap([]),([],[]))
+
+    def test_overlap(self):
+        tasks_bound = [[0,1,2],[2,3],[4,5],[5,2],[6,6]]
+        self.assertEqual(_detectOverlap(tasks_bound),([('A','B'),('A','D'),('B','D'),('C','D')],[2,5]))
+
+    def test_same_as_brute_force(self):
+        rand = random.Random(4)
+        for n in (1,10,100,295):
+            tasks_bound = [ rand.sample(range(4*n),rand.randint(1,4)) for t in range(n) ]
+            self.assertEqual(_overlappingTasks(tasks_bound),bruteForce(tasks_bound))
+
+class TestSampleWindowPs(unittest.TestCase):
+    def test_ps_fallback(self):
+        """ /proc cannot be read: the processes are found by ps, --sample_window is ignored """
+
+        options = argparse.Namespace(check='ALL',memory=False,use_ps=False,gpu_csv=False,sample_window=5.0,jobid=None)
+        processes = [{'pid':100, 'sid':100, 'user':'bob', 'cmd':'a.out', 'mem':1.0, 'threads':[(100,0,'R',80.0),(101,1,'S',0.0)]}]
+        with mock.patch.dict(os.environ,{'PLACEMENT_CONF':'test3.conf', 'PLACEMENT_ARCHI':'hard1'}):
+            hard = Hardware.factory()
+        with mock.patch('running.ProcScanner') as proc, mock.patch('running.PsScanner') as ps:
+            proc.return_value.scan.side_effect = PlacementException('ERROR - no /proc')
+            ps.return_value.scan.return_value  = processes
+            running = RunningMode(options,hard,lambda r: [[0]])
+        self.assertFalse(proc.return_value.sample.called)
+        self.assertEqual(running.processus[100]['threads'][100]['cpu'],80.0)
+        # No window: the duration is not reduced
+        self.assertGreater(running.duration,0.0)
+
+    def test_negative(self):
+        """ --sample_window must be positive """
+        with redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit,params,['placement','--check','ALL','--sample_window','-1'])
+            self.assertRaises(SystemExit,params,['placement','--check','ALL','--sample_window','0'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,264 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from slurm import *
+import os
+import shutil
+import tempfile
+import unittest
+
+def writeFile(path,content):
+    os.makedirs(os.path.dirname(path),exist_ok=True)
+    with open(path,'w') as f:
+        f.write(content)
+
+# A node with 2 jobs, cgroup v1
+class TestSlurmCgroupV1(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        slurm = self.root + '/cpuset/slurm/uid_1000'
+        writeFile(slurm + '/job_100/step_batch/cgroup.procs','11\n12\n')
+        writeFile(slurm + '/job_100/step_batch/cpuset.cpus','0-3\n')
+        writeFile(slurm + '/job_100/step_0/cgroup.procs','13\n')
+        writeFile(slurm + '/job_100/step_0/cpuset.cpus','0-3\n')
+        writeFile(slurm + '/job_200/step_batch/cgroup.procs','21\n')
+        writeFile(slurm + '/job_200/step_batch/cpuset.cpus','4-5,8\n')
+        self.slurm = Slurm(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_findPidsFromJob(self):
+        self.assertEqual(self.slurm.findPidsFromJob(100),[11,12,13])
+        self.assertEqual(self.slurm.findPidsFromJob('200'),[21])
+        self.assertEqual(self.slurm.findPidsFromJob(300),None)
+
+# A node with 1 job, cgroup v2
+class TestSlurmCgroupV2(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        scope = self.root + '/system.slice/slurmstepd.scope'
+        writeFile(scope + '/job_100/step_batch/slurm/cgroup.procs','10\n')
+        writeFile(scope + '/job_100/step_batch/user/task_0/cgroup.procs','11\n')
+        writeFile(scope + '/job_100/step_0/user/task_0/cgroup.procs','12\n')
+        writeFile(scope + '/job_100/step_0/user/task_1/cgroup.procs','13\n14\n')
+        writeFile(scope + '/job_100/step_0/user/task_1/cpuset.cpus.effective','0-3\n')
+        self.slurm = Slurm(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_findPidsFromJob(self):
+        self.assertEqual(self.slurm.findPidsFromJob(100),[10,11,12,13,14])
+        self.assertEqual(self.slurm.findPidsFromJob(200),None)
+
+    def test_empty_cpuset_cpus(self):
+        """ cgroup v2: cpuset.cpus is empty, the cores are in cpuset.cpus.effective """
+        scope = self.root + '/system.slice/slurmstepd.scope'
+        writeFile(scope + '/job_100/step_0/user/task_1/cpuset.cpus','')
+        slurm = FakeSlurm(self.root,['100'])
+        self.assertEqual(slurm.findJobFromCore(2),'100')
+        self.assertEqual(slurm.findJobFromCore(4),'')
+
+class FakeSlurm(Slurm):
+    """ squeue is replaced by a fake, which counts the calls
+        As the real squeue, it fails if a job is unknown """
+
+    def __init__(self,cgroup_root,running,unknown=[],proc_root='/proc',cache_dir=''):
+        Slurm.__init__(self,cgroup_root,proc_root,cache_dir)
+        self.running = running
+        self.unknown = unknown
+        self.calls   = 0
+        self.jobids  = []
+
+    def nodesetToHosts(self,nodeset):
+        raise AssertionError('nodeset should not be called for ' + nodeset)
+
+    def _runSqueue(self,args):
+        self.calls += 1
+        jobids = args[args.index('-j')+1].split(',')
+        self.jobids += jobids
+        if len(set(jobids) & set(self.unknown)) > 0:
+            raise PlacementException('squeue - ERROR code = 1',1)
+        return ''.join([ j + '\n' for j in jobids if j in self.running ])
+
+# A shared node with 40 jobs, some of them are old traces
+class TestSlurmSqueue(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        slurm = self.root + '/cpuset/slurm/uid_1000'
+        for j in range(1000,1040):
+            writeFile(slurm + '/job_' + str(j) + '/step_batch/cgroup.procs',str(j*10) + '\n')
+            writeFile(slurm + '/job_' + str(j) + '/step_batch/cpuset.cpus','')
+            writeFile(slurm + '/job_' + str(j) + '/step_0/cgroup.procs',str(j*10+1) + '\n')
+            writeFile(slurm + '/job_' + str(j) + '/step_0/cpuset.cpus',str(j-1000) + ',' + str(2*j-1900) + '-' + str(2*j-1899) + '\n')
+        self.running = [ str(j) for j in range(1000,1040) if j % 4 != 0 ]
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_one_call(self):
+        slurm = FakeSlurm(self.root,self.running)
+        self.assertEqual(slurm.findJobFromCore(1),'1001')
+        self.assertEqual(slurm.findJobFromCore(0),'')
+        self.assertEqual(slurm.findJobFromCore(39),'1039')
+        self.assertEqual(slurm.calls,1)
+
+    def test_cpusets(self):
+        slurm = FakeSlurm(self.root,self.running)
+        self.assertEqual(slurm.findJobFromCore(1),'1001')
+        self.assertEqual(slurm.findJobFromCore(102),'1001')
+        self.assertEqual(slurm.findJobFromCore(103),'1001')
+        self.assertEqual(slurm.findJobFromCore(104),'1002')
+        self.assertEqual(slurm.findJobFromCore(0),'')
+        self.assertEqual(slurm.findJobFromCore(101),'')
+
+    def test_unknown_jobs(self):
+        slurm = FakeSlurm(self.root,self.running,['1000','1004'])
+        self.assertEqual(slurm.findJobFromCore(1),'1001')
+        self.assertEqual(slurm.findJobFromCore(4),'')
+        self.assertEqual(slurm.calls,41)
+
+    def test_no_job(self):
+        slurm = FakeSlurm(self.root + '/nothing',self.running)
+        self.assertEqual(slurm.findJobFromCore(1),'')
+        self.assertEqual(slurm.findTagFromJob('1001'),0)
+        self.assertEqual(slurm.calls,0)
+
+    def test_tags(self):
+        slurm = FakeSlurm(self.root,self.running)
+        self.assertEqual(slurm.findTagFromJob('1000'),1)
+        self.assertEqual(slurm.findTagFromJob('1039'),40)
+        self.assertEqual(slurm.findTagFromJob('2000'),0)
+        self.assertEqual(slurm.calls,0)
+
+    def test_tags_stale_job(self):
+        """ The leftover cgroup of a finished job (no task) does not shift the tags """
+        writeFile(self.root + '/cpuset/slurm/uid_1000/job_0999/step_0/cgroup.procs','')
+        slurm = FakeSlurm(self.root,self.running)
+        self.assertEqual(slurm.findTagFromJob('0999'),0)
+        self.assertEqual(slurm.findTagFromJob('1000'),1)
+        self.assertEqual(slurm.findTagFromJob('1039'),40)
+
+# The cpusets of the jobs are kept between two executions
+class TestSlurmCache(unittest.TestCase):
+    def setUp(self):
+        self.root  = tempfile.mkdtemp()
+        self.cache = self.root + '/cache'
+        os.mkdir(self.cache)
+        self.slurm = self.root + '/cpuset/slurm/uid_1000'
+        for j in range(100,110):
+            self.__addJob(j)
+        self.running = [ str(j) for j in range(100,120) if j != 105 ]
+        Timings.reset()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def __addJob(self,j):
+        writeFile(self.slurm + '/job_' + str(j) + '/step_0/cgroup.procs',str(j) + '\n')
+        writeFile(self.slurm + '/job_' + str(j) + '/step_0/cpuset.cpus',str(j-100) + '\n')
+
+    def __cores(self):
+        slurm = FakeSlurm(self.root,self.running,[],'/proc',self.cache)
+        cores = [ slurm.findJobFromCore(c) for c in range(12) ]
+        return (cores,slurm.jobids)
+
+    def test_hits(self):
+        (cores1,jobids1) = self.__cores()
+        (cores2,jobids2) = self.__cores()
+        self.assertEqual(cores1,['100','101','102','103','104','','106','107','108','109','',''])
+        self.assertEqual(cores2,cores1)
+        self.assertEqual(len(jobids1),10)
+        self.assertEqual(jobids2,[])
+        self.assertEqual(Timings.getCounters(),{'slurm_cache_hits':10, 'slurm_cache_rebuilds':10})
+
+    def test_new_job(self):
+        self.__cores()
+        self.__addJob(110)
+        (cores,jobids) = self.__cores()
+        self.assertEqual(cores[10],'110')
+        self.assertEqual(jobids,['110'])
+
+    def test_new_step(self):
+        self.__cores()
+        writeFile(self.slurm + '/job_102/step_1/cpuset.cpus','11\n')
+        (cores,jobids) = self.__cores()
+        self.assertEqual(cores[2],'102')
+        self.assertEqual(cores[11],'102')
+        self.assertEqual(jobids,['102'])
+
+    def test_ended_job(self):
+        self.__cores()
+        shutil.rmtree(self.slurm + '/job_101')
+        (cores,jobids) = self.__cores()
+        self.assertEqual(cores[1],'')
+        self.assertEqual(jobids,[])
+        with open(self.cache + '/slurm-jobs.json','r') as f:
+            self.assertNotIn('"101"',f.read())
+
+    def test_squeue_snapshot(self):
+        writeFile(self.cache + '/squeue.txt','100@alice@shared@node[1-2]\n101@bob@shared@node3\n102@alice@shared@node4\n')
+        slurm = FakeSlurm(self.root,self.running,[],'/proc',self.cache)
+        self.assertEqual(slurm.findJobFromId(101),('node3','bob','101'))
+        self.assertEqual(slurm.findJobFromId(103),('','',''))
+        self.assertEqual(slurm.findJobsFromUser('alice'),[('node[1-2]','alice','100'),('node4','alice','102')])
+        self.assertEqual(slurm.findJobsFromUser('carol'),[('','','')])
+
+    def test_no_cache(self):
+        slurm = FakeSlurm(self.root,self.running,[],'/proc','')
+        self.assertEqual(slurm.findJobFromCore(0),'100')
+        self.assertEqual(os.listdir(self.cache),[])
+
+# The jobs of the processes are read in /proc/<pid>/cgroup, cgroup v1 and v2
+class TestSlurmProcCgroup(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        proc = self.root + '/proc'
+        writeFile(proc + '/10/cgroup','11:memory:/slurm/uid_1000/job_100/step_0/task_0\n4:cpuset:/slurm/uid_1000/job_100/step_0\n1:name=systemd:/system.slice/slurmd.service\n')
+        writeFile(proc + '/11/cgroup','0::/system.slice/slurmstepd.scope/job_200/step_batch/user/task_0\n')
+        writeFile(proc + '/12/cgroup','0::/system.slice/slurmstepd.scope/system\n')
+        writeFile(proc + '/13/cgroup','0::/user.slice/user-1000.slice/session-3.scope\n')
+        self.slurm = FakeSlurm(self.root + '/cgroup',[],[],proc,self.root + '/cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_findJobFromPid(self):
+        self.assertEqual(self.slurm.findJobFromPid(10),'100')
+        self.assertEqual(self.slurm.findJobFromPid('11'),'200')
+        self.assertEqual(self.slurm.findJobFromPid(12),'')
+        self.assertEqual(self.slurm.findJobFromPid(13),'')
+        self.assertEqual(self.slurm.findJobFromPid(14),'')
+        self.assertEqual(self.slurm.calls,0)
+
+    def test_cached(self):
+        self.assertEqual(self.slurm.findJobFromPid(10),'100')
+        shutil.rmtree(self.root + '/proc/10')
+        self.assertEqual(self.slurm.findJobFromPid(10),'100')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from snapshot import *
+import unittest
+
+def thread(tid,psr,state,cpu):
+    return {'tid':tid, 'psr':psr, 'ppsr':psr % 4, 'state':state, 'cpu':cpu, 'mem':0.0, 'sid':0}
+
+def threadsBound():
+    """ 3 processes, the second one (tag A) is not running """
+    return {
+        200: {'pid':200, 'sid':10, 'tag':'B', 'jobtag':2, 'mem':1.5, 'R':True,
+              'threads':{200:thread(200,1,'R',90.0), 201:thread(201,5,'R',80.0), 202:thread(202,2,'S',10.0)}},
+        100: {'pid':100, 'sid':10, 'tag':'A', 'jobtag':1, 'mem':0.5,
+              'threads':{100:thread(100,0,'S',5.0)}},
+        300: {'pid':300, 'sid':30, 'tag':'C', 'jobtag':2, 'mem':2.0, 'R':True,
+              'threads':{301:thread(301,3,'R',100.0), 300:thread(300,6,'S',1.0)}}
+    }
+
+class TestThreadsSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = ThreadsSnapshot(threadsBound())
+
+    def test_columns(self):
+        s = self.snapshot
+        self.assertEqual(len(s),6)
+        self.assertEqual(s.getTasks(),3)
+        self.assertEqual(list(s.task_pid),[100,200,300])
+        self.assertEqual(s.task_tag,['A','B','C'])
+        self.assertEqual(list(s.task_start),[0,1,4,6])
+        self.assertEqual(list(s.tid),[100,200,201,202,301,300])
+        self.assertEqual(list(s.task),[0,1,1,1,2,2])
+        self.assertEqual(bytes(s.state),b'SRRSRS')
+        self.assertEqual(list(s.thread_r),[0,1,1,0,1,0])
+        self.assertEqual(list(s.process_r),[0,1,1,1,1,1])
+        self.assertEqual(list(s.taskRows(1)),[1,2,3])
+
+    def test_tasksBound(self):
+        self.assertEqual(self.snapshot.tasksBound(),[[],[1,5],[3]])
+
+    def test_aggregates(self):
+        s = self.snapshot
+        self.assertEqual(s.cpuPerCore(),{1:170.0,2:0.0,3:100.0})
+        self.assertEqual(s.cpuPerCore(False),{1:170.0,2:11.0,3:100.0})
+        self.assertEqual(list(s.cpuPerTask()),[5.0,180.0,101.0])
+        self.assertEqual(s.cpuPerJob(),{2:281.0})
+        self.assertEqual(s.perTask(min,s.ppsr),[0,1,2])
+        self.assertEqual(s.perTask(len,s.tid),[1,3,2])
+        self.assertEqual(s.groupBy(s.task_sid),{10:[0,1],30:[2]})
+        self.assertEqual(s.sumBy(s.sid,s.cpu),{10:185.0,30:101.0})
+
+    def test_empty(self):
+        s = ThreadsSnapshot({})
+        self.assertEqual(len(s),0)
+        self.assertEqual(s.tasksBound(),[])
+        self.assertEqual(s.cpuPerCore(),{})
+
+if __name__ == '__main__':
+    unittest.main()
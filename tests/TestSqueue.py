@@ -0,0 +1,108 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from squeue import *
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+SQUEUE_OUT = '''1001@alice@exclusive@node[1-4]
+1002@bob@shared@node5
+1003@alice@shared@node6
+'''
+
+class FakeSqueue(SqueueSnapshot):
+    """ squeue is replaced by a fake, which counts the calls """
+
+    calls = 0
+
+    def __init__(self,ttl,cache_dir,delay=0):
+        SqueueSnapshot.__init__(self,ttl,cache_dir)
+        self.delay = delay
+
+    def _runSqueue(self,args):
+        FakeSqueue.calls += 1
+        time.sleep(self.delay)
+        return SQUEUE_OUT
+
+class TestSqueueSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.cache = tempfile.mkdtemp()
+        FakeSqueue.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.cache)
+
+    def test_queries(self):
+        s = FakeSqueue(10,'')
+        self.assertEqual(s.findJob(1002),('1002','bob','shared','node5'))
+        self.assertEqual(s.findJob(1004),None)
+        self.assertEqual([ j[0] for j in s.findJobsFromUser('alice') ],['1001','1003'])
+        self.assertEqual(s.getJobIds(),['1001','1002','1003'])
+        self.assertEqual(s.getJobIds('exclusive'),['1001'])
+        self.assertTrue(s.isRunning('1003'))
+        self.assertFalse(s.isRunning('1004'))
+        self.assertEqual(FakeSqueue.calls,1)
+
+    def test_shared(self):
+        FakeSqueue(10,self.cache).getJobs()
+        self.assertEqual(FakeSqueue(10,self.cache).getJobIds(),['1001','1002','1003'])
+        self.assertEqual(FakeSqueue.calls,1)
+
+    def test_ttl(self):
+        FakeSqueue(0.2,self.cache).getJobs()
+        time.sleep(0.3)
+        FakeSqueue(0.2,self.cache).getJobs()
+        self.assertEqual(FakeSqueue.calls,2)
+
+    def test_no_file(self):
+        FakeSqueue(10,'').getJobs()
+        FakeSqueue(10,'').getJobs()
+        self.assertEqual(FakeSqueue.calls,2)
+        self.assertEqual(os.listdir(self.cache),[])
+
+    def test_concurrent(self):
+        threads = [ threading.Thread(target=FakeSqueue(10,self.cache,0.2).getJobs) for i in range(8) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(FakeSqueue.calls,1)
+
+    def test_env(self):
+        os.environ['PLACEMENT_SQUEUE_TTL'] = '0'
+        try:
+            FakeSqueue(None,self.cache).getJobs()
+            FakeSqueue(None,self.cache).getJobs()
+        finally:
+            del os.environ['PLACEMENT_SQUEUE_TTL']
+        self.assertEqual(FakeSqueue.calls,2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+from tsstore import *
+import io
+import os
+import math
+import time
+import shutil
+import tempfile
+import unittest
+
+COLUMNS     = ['CPU0','CPU1','MEM']
+DESCRIPTION = {'partition':'exclusive', 'columns':COLUMNS}
+
+class TestTsStore(unittest.TestCase):
+    def setUp(self):
+        self.root  = tempfile.mkdtemp()
+        self.store = TsStore(self.root + '/store')
+        for i in range(10):
+            self.store.append('123','node1',1000.0 + 30*i,[i,100,1.5],DESCRIPTION)
+        self.store.append('123','node2',1000.0,[None,50,2],DESCRIPTION)
+        self.store.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_series(self):
+        self.assertEqual(self.store.getSeries(),[('123','node1'),('123','node2')])
+        self.assertEqual(TsStore(self.root + '/nothing').getSeries(),[])
+
+    def test_reader(self):
+        reader = self.store.open('123','node1')
+        self.assertEqual(len(reader),10)
+        self.assertEqual(reader.getColumns(),COLUMNS)
+        self.assertEqual(reader.getDescription()['node'],'node1')
+        self.assertEqual(reader.getRecord(2),(1060.0,2.0,100.0,1.5))
+        self.assertEqual(reader.readColumn('CPU0',1030,1090),[(1030.0,1.0),(1060.0,2.0)])
+        reader.close()
+
+    def test_time_range(self):
+        self.assertEqual(len(self.store.read('123','node1')),10)
+        self.assertEqual([ r[0] for r in self.store.read('123','node1',1031,1120) ],[1060.0,1090.0])
+        self.assertEqual(self.store.read('123','node1',2000),[])
+        self.assertTrue(math.isnan(self.store.read('123','node2')[0][1]))
+
+    def test_append_reopen(self):
+        store = TsStore(self.root + '/store')
+        store.append('123','node1',1300.0,[10,100,1.5],DESCRIPTION)
+        store.close()
+        self.assertEqual(len(store.read('123','node1')),11)
+        self.assertRaises(PlacementException,store.append,'123','node1',1330.0,[10,100],DESCRIPTION)
+        store.close()
+        store = TsStore(self.root + '/store')
+        self.assertRaises(PlacementException,store.append,'123','node1',1330.0,[1],{'columns':['CPU0']})
+
+    def test_incomplete_record(self):
+        with open(self.root + '/store/123/node2.pts','ab') as f:
+            f.write(b'\0\0\0')
+        self.assertEqual(len(self.store.read('123','node2')),1)
+
+    def test_incomplete_record_reopen(self):
+        with open(self.root + '/store/123/node1.pts','ab') as f:
+            f.write(b'\0\0\0')
+        store = TsStore(self.root + '/store')
+        store.append('123','node1',1300.0,[10,100,1.5],DESCRIPTION)
+        store.append('123','node1',1330.0,[11,100,1.5],DESCRIPTION)
+        store.close()
+        records = store.read('123','node1')
+        self.assertEqual(len(records),12)
+        self.assertEqual(records[-2:],[(1300.0,10.0,100.0,1.5),(1330.0,11.0,100.0,1.5)])
+        self.assertEqual([ r[0] for r in store.read('123','node1',1290,1400) ],[1300.0,1330.0])
+
+    def test_empty_file(self):
+        """ A file just created (0 byte) is an empty series, the header is written by the next append """
+        open(self.root + '/store/123/node3.pts','wb').close()
+        reader = self.store.open('123','node3')
+        self.assertEqual(len(reader),0)
+        self.assertEqual(reader.read(),[])
+        self.assertEqual(reader.readColumn('CPU0'),[])
+        reader.close()
+        out = io.StringIO()
+        self.store.exportCsv(out,nodes=['node3'])
+        self.assertEqual(out.getvalue(),'')
+        store = TsStore(self.root + '/store')
+        store.append('123','node3',1000.0,[1,2,3],DESCRIPTION)
+        store.close()
+        self.assertEqual(store.read('123','node3'),[(1000.0,1.0,2.0,3.0)])
+
+    def test_bad_file(self):
+        with open(self.root + '/bad.pts','wb') as f:
+            f.write(b'placement')
+        self.assertRaises(PlacementException,TsReader,self.root + '/bad.pts')
+
+    def test_csv(self):
+        out = io.StringIO()
+        self.store.exportCsv(out,nodes=['node2'])
+        stamp = time.strftime(TIME_FORMAT,time.localtime(1000.0))
+        self.assertEqual(out.getvalue(),'time,jobid,nodename,CPU0,CPU1,MEM,\n' + stamp + ',123,node2,,50,2,\n')
+        out = io.StringIO()
+        self.store.exportCsv(out,begin=1000,end=1030)
+        self.assertEqual(out.getvalue().split('\n')[1:],[stamp + ',123,node1,0,100,1.5,',stamp + ',123,node2,,50,2,',''])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,6 +27,9 @@
 from utilities import *
 import unittest
 import os
+import stat
+import shutil
+import tempfile
 
 class TestNumTaskToLetter(unittest.TestCase):
 
@@ -95,6 +98,70 @@ class TestExpandNodeList(unittest.TestCase):
     def test_limits(self):
         self.assertEqual(expandNodeList('eosmesca1'),['eosmesca1'])
 
+    def test_comma_list(self):
+        self.assertEqual(expandNodeList('node[1-2],fat1'),['fat1','node1','node2'])
+        self.assertEqual(expandNodeList('node[1-3],node2'),['node1','node2','node3'])
+
+class TestNodeSet(unittest.TestCase):
+    def test_fold(self):
+        self.assertEqual(str(NodeSet('node1,node2,node3,node5')),'node[1-3,5]')
+        self.assertEqual(str(NodeSet('toto[08-10]')),'toto[08-10]')
+        self.assertEqual(str(NodeSet('node1[0-5]')),'node[10-15]')
+        self.assertEqual(str(NodeSet('r[1-2]c1,r[1-2]c2')),'r[1-2]c[1-2]')
+        self.assertEqual(str(NodeSet('')),'')
+
+    def test_len_contains(self):
+        ns = NodeSet('r[1-20]c[1-40]n[1-64],login')
+        self.assertEqual(len(ns),20*40*64+1)
+        self.assertTrue('r20c40n64' in ns)
+        self.assertTrue('login' in ns)
+        self.assertFalse('r21c1n1' in ns)
+        self.assertFalse('r01c1n1' in ns)
+        ns = NodeSet('node[001-100]')
+        self.assertTrue('node007' in ns)
+        self.assertTrue('node100' in ns)
+        self.assertFalse('node7' in ns)
+        self.assertEqual(len(NodeSet('node[1-10],node[5-20]')),20)
+
+    def test_iter(self):
+        self.assertEqual(list(NodeSet('n[1-2]-ib[3-4]')),['n1-ib3','n1-ib4','n2-ib3','n2-ib4'])
+        hosts = iter(NodeSet('node[1-100000000]'))
+        self.assertEqual([next(hosts),next(hosts)],['node1','node2'])
+
+    def test_adjacent_numbers(self):
+        ns = NodeSet('x[1-20][1-5]')
+        self.assertTrue('x115' in ns)
+        self.assertTrue('x205' in ns)
+        self.assertFalse('x16' in ns)
+        self.assertEqual(sorted(ns),sorted(expandNodeList('x[1-20][1-5]')))
+
+    def test_operations(self):
+        a = NodeSet('node[1-100]')
+        b = NodeSet('node[50-150],fat1')
+        self.assertEqual(str(a | b),'fat1,node[1-150]')
+        self.assertEqual(str(a & b),'node[50-100]')
+        self.assertEqual(str(a - b),'node[1-49]')
+        self.assertEqual(str(b - a),'fat1,node[101-150]')
+        r = NodeSet('r[1-20]c[1-40]n[1-64]')
+        self.assertEqual(str(r - NodeSet('r[2-20]c[1-40]n[1-64]')),'r1c[1-40]n[1-64]')
+        self.assertEqual(len(r - NodeSet('r1c1n1')),20*40*64-1)
+        self.assertEqual(r & NodeSet('r5c[1-40]n[1-64]'),NodeSet('r5c[1-40]n[1-64]'))
+
+    def test_shapes(self):
+        ns = NodeSet('node[001-100],r[1-2]c[1-2]')
+        self.assertEqual(NodeSet.fromShapes(ns.shapes()),ns)
+
+    def test_bad(self):
+        self.assertRaises(PlacementException,NodeSet,'node[a-b]')
+        self.assertRaises(PlacementException,NodeSet,'node[1-2')
+
+class TestFirstNode(unittest.TestCase):
+    def test_firstNode(self):
+        self.assertEqual(firstNode('node7'),'node7')
+        self.assertEqual(firstNode('node[005-008,012],node1'),'node005')
+        self.assertEqual(firstNode('n[1-2]-ib[3-4],x'),'n1-ib3')
+        self.assertEqual(firstNode('a,b[1-2]'),'a')
+
 class TestConvertMemory(unittest.TestCase):
     def test_normal(self):
         self.assertEqual(convertMemory('200 KiB'),204800)
@@ -150,6 +217,149 @@ class TestAnsiCodes(unittest.TestCase):
 		self.assertNotEqual(AnsiCodes.map(1),AnsiCodes.map(21))
 		self.assertNotEqual(AnsiCodes.map(1),AnsiCodes.map(31))
 		self.assertEqual(AnsiCodes.map(1),AnsiCodes.map(33))
+
+	def test_ansi(self):
+		AnsiCodes.noAnsi()
+		self.assertEqual(AnsiCodes.bold(),'')
+		AnsiCodes.Ansi()
+		self.assertEqual(AnsiCodes.bold(),'\033[1m')
 		         
+class TestTimings(unittest.TestCase):
+	def setUp(self):
+		Timings.reset()
+
+	def test_phase(self):
+		with Timings.phase('first'):
+			pass
+		try:
+			with Timings.phase('second'):
+				raise PlacementException('oups')
+		except PlacementException:
+			pass
+		self.assertEqual([ n for (n,d) in Timings.getPhases() ],['first','second'])
+		self.assertIn('second',Timings.report())
+
+	def test_runCmd(self):
+		runCmd(['echo','hello'])
+		self.assertRaises(PlacementException,runCmd,'false')
+		commands = Timings.toDict()['commands']
+		self.assertEqual(len(commands),2)
+		self.assertEqual(commands[0]['argv'],['echo','hello'])
+		self.assertEqual(commands[0]['bytes'],6)
+		self.assertEqual(commands[1]['returncode'],1)
+
+	def test_counters(self):
+		Timings.count('hits')
+		Timings.count('hits',2)
+		Timings.count('rebuilds',0)
+		self.assertEqual(Timings.getCounters(),{'hits':3, 'rebuilds':0})
+		self.assertEqual(Timings.toDict()['counters'],{'hits':3, 'rebuilds':0})
+		self.assertIn('rebuilds',Timings.report())
+
+class TestGetCacheDir(unittest.TestCase):
+	def setUp(self):
+		self.env = os.environ.get('PLACEMENT_CACHE_DIR')
+		self.root = tempfile.mkdtemp()
+
+	def tearDown(self):
+		if self.env == None:
+			os.environ.pop('PLACEMENT_CACHE_DIR',None)
+		else:
+			os.environ['PLACEMENT_CACHE_DIR'] = self.env
+		shutil.rmtree(self.root)
+
+	def test_env(self):
+		os.environ['PLACEMENT_CACHE_DIR'] = self.root + '/cache'
+		self.assertEqual(getCacheDir(),self.root + '/cache')
+		self.assertTrue(os.path.isdir(self.root + '/cache'))
+
+	def test_no_cache(self):
+		os.environ['PLACEMENT_CACHE_DIR'] = ''
+		self.assertEqual(getCacheDir(),None)
+
+class TestTicker(unittest.TestCase):
+	def setUp(self):
+		self.now    = 0.0
+		self.sleeps = []
+
+	def clock(self):
+		return self.now
+
+	def sleep(self,duration):
+		self.sleeps.append(duration)
+		self.now += duration
+
+	def test_no_drift(self):
+		ticker = Ticker(10,self.clock,self.sleep)
+		self.now += 3
+		self.assertEqual(ticker.wait(),0)
+		self.now += 8
+		self.assertEqual(ticker.wait(),0)
+		self.assertEqual(self.sleeps,[7,2])
+		self.assertEqual(self.now,20)
+
+	def test_skip(self):
+		ticker = Ticker(10,self.clock,self.sleep)
+		self.now += 35
+		self.assertEqual(ticker.wait(),3)
+		self.assertEqual(self.now,40)
+
+# A fake ssh: logs its arguments, ssh -f -N creates the control socket (or fails if $NOMUX is set)
+FAKE_SSH = '''#! /bin/bash
+echo "$*" >> $SSH_LOG
+if [[ " $* " == *" -N "* ]]
+then
+    [[ -n "$NOMUX" ]] && exit 255
+    for a in "$@"; do [[ $a == ControlPath=* ]] && path=${a#ControlPath=}; done
+    touch ${path/\\%n/${@: -1}}
+fi
+exit 0
+'''
+
+class TestSshMux(unittest.TestCase):
+	def setUp(self):
+		Timings.reset()
+		self.root = tempfile.mkdtemp()
+		with open(self.root + '/ssh','w') as f:
+			f.write(FAKE_SSH)
+		os.chmod(self.root + '/ssh',stat.S_IRWXU)
+		self.env = os.environ.copy()
+		os.environ['PATH'] = self.root + ':' + os.environ['PATH']
+		os.environ['PLACEMENT_CACHE_DIR'] = self.root + '/cache'
+		os.environ['SSH_LOG'] = self.root + '/log'
+		os.environ.pop('PLACEMENT_SSH_MUX',None)
+
+	def tearDown(self):
+		os.environ.clear()
+		os.environ.update(self.env)
+		shutil.rmtree(self.root)
+
+	def log(self):
+		with open(self.root + '/log','r') as f:
+			return f.read().split('\n')[0:-1]
+
+	def test_disabled(self):
+		os.environ['PLACEMENT_SSH_MUX'] = '0'
+		runCmd(['hostname'],'node1')
+		self.assertEqual(self.log(),['-x node1 hostname'])
+
+	def test_reuse(self):
+		runCmd(['hostname'],'node2')
+		runCmdNoOut(['hostname'],'node2')
+		options = ' '.join(SshMux.options())
+		self.assertIn('ControlPath=' + self.root + '/cache/ssh-%n',options)
+		self.assertEqual(self.log(),['-x -f -N ' + options + ' node2','-x ' + options + ' node2 hostname','-x ' + options + ' node2 hostname'])
+		counters = Timings.getCounters()
+		self.assertEqual(counters['ssh_mux_opened'],1)
+		self.assertEqual(counters['ssh_mux_reused'],1)
+		self.assertIn('ssh_saved_ms',counters)
+
+	def test_not_allowed(self):
+		os.environ['NOMUX'] = '1'
+		runCmd(['hostname'],'node3')
+		runCmd(['hostname'],'node3')
+		self.assertEqual(self.log()[1:],['-x node3 hostname','-x node3 hostname'])
+		self.assertNotIn('ssh_mux_opened',Timings.getCounters())
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# This file is part of PLACEMENT software
+# PLACEMENT helps users to bind their processes to one or more cpu cores
+#
+# Copyright (C) 2015-2018 Emmanuel Courcelle
+# PLACEMENT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#  PLACEMENT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PLACEMENT.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  Authors:
+#        Emmanuel Courcelle - C.N.R.S. - UMS 3667 - CALMIP
+#        Nicolas Renon - Université Paul Sabatier - University of Toulouse)
+#
+
+#
+# Build a synthetic /proc tree, used by the tests and the benchmarks
+#
+# A process is described by a dict:
+#     {'pid':pid, 'sid':sid, 'uid':uid, 'cmd':'command', 'rss':rss in kB,
+#      'threads':[(tid,psr,state,ticks), ...]}
+#
+# All processes and threads are started at boot time + START
+#
+
+import os
+import pwd
+
+HZ       = os.sysconf('SC_CLK_TCK')
+UPTIME   = 10000
+START    = 100
+MEMTOTAL = 1000000
+
+def makeProcesses(nb_processes,nb_threads,uid=None,running=True):
+    """ Return a list of synthetic processes, nb_threads threads each, psr in round robin """
+
+    if uid == None:
+        uid = os.getuid()
+    processes = []
+    for p in range(nb_processes):
+        pid = 1000 + p * (nb_threads + 1)
+        threads = []
+        for t in range(nb_threads):
+            if running and t == 0:
+                state = 'R'
+            else:
+                state = 'S'
+            threads.append((pid+t,(p*nb_threads+t) % 40,state,(t+1)*HZ*50))
+        processes.append({'pid':pid, 'sid':1000, 'uid':uid, 'cmd':'a.out', 'rss':1000*(p+1), 'threads':threads})
+    return processes
+
+def makeFakeProc(root,processes):
+    """ Write the synthetic tree under root """
+
+    with open(root + '/uptime','w') as f:
+        f.write(str(UPTIME) + '.00 0.00\n')
+    with open(root + '/meminfo','w') as f:
+        f.write('MemTotal:       ' + str(MEMTOTAL) + ' kB\n')
+
+    for p in processes:
+        pid_dir = root + '/' + str(p['pid'])
+        os.makedirs(pid_dir + '/task')
+        ticks = sum([t[3] for t in p['threads']])
+        with open(pid_dir + '/stat','w') as f:
+            f.write(_stat(p['pid'],p['cmd'],p['threads'][0][2],p['sid'],ticks,p['threads'][0][1]))
+        with open(pid_dir + '/status','w') as f:
+            f.write('Name:\t' + p['cmd'] + '\nUid:\t' + str(p['uid']) + '\t' + str(p['uid']) + '\t0\t0\nVmRSS:\t' + str(p['rss']) + ' kB\n')
+        for thread in p['threads']:
+            os.makedirs(pid_dir + '/task/' + str(thread[0]))
+            writeThreadStat(root,p,thread)
+
+def writeThreadStat(root,process,thread):
+    """ (Re)write the stat file of a thread (tid,psr,state,ticks) """
+
+    (tid,psr,state,ticks) = thread
+    with open(root + '/' + str(process['pid']) + '/task/' + str(tid) + '/stat','w') as f:
+        f.write(_stat(tid,process['cmd'],state,process['sid'],ticks,psr))
+
+def psOutput(processes):
+    """ Return the lines ps -m would print for the same processes """
+
+    lines = []
+    for p in processes:
+        user = pwd.getpwuid(p['uid']).pw_name
+        mem  = (p['rss'] * 1000 // MEMTOTAL) / 10.0
+        lines.append('{:<15} {:>6} {:>6}     -   - {:<15} -  0.0 {:4.1f}'.format(user,p['sid'],p['pid'],p['cmd'],mem))
+        for (tid,psr,state,ticks) in p['threads']:
+            lines.append('{:<15}      -      - {:>6} {:>3} -               {} {:4.1f}    -'.format(user,tid,psr,state,pcpu(ticks)))
+    return lines
+
+def pcpu(ticks):
+    """ %cpu as computed by ps """
+    return ((ticks * 1000 // HZ) // (UPTIME - START)) / 10.0
+
+def _stat(pid,cmd,state,sid,ticks,psr):
+    fields = [str(pid), '(' + cmd + ')', state, '1', str(sid), str(sid)] + ['0'] * 7
+    fields += [str(ticks), '0'] + ['0'] * 6 + [str(START*HZ)] + ['0'] * 16 + [str(psr)] + ['0'] * 13
+    return ' '.join(fields) + '\n'